@@ -6,14 +6,15 @@ from os import sys, path
 sys.path.insert(1, path.dirname(path.dirname(path.abspath(__file__))) +
                 "/lib/Python")
 
-from subprocess import Popen, PIPE, STDOUT
+from os import getenv
 
+from launcher import Process, PIPE, STDOUT
 from tmprefs import Preferences
 
 # -- Main ---------------------------------------------------------------------
 
 if __name__ == '__main__':
     prefs = Preferences()
-    command = ('"$DIALOG" -mp "" -d \'{}\' '.format(prefs.defaults()) +
-               '"$TM_BUNDLE_SUPPORT"/nibs/Preferences')
-    Popen(command, shell=True, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+    Process([getenv('DIALOG'), '-mp', '', '-d', prefs.defaults(),
+             '{}/nibs/Preferences'.format(getenv('TM_BUNDLE_SUPPORT'))],
+            stdin=PIPE, stdout=PIPE, stderr=STDOUT)
@@ -224,7 +224,10 @@ sub parse_file_path {
 
 # Persistent state
 my ( %files_mtimes, $cleanup_viewer, $ping_viewer, $notification_token,
-    $typesetting_errors );
+    $typesetting_errors, $log_offset );
+
+# Start a new log file if the old one grows larger than this size (in bytes)
+my $max_log_size = 1024 * 1024;
 
 #############
 # Main loop #
@@ -400,10 +403,20 @@ sub parse_file_list {
 my ( $compiled_document, $compiled_document_name );
 
 sub compile {
-    my $error = 0;
+    my $error    = 0;
+    my $logname  = "$name.latexmk.log";
+    my $redirect = '>>';
+
+    # We append the output of every run to the log file. This way `texparser`
+    # only has to parse the output of the new run.
+    $log_offset = -s $logname || 0;
+    if ( $log_offset > $max_log_size ) {
+        $log_offset = 0;
+        $redirect   = '>';
+    }
 
     fail_unless_system(
-        "@tex '$wd/$name.tex' &> '$name.latexmk.log'",
+        "@tex '$wd/$name.tex' $redirect '$logname' 2>&1",
         sub {
             if ( $? == 1 || $? == 2 || $? == 12 ) {
 
@@ -451,13 +464,13 @@ sub parse_log {
         # An error occurred during typesetting
 
         $typesetting_errors = 1;
-        my $texparser_command = "texparser.py '$logname' "
+        my $texparser_command = "texparser.py -resume '$logname' "
           . "'$wd/$name' -notify $notification_token";
         my $output = `$texparser_command`;
         $output =~ /.*Notification\ Token:\ \|(\d+)\|/;
         $notification_token = $1;
     }
-    elsif ( file_has_min_lines( "$logname", 4 ) ) {
+    elsif ( file_has_min_lines( "$logname", 4, $log_offset ) ) {
 
         # The state has changed since last time and there are no errors. We
         # check for state changes by looking at the log. The log produced by
@@ -467,7 +480,8 @@ sub parse_log {
 
         $typesetting_errors = 0;
         close_notification_window();
-        fail_unless_system( "texparser.py", "$logname", "$wd/$name" );
+        fail_unless_system( "texparser.py", "-resume", "$logname",
+            "$wd/$name" );
 
     }
     elsif ($typesetting_errors) {
@@ -883,9 +897,11 @@ sub check_open {
 sub file_has_min_lines {
     my $filepath         = shift;
     my $min_number_lines = shift;
+    my $offset           = shift || 0;
 
     open( my $fh, "<", $filepath )
       or die "Can not open $filepath: $!";
+    seek( $fh, $offset, 0 );
 
     my $lines = 0;
     while (<$fh>) {
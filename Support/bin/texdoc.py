@@ -46,15 +46,12 @@ sys.path.insert(1, path.dirname(path.dirname(path.abspath(__file__))) +
 from io import open
 from os import chdir, getenv, mkdir
 from os.path import basename, exists, expanduser, getmtime, splitext
-from pickle import load, dump
-from pipes import quote as shellquote
-from subprocess import check_output
 try:
     from urllib.parse import quote  # Python 3
 except ImportError:
     from urllib import quote  # Python 2
 
-from tex import (find_tex_packages, find_tex_directives, find_file_to_typeset)
+from launcher import check_output
 
 
 # -- Functions ----------------------------------------------------------------
@@ -78,16 +75,14 @@ def get_documentation_files(texmf_directory):
     Examples:
 
         >>> texmf_directory = check_output(
-        ...     "kpsewhich --expand-path '$TEXMFMAIN'", shell=True,
-        ...     universal_newlines=True).strip()
+        ...     ['kpsewhich', '--expand-path', '$TEXMFMAIN']).strip()
         >>> documentation_files = get_documentation_files(texmf_directory)
         >>> print(documentation_files['scrguide']) # doctest:+ELLIPSIS
         /.../scrguide.pdf
 
     """
-    doc_files = check_output("find -E {} -regex '.*\.(pdf|dvi)' -type f".
-                             format(shellquote(texmf_directory)),
-                             shell=True, universal_newlines=True).splitlines()
+    doc_files = check_output(['find', '-E', texmf_directory, '-regex',
+                              '.*\.(pdf|dvi)', '-type', 'f']).splitlines()
     return {basename(splitext(line)[0]): line.strip() for line in doc_files}
 
 
@@ -126,8 +121,7 @@ def parse_texdoctk_data(documentation_files, texmf_directory):
     Examples:
 
         >>> texmf_directory = check_output(
-        ...     "kpsewhich --expand-path '$TEXMFMAIN'", shell=True,
-        ...     universal_newlines=True).strip()
+        ...     ['kpsewhich', '--expand-path', '$TEXMFMAIN']).strip()
         >>> paths, descriptions, headings = parse_texdoctk_data(
         ...     get_documentation_files(texmf_directory), texmf_directory)
         >>> print(paths['beamer']) # doctest:+ELLIPSIS
@@ -139,8 +133,8 @@ def parse_texdoctk_data(documentation_files, texmf_directory):
 
     """
     texdoc_path = check_output(
-        "kpsewhich --progname=texdoctk --format='other text files' " +
-        "texdoctk.dat", shell=True, universal_newlines=True).strip()
+        ['kpsewhich', '--progname=texdoctk', '--format=other text files',
+         'texdoctk.dat']).strip()
 
     paths = {}
     descriptions = {}
@@ -218,20 +212,24 @@ if __name__ == '__main__':
     # documentation for that word using the the shell command `texdoc`
     tm_current_word = getenv('TM_CURRENT_WORD')
     if tm_current_word:
-        output = check_output("texdoc {}".format(shellquote(tm_current_word)),
-                              shell=True).strip()
+        output = check_output(['texdoc', tm_current_word]).strip()
         # Close the html output window on success
         if not output:
             exit(200)
 
+    from pickle import load, dump
+
+    from tex import (find_tex_packages, find_tex_directives,
+                     find_file_to_typeset)
+
     # Find all the packages included in the file or its inputs
     master_file, master_dir = find_file_to_typeset(
         find_tex_directives(getenv("TM_FILEPATH")))
     chdir(master_dir)
     packages = find_tex_packages(master_file)
 
-    texmf_directory = check_output("kpsewhich --expand-path '$TEXMFMAIN'",
-                                   shell=True, universal_newlines=True).strip()
+    texmf_directory = check_output(
+        ['kpsewhich', '--expand-path', '$TEXMFMAIN']).strip()
     docdbpath = "{}/Library/Caches/TextMate".format(expanduser('~'))
     docdbfile = "{}/latexdocindex".format(docdbpath)
 
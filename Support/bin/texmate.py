@@ -25,6 +25,8 @@
 #   one of these patterns matches then the corresponding method is called. This
 #   method is also stored in the dictionary. Pattern matching callback methods
 #   must each take the match object as well as the current line as a parameter.
+#   The callback methods report their findings as events (see `events.py`),
+#   which `parse_stream` renders as HTML.
 #
 #   Original Author: Brad Miller
 # -----------------------------------------------------------------------------
@@ -39,41 +41,25 @@ from os import sys, path
 sys.path.insert(1, path.dirname(path.dirname(path.abspath(__file__))) +
                 "/lib/Python")
 
-from argparse import ArgumentParser, ArgumentTypeError
-from glob import glob
+if __name__ == '__main__':
+    # Let a running server (see `texmated.py`) handle the command. This saves
+    # the time needed to start Python and import the modules below.
+    from commandserver import forward
+    status = forward(sys.argv)
+    if status is not None:
+        sys.exit(status)
+
+# Only modules used by every command are imported here. All other modules are
+# imported by the functions using them, so commands like `version` or `sync`
+# do not pay for importing the parsers (see `Tests/Benchmark/startup.py`).
+
 from io import open
-from os import chdir, getcwd, getenv, putenv, remove, EX_OSFILE  # noqa
+from os import (chdir, devnull, environ, getcwd, getenv, remove,  # noqa
+                EX_OSFILE)
 from os.path import (basename, dirname, exists, getmtime, isfile, normpath,
                      realpath, splitext)
-from pickle import load, dump
-from pipes import quote as shellquote
 from re import match, search
-from subprocess import call, check_output, Popen, PIPE, STDOUT
 from sys import exit, version_info
-from textwrap import dedent
-try:
-    from urllib.parse import quote  # Python 3
-except ImportError:
-    from urllib import quote  # Python 2
-
-from auxiliary import remove_auxiliary_files
-from gutter import update_marks
-from parsing import (BibTexParser, BiberParser, ChkTexParser, LaTexParser,
-                     MakeGlossariesParser, MakeIndexParser, LaTexMkParser)
-from tex import (find_file_to_typeset, find_tex_directives, find_tex_packages)
-from tmprefs import Preferences
-
-
-# -- Module Import ------------------------------------------------------------
-
-try:
-    # Python 2
-    import sys
-    reload(sys)
-    sys.setdefaultencoding("utf-8")
-except NameError:
-    # Python 3
-    pass
 
 # -- Exit Codes ---------------------------------------------------------------
 
@@ -81,10 +67,148 @@ EXIT_SUCCESS = 0
 EXIT_TEX_ENGINE_NOT_FOUND = 1
 EXIT_DISCARD = 200
 EXIT_SHOW_TOOL_TIP = 206
+EXIT_PROGRAM_NOT_FOUND = 127
 
 
 # -- Functions ----------------------------------------------------------------
 
+def collect_run(command, parser_class, verbose=False):
+    """Run ``command`` and collect the events of its output.
+
+    This function returns the parser used to read the output of the command,
+    the events reported by this parser and the return value of the command.
+
+    Arguments:
+
+        command
+
+            The program that should be executed and its arguments.
+
+        parser_class
+
+            The subclass of ``TexParser`` that should read the output of the
+            command. For parsers that need the name of the tex file use
+            ``functools.partial`` to specify it (``filename=...``).
+
+        verbose
+
+            Specifies if the parser should report all output of the command.
+
+    Returns: ``(TexParser, [Event], int)``
+
+    """
+    from launcher import Process, PIPE, STDOUT
+
+    run_object = Process(command, stdout=PIPE, stdin=PIPE, stderr=STDOUT)
+    parser = parser_class(run_object.stdout, verbose)
+    events = list(parser.events())
+    return parser, events, run_object.wait()
+
+
+def report_runs(runs):
+    """Print the output of tool runs and return their combined status.
+
+    This function returns the combined return value of the tools, a value
+    specifying if there was a fatal error and the total number of errors and
+    warnings.
+
+    Arguments:
+
+        runs
+
+            An iterable containing tuples of the form ``(title, parser,
+            events, status)``, where ``parser``, ``events`` and ``status``
+            are the values returned by ``collect_run``. If ``title`` is not
+            ``None``, then we print it as heading in front of the output of
+            the tool.
+
+    Returns: ``(int, bool, int, int)``
+
+    """
+    stat, fatal, errors, warnings = 0, False, 0, 0
+    for title, parser, events, status in runs:
+        if title is not None:
+            print('<h4>Processing: {} </h4>'.format(title))
+        parser.render(events)
+        fatal |= parser.fatal_error
+        errors += parser.number_errors
+        warnings += parser.number_warnings
+        stat |= status
+    return stat, fatal, errors, warnings
+
+
+def collect_concurrently(runs, verbose=False):
+    """Run several tools concurrently and collect their output.
+
+    The tools run in a pool of threads containing one thread per CPU. This
+    function returns the results of the tools in the order of ``runs`` (see
+    ``report_runs``).
+
+    Arguments:
+
+        runs
+
+            A list of tuples of the form ``(title, command, parser_class)``
+            (see ``collect_run`` and ``report_runs``).
+
+        verbose
+
+            Specifies if the parsers should report all output of the tools.
+
+    Returns: ``[(str, TexParser, [Event], int)]``
+
+    """
+    if not runs:
+        return []
+    from multiprocessing import cpu_count
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(min(cpu_count(), len(runs)))
+    try:
+        return [(title,) + result for (title, _, _), result in zip(
+            runs, pool.map(lambda run: collect_run(run[1], run[2], verbose),
+                           runs))]
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_concurrently(runs, verbose=False):
+    """Run several tools concurrently and report their output in order.
+
+    In contrast to ``collect_concurrently`` this function prints the output
+    of every tool as soon as the tool and all tools in front of it are done.
+
+    Arguments:
+
+        runs
+
+            A list of tuples of the form ``(title, command, parser_class)``
+            (see ``collect_run`` and ``report_runs``).
+
+        verbose
+
+            Specifies if the parsers should report all output of the tools.
+
+    Returns: ``(int, bool, int, int)``
+
+    """
+    if not runs:
+        return 0, False, 0, 0
+    from multiprocessing import cpu_count
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(min(cpu_count(), len(runs)))
+    try:
+        results = pool.imap(lambda run: collect_run(run[1], run[2], verbose),
+                            runs)
+        return report_runs((title,) + next(results)
+                           for title, _, _ in runs)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def run_bibtex(filename, verbose=False):
     """Run bibtex for a certain file.
 
@@ -126,24 +250,41 @@ def run_bibtex(filename, verbose=False):
         >>> chdir('../..')
 
     """
+    return run_concurrently(bibtex_runs(filename), verbose)
+
+
+def bibtex_runs(filename):
+    """Return the bibtex runs needed for a certain file.
+
+    Documents using bibunits or multibib contain one aux file per unit. This
+    function returns one run for every aux file (see ``run_concurrently``).
+
+    Arguments:
+
+        filename
+
+            Specifies the name of the tex file without its extension.
+
+    Returns: ``[(str, [str], type)]``
+
+    Examples:
+
+        >>> chdir('Tests/TeX')
+        >>> for title, command, _ in bibtex_runs('external_bibliography'):
+        ...     print(title, ' '.join(command))
+        ./external_bibliography.aux bibtex ./external_bibliography.aux
+        >>> chdir('../..')
+
+    """
+    from glob import glob
+
+    from parsing import BibTexParser
+
     directory = dirname(filename) if dirname(filename) else '.'
     regex_auxfiles = (r'.*/({}|bu\d+)\.aux$'.format(filename))
-    auxfiles = [f for f in glob("{}/*.aux".format(directory))
-                if match(regex_auxfiles, f)]
-
-    stat, fatal, errors, warnings = 0, False, 0, 0
-    for bib in auxfiles:
-        print('<h4>Processing: {} </h4>'.format(bib))
-        run_object = Popen("bibtex {}".format(shellquote(bib)), shell=True,
-                           stdout=PIPE, stdin=PIPE, stderr=STDOUT,
-                           close_fds=True, universal_newlines=True)
-        bp = BibTexParser(run_object.stdout, verbose)
-        f, e, w = bp.parse_stream()
-        fatal |= f
-        errors += e
-        warnings += w
-        stat |= run_object.wait()
-    return stat, fatal, errors, warnings
+    auxfiles = sorted(f for f in glob("{}/*.aux".format(directory))
+                      if match(regex_auxfiles, f))
+    return [(bib, ['bibtex', bib], BibTexParser) for bib in auxfiles]
 
 
 def run_biber(filename, verbose=False):
@@ -157,8 +298,9 @@ def run_biber(filename, verbose=False):
 
         >>> chdir('Tests/TeX')
         >>> # Generate files for biber
-        >>> call('pdflatex external_bibliography_biber.tex > /dev/null',
-        ... shell=True)
+        >>> from launcher import call
+        >>> call(['pdflatex', 'external_bibliography_biber.tex'],
+        ...      stdout=open(devnull, 'w'))
         0
         >>> run_biber('external_bibliography_biber') # doctest:+ELLIPSIS
         <...
@@ -167,9 +309,12 @@ def run_biber(filename, verbose=False):
         >>> chdir('../..')
 
     """
-    run_object = Popen("biber {}".format(shellquote(filename)), shell=True,
-                       stdout=PIPE, stdin=PIPE, stderr=STDOUT, close_fds=True,
-                       universal_newlines=True)
+    from launcher import Process, PIPE, STDOUT
+
+    from parsing import BiberParser
+
+    run_object = Process(['biber', filename], stdout=PIPE, stdin=PIPE,
+                         stderr=STDOUT)
     bp = BiberParser(run_object.stdout, verbose)
     fatal, errors, warnings = bp.parse_stream()
     stat = run_object.wait()
@@ -201,6 +346,8 @@ def run_latex(ltxcmd, texfile, cache_filename, verbose=False):
         ltxcmd
 
             The latex command which should be used translate ``texfile``.
+            We split this string into arguments like a shell would, but do
+            not run it in a shell.
 
         texfile
 
@@ -220,9 +367,14 @@ def run_latex(ltxcmd, texfile, cache_filename, verbose=False):
         >>> chdir('../..')
 
     """
-    run_object = Popen("{} {}".format(ltxcmd, shellquote(texfile)),
-                       shell=True, stdout=PIPE, stdin=PIPE, stderr=STDOUT,
-                       close_fds=True, universal_newlines=True)
+    from shlex import split
+
+    from gutter import update_marks
+    from launcher import Process, PIPE, STDOUT
+    from parsing import LaTexParser
+
+    run_object = Process(split(ltxcmd) + [texfile], stdout=PIPE, stdin=PIPE,
+                         stderr=STDOUT)
     lp = LaTexParser(run_object.stdout, verbose, texfile)
     fatal, errors, warnings = lp.parse_stream()
     stat = run_object.wait()
@@ -261,10 +413,11 @@ def run_makeindex(filename, verbose=False):
         >>> chdir('../..')
 
     """
-    run_object = Popen("makeindex {}".format(shellquote("{}.idx".format(
-        splitext(filename)[0]))), shell=True,
-        stdout=PIPE, stdin=PIPE, stderr=STDOUT, close_fds=True,
-        universal_newlines=True)
+    from launcher import Process, PIPE, STDOUT
+    from parsing import MakeIndexParser
+
+    run_object = Process(['makeindex', '{}.idx'.format(splitext(filename)[0])],
+                         stdout=PIPE, stdin=PIPE, stderr=STDOUT)
     ip = MakeIndexParser(run_object.stdout, verbose)
     fatal, errors, warnings = ip.parse_stream()
     stat = run_object.wait()
@@ -300,16 +453,363 @@ def run_makeglossaries(filename, verbose=False):
         >>> chdir('../..')
 
     """
-    run_object = Popen("makeglossaries {}".format(
-                       shellquote(splitext(filename)[0])),
-                       shell=True, stdout=PIPE, stdin=PIPE, stderr=STDOUT,
-                       close_fds=True, universal_newlines=True)
+    from launcher import Process, PIPE, STDOUT
+    from parsing import MakeGlossariesParser
+
+    run_object = Process(['makeglossaries', splitext(filename)[0]],
+                         stdout=PIPE, stdin=PIPE, stderr=STDOUT)
     bp = MakeGlossariesParser(run_object.stdout, verbose)
     fatal, errors, warnings = bp.parse_stream()
     stat = run_object.wait()
     return stat, fatal, errors, warnings
 
 
+def find_index_files(filename):
+    """Return the index files written by the last latex run for ``filename``.
+
+    Packages like ``imakeidx``, ``splitidx`` or ``multind`` write several
+    index files. TeX records every file it opens for writing in the log file
+    (``\\openout1 = `name.idx'.``). If there is no log file, then we only
+    look for the default index file of ``filename``.
+
+    Arguments:
+
+        filename
+
+            The name of the tex file for which we want to generate indexes.
+
+    Returns: ``[str]``
+
+    Examples:
+
+        >>> chdir('Tests/TeX')
+        >>> print(find_index_files('makeindex.tex')[0])
+        makeindex.idx
+        >>> find_index_files('makeglossaries.tex') == []
+        True
+        >>> chdir('../..')
+
+    """
+    file_without_suffix = splitext(filename)[0]
+    index_files = []
+    try:
+        with open('{}.log'.format(file_without_suffix), encoding='utf-8',
+                  errors='replace') as log:
+            for line in log:
+                matching = match(r"\\openout\d+ = `?(.+?\.idx)'?\.$",
+                                 line.rstrip())
+                if matching and matching.group(1) not in index_files:
+                    index_files.append(matching.group(1))
+    except IOError:
+        pass
+    default = '{}.idx'.format(file_without_suffix)
+    if not index_files and exists(default):
+        index_files.append(default)
+    return [index_file for index_file in index_files if exists(index_file)]
+
+
+def run_index(filename, verbose=False):
+    """Create all indexes and glossaries of the given file.
+
+    We run ``makeglossaries`` if the document contains glossaries and
+    ``makeindex`` for every index file (see ``find_index_files``). All
+    tools run concurrently (see ``run_concurrently``).
+
+    The interface of this function is exactly the same as the one for
+    ``run_makeindex``. For the list of arguments and return values, please
+    take a look at ``run_makeindex``.
+
+    Examples:
+
+        >>> chdir('Tests/TeX')
+        >>> run_index('makeindex.tex') # doctest:+ELLIPSIS
+        <p class="info">Run...Makeindex...
+        (0, False, 0, 0)
+        >>> chdir('../..')
+
+    """
+    return run_concurrently(index_runs(filename), verbose)
+
+
+def index_runs(filename):
+    """Return the runs of makeglossaries and makeindex for a certain file.
+
+    Arguments:
+
+        filename
+
+            The name of the tex file for which we want to generate indexes.
+
+    Returns: ``[(str, [str], type)]``
+
+    Examples:
+
+        >>> chdir('Tests/TeX')
+        >>> for title, command, _ in index_runs('makeindex.tex'):
+        ...     print(title, ' '.join(command))
+        None makeindex makeindex.idx
+        >>> chdir('../..')
+
+    """
+    from parsing import MakeGlossariesParser, MakeIndexParser
+
+    file_without_suffix = splitext(filename)[0]
+    runs = []
+    glossary_file = '{}.glo'.format(file_without_suffix)
+    if exists(glossary_file):
+        runs.append((glossary_file, ['makeglossaries', file_without_suffix],
+                     MakeGlossariesParser))
+    runs.extend((index_file, ['makeindex', index_file], MakeIndexParser)
+                for index_file in find_index_files(filename))
+    if len(runs) == 1:
+        runs = [(None, command, parser_class)
+                for _, command, parser_class in runs]
+    return runs
+
+
+def run_build(ltxcmd, texfile, cache_filename, verbose=False, max_runs=5,
+              draftcmd=None):
+    """Typeset ``texfile``, create its bibliography and indexes and typeset it
+    again until its cross-references are resolved.
+
+    The steps of the build form the following graph:
+
+        latex → {bibtex or biber, makeindex and makeglossaries} → latex …
+
+    The tools creating the bibliography, the indexes and the glossaries do
+    not depend on each other, so they run concurrently (see
+    ``build.run_tasks``). We report the output of every step after it is
+    done. If the first latex run fails fatally, then we stop the build.
+
+    We typeset the document again as long as a latex run changes the
+    cross-reference data in the auxiliary files (see
+    ``incremental.references_digest``) or the tools changed one of their
+    output files. If the first run neither changed the references nor
+    needed a tool, then we typeset the document only once.
+
+    If ``draftcmd`` is not ``None``, then additional runs that only resolve
+    the references use this command, which should run the engine in draft
+    mode. These runs only write the auxiliary files. We only know that
+    another run follows after a run that changed the references, so the
+    first additional run always uses ``ltxcmd``. A document whose references
+    are resolved after one additional run therefore still needs only two
+    runs. If a run in draft mode resolves the references, then a final run
+    of ``ltxcmd`` creates the PDF.
+
+    The arguments of this function are the same as the ones of
+    ``run_latex``. In addition this function takes the maximum number of
+    latex runs ``max_runs`` and returns the number of latex runs after the
+    values returned by ``run_latex``. The number of errors and warnings
+    includes the messages of all steps.
+
+    Returns: ``(int, bool, int, int, int)``
+
+    """
+    from functools import partial
+    from shlex import split
+
+    from build import run_tasks, Task
+    from gutter import update_marks
+    from incremental import (outdated, references_digest, snapshot,
+                             tool_outputs)
+    from parsing import BiberParser, LaTexParser
+
+    file_without_suffix = splitext(texfile)[0]
+    latex = [(None, split(ltxcmd) + [texfile],
+              partial(LaTexParser, filename=texfile))]
+    draft = ([(None, split(draftcmd) + [texfile],
+               partial(LaTexParser, filename=texfile))]
+             if draftcmd else None)
+    first_run = {}
+
+    def failed(results):
+        return any(parser.fatal_error
+                   for _, parser, _, _ in results.get('latex', []))
+
+    def typeset(results):
+        references = references_digest(file_without_suffix)
+        runs = collect_concurrently(latex, verbose)
+        first_run['changed'] = references_digest(
+            file_without_suffix) != references
+        # Remember the output of the tools before they run
+        first_run['outputs'] = snapshot(tool_outputs(
+            [bib for bib, _, _ in bibtex_runs(file_without_suffix)] +
+            find_index_files(texfile) +
+            ['{}.glo'.format(file_without_suffix)]))
+        return runs
+
+    def settle(results):
+        if failed(results):
+            return []
+        runs = []
+        changed = first_run['changed'] or outdated(first_run['outputs'])
+        drafted = False
+        while changed and len(runs) + 1 < max_runs:
+            # Only runs after a run that changed the references use draft
+            # mode. Keep one run for the final PDF.
+            drafted = bool(draft) and bool(runs) and len(runs) + 2 < max_runs
+            references = references_digest(file_without_suffix)
+            runs.extend(collect_concurrently(draft if drafted else latex,
+                                             verbose))
+            if runs[-1][1].fatal_error:
+                return runs
+            changed = references_digest(file_without_suffix) != references
+        if drafted:
+            runs.extend(collect_concurrently(latex, verbose))
+        return runs
+
+    def bibliography(results):
+        if failed(results):
+            return []
+        if exists('{}.bcf'.format(file_without_suffix)):
+            return collect_concurrently(
+                [(None, ['biber', file_without_suffix], BiberParser)],
+                verbose)
+        return collect_concurrently(bibtex_runs(file_without_suffix),
+                                    verbose)
+
+    def index(results):
+        if failed(results):
+            return []
+        return collect_concurrently(index_runs(texfile), verbose)
+
+    steps = []
+    results = run_tasks([
+        Task('latex', typeset),
+        Task('bibliography', bibliography, ['latex']),
+        Task('index', index, ['latex']),
+        Task('final latex', settle, ['latex', 'bibliography', 'index'])],
+        report=lambda task, runs: steps.append(report_runs(runs)))
+    parser = (results['final latex'] or results['latex'])[-1][1]
+    update_marks(cache_filename, parser.marks)
+    stat, fatal, errors, warnings = 0, False, 0, 0
+    for step_stat, step_fatal, step_errors, step_warnings in steps:
+        stat |= step_stat
+        fatal |= step_fatal
+        errors += step_errors
+        warnings += step_warnings
+    return (stat, fatal, errors, warnings,
+            1 + len(results['final latex']))
+
+
+def run_incremental(ltxcmd, texfile, cache_filename, verbose=False,
+                    max_runs=5, draftcmd=None):
+    """Typeset ``texfile`` and run only the steps whose input changed.
+
+    We run latex with the option ``-recorder`` and store fingerprints of all
+    files it read in the cache of the project (see ``incremental.py``). If no
+    recorded input changed, all recorded outputs still exist and the input
+    of the bibliography and index tools did not change, then we do not run
+    anything at all. Otherwise we typeset the document and create the
+    bibliography and the indexes, if the data read by bibtex, biber,
+    makeindex or makeglossaries changed. Like ``run_build`` we typeset the
+    document again until its cross-references are resolved.
+
+    We only store the state of a build that finished without errors and
+    with resolved references, so such a document is always typeset again.
+
+    The arguments and return values of this function are the same as the
+    ones of ``run_build``. Like ``run_build`` we only use ``draftcmd`` for
+    runs that follow a run, which changed the references.
+
+    Returns: ``(int, bool, int, int, int)``
+
+    """
+    from functools import partial
+    from shlex import split
+
+    from gutter import update_marks
+    from incremental import (bibliography_inputs, index_inputs, load_state,
+                             outdated, read_recorder_file,
+                             references_digest, snapshot, store_state,
+                             tool_outputs)
+    from parsing import BiberParser, LaTexParser
+
+    file_without_suffix = splitext(texfile)[0]
+    command = split(ltxcmd) + ['-recorder', texfile]
+
+    def tool_inputs():
+        """Return the files and the input digests of the tools."""
+        auxfiles = [bib for bib, _, _ in bibtex_runs(file_without_suffix)]
+        index_files = [index_file for index_file in
+                       ['{}.glo'.format(file_without_suffix)] +
+                       find_index_files(texfile) if exists(index_file)]
+        return (auxfiles, index_files,
+                bibliography_inputs(file_without_suffix, auxfiles),
+                index_inputs(index_files))
+
+    state = load_state(cache_filename, command)
+    if (state and not outdated(state['inputs']) and
+            all(exists(output) for output in state['outputs'])):
+        # Latex never reads the sources of the bibliography and the indexes
+        _, _, bibliography, index = tool_inputs()
+        if (bibliography == state['bibliography'] and
+                index == state['index']):
+            print('<p class="info">{} is up to date</p>'.format(texfile))
+            return 0, False, 0, 0, 0
+
+    draft = split(draftcmd) + ['-recorder', texfile] if draftcmd else None
+    recorder_file = '{}.fls'.format(file_without_suffix)
+    steps = []
+
+    def typeset(arguments):
+        references = references_digest(file_without_suffix)
+        results = collect_concurrently(
+            [(None, arguments, partial(LaTexParser, filename=texfile))],
+            verbose)
+        steps.append(report_runs(results))
+        return (results[0][1],
+                references_digest(file_without_suffix) != references)
+
+    parser, changed = typeset(command)
+    number_runs = 1
+    if not parser.fatal_error:
+        auxfiles, index_files, bibliography, index = tool_inputs()
+        runs = []
+        if bibliography and bibliography != state.get('bibliography'):
+            runs.extend(
+                [(None, ['biber', file_without_suffix], BiberParser)]
+                if exists('{}.bcf'.format(file_without_suffix)) else
+                bibtex_runs(file_without_suffix))
+        if index and index != state.get('index'):
+            runs.extend(index_runs(texfile))
+        if runs:
+            outputs = snapshot(tool_outputs(auxfiles + index_files))
+            steps.append(report_runs(collect_concurrently(runs, verbose)))
+            changed |= bool(outdated(outputs))
+        drafted = False
+        while changed and number_runs < max_runs and not parser.fatal_error:
+            # Only runs after a run that changed the references use draft
+            # mode. Keep one run for the final PDF.
+            drafted = bool(draft) and 1 < number_runs < max_runs - 1
+            parser, changed = typeset(draft if drafted else command)
+            number_runs += 1
+        if drafted and not parser.fatal_error:
+            parser, changed = typeset(command)
+            number_runs += 1
+
+    update_marks(cache_filename, parser.marks)
+    stat, fatal, errors, warnings = 0, False, 0, 0
+    for step_stat, step_fatal, step_errors, step_warnings in steps:
+        stat |= step_stat
+        fatal |= step_fatal
+        errors += step_errors
+        warnings += step_warnings
+
+    if stat == 0 and not fatal and errors == 0 and not changed:
+        inputs, outputs = read_recorder_file(recorder_file)
+        _, _, bibliography, index = tool_inputs()
+        store_state(cache_filename, {
+            'command': command,
+            'inputs': snapshot(inputs, state.get('inputs', {})),
+            'outputs': outputs,
+            'bibliography': bibliography,
+            'index': index})
+    else:
+        store_state(cache_filename, {})
+    return stat, fatal, errors, warnings, number_runs
+
+
 def get_app_path(application, tm_support_path=getenv("TM_SUPPORT_PATH")):
     """Get the absolute path of the specified application.
 
@@ -334,10 +834,11 @@ def get_app_path(application, tm_support_path=getenv("TM_SUPPORT_PATH")):
         >>> get_app_path('NonExistentApp') # Returns ``None``
 
     """
+    from launcher import check_output
+
     try:
-        return check_output("'{}/bin/find_app' '{}.app'".format(
-                            tm_support_path, application),
-                            shell=True, universal_newlines=True).strip()
+        return check_output(['{}/bin/find_app'.format(tm_support_path),
+                             '{}.app'.format(application)]).strip()
     except:
         return None
 
@@ -350,8 +851,8 @@ def get_app_path_and_sync_command(viewer, path_pdf, path_tex_file,
 
         - the full path to the application, and
 
-        - a command which can be used to show the PDF output corresponding to
-          ``line_number`` inside tex file.
+        - a command (a list of arguments) which can be used to show the PDF
+          output corresponding to ``line_number`` inside tex file.
 
     If one of these two variables could not be determined, then the
     corresponding value will be set to ``None``.
@@ -381,9 +882,9 @@ def get_app_path_and_sync_command(viewer, path_pdf, path_tex_file,
         # We assume that Skim is installed
         >>> app_path, sync_command = get_app_path_and_sync_command(
         ...     'Skim', 'test.pdf', 'test.tex', 1)
-        >>> print('({}, {})'.format(app_path,
-        ...                         sync_command)) # doctest:+ELLIPSIS
-        (.../Skim.app, .../Skim.app/.../displayline' 1 test.pdf test.tex)
+        >>> print('({}, {})'.format(app_path, ' '.join(
+        ...     sync_command))) # doctest:+ELLIPSIS
+        (.../Skim.app, .../Skim.app/.../displayline 1 test.pdf test.tex)
 
         # Preview has no pdfsync support
         >>> app_path, sync_command = get_app_path_and_sync_command(
@@ -396,9 +897,9 @@ def get_app_path_and_sync_command(viewer, path_pdf, path_tex_file,
     sync_command = None
     path_to_viewer = get_app_path(viewer)
     if path_to_viewer and viewer == 'Skim':
-        sync_command = ("'{}/Contents/SharedSupport/displayline' ".format(
-                        path_to_viewer) + "{} {} {}".format(line_number,
-                        shellquote(path_pdf), shellquote(path_tex_file)))
+        sync_command = ['{}/Contents/SharedSupport/displayline'.format(
+                        path_to_viewer), '{}'.format(line_number), path_pdf,
+                        path_tex_file]
     return path_to_viewer, sync_command
 
 
@@ -433,7 +934,8 @@ def refresh_viewer(viewer, pdf_path,
 
         >>> # The viewer application needs to be open before we call the
         >>> # function
-        >>> call('open -a Skim', shell=True)
+        >>> from launcher import call
+        >>> call(['open', '-a', 'Skim'])
         0
         >>> refresh_viewer('Skim', 'test.pdf',
         ...                tm_bundle_support=realpath('Support'))
@@ -441,13 +943,14 @@ def refresh_viewer(viewer, pdf_path,
         0
 
     """
+    from launcher import call
+
     print('<p class="info">Tell {} to refresh \'{}\'</p>'.format(viewer,
                                                                  pdf_path))
 
     if viewer in ['Skim', 'TeXShop']:
-        return call("osascript '{}/bin/refresh_viewer.scpt' {} {} ".format(
-                    tm_bundle_support, viewer, shellquote(pdf_path)),
-                    shell=True)
+        return call(['osascript', '{}/bin/refresh_viewer.scpt'.format(
+                     tm_bundle_support), viewer, pdf_path])
     return 1
 
 
@@ -486,8 +989,9 @@ def run_viewer(viewer, texfile_path, pdffile_path,
 
     Examples:
 
+        >>> from launcher import call
         >>> chdir('Tests/TeX')
-        >>> call("xelatex ünicöde.tex > /dev/null", shell=True)
+        >>> call(['xelatex', 'ünicöde.tex'], stdout=open(devnull, 'w'))
         0
         >>> for viewer in ['Skim', 'TextMate']: # doctest: +ELLIPSIS
         ...     run_viewer(viewer, './ünicöde.tex', './ünicöde.pdf',
@@ -502,6 +1006,12 @@ def run_viewer(viewer, texfile_path, pdffile_path,
         >>> chdir('../..')
 
     """
+    from launcher import call
+    try:
+        from urllib.parse import quote  # Python 3
+    except ImportError:
+        from urllib import quote  # Python 2
+
     status = 0
 
     if viewer == 'TextMate':
@@ -522,18 +1032,18 @@ def run_viewer(viewer, texfile_path, pdffile_path,
                 # If this is not done, the next line will thrown an encoding
                 # exception when the PDF file contains non-ASCII characters.
                 viewer = viewer.encode('utf-8')
-            pdf_already_open = not(bool(
-                call("'{}/bin/check_open' '{}' {} > /dev/null".format(
-                     tm_bundle_support, viewer, shellquote(pdffile_path)),
-                     shell=True)))
+            with open(devnull, 'w') as null:
+                pdf_already_open = not(bool(call(
+                    ['{}/bin/check_open'.format(tm_bundle_support), viewer,
+                     pdffile_path], stdout=null)))
             if pdf_already_open:
                 refresh_viewer(viewer, pdffile_path)
             else:
-                status = call("open -a '{}.app' {}".format(viewer,
-                              shellquote(pdffile_path)), shell=True)
+                status = call(['open', '-a', '{}.app'.format(viewer),
+                               pdffile_path])
             # PDF viewer supports pdfsync
             if sync_command and use_pdfsync:
-                call(sync_command, shell=True)
+                call(sync_command)
             elif not sync_command and use_pdfsync:
                 print("{} does not supported pdfsync".format(viewer))
 
@@ -544,7 +1054,8 @@ def run_viewer(viewer, texfile_path, pdffile_path,
     return status
 
 
-def construct_engine_options(ts_directives, tm_engine_options, synctex=True):
+def construct_engine_options(ts_directives, tm_engine_options, synctex=True,
+                             draftmode=False):
     """Construct a string of command line options.
 
     The options come from two different sources:
@@ -573,6 +1084,10 @@ def construct_engine_options(ts_directives, tm_engine_options, synctex=True):
 
             Specifies if synctex should be used for typesetting or not.
 
+        draftmode
+
+            Specifies if the engine should only write auxiliary files
+            instead of a PDF. Passes in draft mode never use synctex.
 
     Returns: ``str``
 
@@ -588,10 +1103,12 @@ def construct_engine_options(ts_directives, tm_engine_options, synctex=True):
         -interaction=nonstopmode -file-line-error-style -draftmode
         >>> print(construct_engine_options({}, '-8bit'))
         -interaction=nonstopmode -file-line-error-style -synctex=1 -8bit
+        >>> print(construct_engine_options({}, '', True, draftmode=True))
+        -interaction=nonstopmode -file-line-error-style -draftmode
 
     """
     options = "-interaction=nonstopmode -file-line-error-style{}".format(
-        ' -synctex=1' if synctex else '')
+        ' -draftmode' if draftmode else ' -synctex=1' if synctex else '')
 
     if 'TS-options' in ts_directives:
         options += ' {}'.format(ts_directives['TS-options'])
@@ -647,6 +1164,8 @@ def construct_engine_command(ts_directives, tm_engine, packages):
         latex
 
     """
+    from toolchain import probe
+
     latex_indicators = {'xyling', 'pst-asr', 'OTtablx'}
     xelatex_indicators = {'xunicode'}
     lualatex_indicators = {'luacode'}
@@ -664,7 +1183,7 @@ def construct_engine_command(ts_directives, tm_engine, packages):
     else:
         engine = tm_engine
 
-    if call("type {} > /dev/null".format(engine), shell=True) != 0:
+    if not probe(engine)['exists']:
         print('''<p class="error">Error: {} was not found,
                  Please make sure that LaTeX is installed and your PATH is
                  setup properly.</p>'''.format(engine))
@@ -701,6 +1220,8 @@ def write_latexmkrc(engine, options, location='/tmp/latexmkrc'):
         ...
 
     """
+    from textwrap import dedent
+
     with open("/tmp/latexmkrc", 'w', encoding='utf-8') as latexmkrc:
         latexmkrc.write(dedent("""\
         $latex = 'latex -interaction=nonstopmode -file-line-error-style {0}';
@@ -748,6 +1269,12 @@ def get_typesetting_data(filepath, tm_engine,
         >>> chdir(current_directory)
 
     """
+    from pickle import load, dump
+
+    from tex import (find_file_to_typeset, find_tex_directives,
+                     find_tex_packages)
+    from toolchain import probe
+
     def get_cached_data():
         """Get current data and update cache."""
         cache_read = False
@@ -773,8 +1300,7 @@ def get_typesetting_data(filepath, tm_engine,
             packages = find_tex_packages(filename, ignore_warnings)
             engine = construct_engine_command(typesetting_directives,
                                               tm_engine, packages)
-            synctex = not(bool(call("{} --help | grep -q synctex".format(
-                                    engine), shell=True)))
+            synctex = probe(engine)['synctex']
             typesetting_data.update({'engine': engine,
                                      'packages': packages,
                                      'synctex': synctex})
@@ -805,7 +1331,7 @@ def get_typesetting_data(filepath, tm_engine,
     texinputs = "{}:{}/tex//".format(
         getenv('TEXINPUTS') if getenv('TEXINPUTS') else '.::',
         tm_bundle_support)
-    putenv('TEXINPUTS', texinputs)
+    environ['TEXINPUTS'] = texinputs
 
     typesetting_data.update({'cache_filename': cache_filename,
                              'filename': filename,
@@ -838,6 +1364,7 @@ def get_command_line_arguments():
     Returns: ``Namespace``
 
     """
+    from argparse import ArgumentParser, ArgumentTypeError
 
     def file_exists(filename):
         if not exists(filename):
@@ -849,24 +1376,43 @@ def get_command_line_arguments():
     parser_file.add_argument(
         'filepath', type=file_exists, nargs='?', default=getenv('TM_FILEPATH'),
         help='Specify the file which should be processed.')
-    parser_latex = ArgumentParser(add_help=False)
-    parser_latex.add_argument(
-        '-latexmk', default=None,
-        choices={'yes', 'no'},
-        help='''Specify if latexmk should be used to translate the document.
-                If you do not set this option, then value set inside
-                TextMate will be used.''')
-    parser_latex.add_argument(
+    parser_engine = ArgumentParser(add_help=False)
+    parser_engine.add_argument(
         '-engine', default=None,
         choices={'latex', 'lualatex', 'pdflatex', 'xelatex', 'texexec'},
         help='''Set the default engine for tex documents. If you do not set
                 this option explicitly, then the value currently set inside the
                 TextMate preferences will be used.''')
-    parser_latex.add_argument(
+    parser_engine.add_argument(
         '-options', default=None, dest='engine_options',
         help='''Set the default engine options for tex documents. If you do
                 not set this option explicitly, then the engine options set
                 inside the TextMate preferences will be used.''')
+    parser_engine.add_argument(
+        '-maxruns', default=5, type=int, dest='max_runs',
+        help='''Set the maximum number of latex runs used to resolve the
+                cross-references of the document.''')
+    parser_engine.add_argument(
+        '-draftpasses', action='store_true', default=False,
+        help='''Run the engine in draft mode for the runs that only resolve
+                cross-references and follow another such run. If a run in
+                draft mode resolves the references, then a final run creates
+                the PDF. This option only affects builds using at least three
+                runs and engines supporting draft mode.''')
+    parser_latex = ArgumentParser(add_help=False, parents=[parser_engine])
+    parser_latex.add_argument(
+        '-latexmk', default=None,
+        choices={'yes', 'no'},
+        help='''Specify if latexmk should be used to translate the document.
+                If you do not set this option, then value set inside
+                TextMate will be used.''')
+    parser_latex.add_argument(
+        '-incremental', action='store_true', default=None,
+        help='''Typeset the document with the incremental build of the
+                bundle instead of latexmk. The build only runs the steps
+                whose input changed since the last build. If you do not set
+                this option, then the value set inside TextMate will be
+                used.''')
 
     parser = ArgumentParser(
         description='Execute common TeX commands.')
@@ -877,10 +1423,21 @@ def get_command_line_arguments():
     parser.add_argument(
         '-suppressview', action='store_true', default=False,
         help=('''Tell %(prog)s to not open the PDF viewer application.'''))
+    parser.add_argument(
+        '-format', default='html', choices={'html', 'ndjson', 'text'},
+        help='''Specify the output format. The format `ndjson` writes one
+                JSON object for each warning or error and a final summary
+                object instead of HTML. The format `text` writes one line
+                for each message and a final summary line.''')
 
     subparsers = parser.add_subparsers(title="Commands", dest='command')
     subparsers.add_parser('bibtex', parents=[parser_file],
                           help='Run bibtex/biber for the specified file.')
+    subparsers.add_parser(
+        'build', parents=[parser_file, parser_engine],
+        help='''Typeset the specified file using latex, create its
+                bibliography, indexes and glossaries concurrently and
+                typeset it again.''')
     subparsers.add_parser('clean', parents=[parser_file],
                           help='Remove auxiliary files')
     subparsers.add_parser('chktex', parents=[parser_file],
@@ -914,12 +1471,37 @@ def get_command_line_arguments():
 # -- Main ---------------------------------------------------------------------
 
 if __name__ == '__main__':
+    try:
+        # Python 2
+        reload(sys)  # noqa
+        sys.setdefaultencoding("utf-8")
+    except NameError:
+        # Python 3
+        pass
+
+    from launcher import ProgramNotFound
+    from output import install
+    from tmprefs import Preferences
+
+    # Write the HTML output in chunks instead of line by line
+    install()
     # Get preferences from TextMate
     tm_preferences = Preferences()
     # Parse command line parameters...
     arguments = get_command_line_arguments()
 
+    renderer = None
+    if arguments.format != 'html':
+        from events import NDJSONDiagnosticRenderer, TextRenderer
+        from parsing import TexParser
+        # Write only the diagnostics to the standard output
+        renderer = TexParser.renderer = (NDJSONDiagnosticRenderer
+                                         if arguments.format == 'ndjson' else
+                                         TextRenderer)(sys.stdout)
+        sys.stdout = open(devnull, 'w')
+
     command = arguments.command
+    fatal_error = False
     viewer_status = 0
     filepath = arguments.filepath
     first_run = not arguments.addoutput
@@ -927,6 +1509,8 @@ if __name__ == '__main__':
     number_errors = 0
     number_runs = 0
     number_warnings = 0
+    # Errors and warnings of all runs, if they differ from the ones above
+    totals = None
     suppress_viewer = arguments.suppressview
     synctex = False
     tex_status = 0
@@ -934,13 +1518,21 @@ if __name__ == '__main__':
     tm_bundle_support = getenv('TM_BUNDLE_SUPPORT')
     tm_engine = tm_preferences['latexEngine']
     tm_engine_options = tm_preferences['latexEngineOptions'].strip()
+    use_incremental = False
     use_latexmk = False
     verbose = True if tm_preferences['latexVerbose'] == 1 else False
     viewer = tm_preferences['latexViewer']
 
-    if command == 'latex' or command == 'version':
-        if(arguments.latexmk == 'yes' or (not arguments.latexmk and
-                                          tm_preferences['latexUselatexmk'])):
+    if command in {'build', 'latex', 'version'}:
+        if command != 'build' and (
+                arguments.incremental or
+                (arguments.latexmk != 'yes' and
+                 tm_preferences['latexIncremental'])):
+            use_incremental = True
+        elif command != 'build' and (
+                arguments.latexmk == 'yes' or
+                (not arguments.latexmk and
+                 tm_preferences['latexUselatexmk'])):
             use_latexmk = True
             if command == 'latex':
                 command = 'latexmk'
@@ -965,11 +1557,19 @@ if __name__ == '__main__':
     pdffile_path = "{}/{}.pdf".format(file_path, file_without_suffix)
 
     if command == "version":
-        process = Popen("{} --version".format(engine), stdout=PIPE, shell=True,
-                        universal_newlines=True)
-        print(process.stdout.readline().rstrip('\n'))
+        from toolchain import probe
+
+        print(probe(engine)['version'])
         exit()
 
+    if command in {'latexmk', 'bibtex', 'build', 'index', 'latex'}:
+        from parsing import TexParser
+        from tex import get_max_print_line
+
+        # Rewrap the output of tex programs using the line length of the
+        # current tex distribution
+        TexParser.max_print_line = get_max_print_line()
+
     if command != 'sync':
         # Print out header information to begin the run
         if first_run:
@@ -987,108 +1587,145 @@ if __name__ == '__main__':
               "\\usepackage{pdfsync}</p>")
 
     problematic_characters = search('[$"]', filename)
-    if problematic_characters:
-        print('''<p class="error"><strong>
-                 The filename {0} contains a problematic character: {1}<br>
-                 Please remove all occurrences of {1} in the filename.
-                 </strong></p>
-              '''.format(filename, problematic_characters.group(0)))
-    # Run the command passed on the command line or modified by preferences
-    elif command == 'latexmk':
-        engine_options = construct_engine_options(typesetting_directives,
-                                                  tm_engine_options, synctex)
-        write_latexmkrc(engine, engine_options, '/tmp/latexmkrc')
-        latexmkrc_path = "{}/config/latexmkrc".format(tm_bundle_support)
-        command = "latexmk -pdf{} -f -r /tmp/latexmkrc -r {} {}".format(
-            'ps' if engine == 'latex' else '', shellquote(latexmkrc_path),
-            shellquote(filename))
-        process = Popen(command, shell=True, stdout=PIPE, stdin=PIPE,
-                        stderr=STDOUT, close_fds=True, universal_newlines=True)
-        command_parser = LaTexMkParser(process.stdout, verbose, filename)
-        status = command_parser.parse_stream()
-        update_marks(cache_filename, command_parser.marks)
-        fatal_error, number_errors, number_warnings = status
-        tex_status = process.wait()
-        remove("/tmp/latexmkrc")
-        if tm_autoview and number_errors < 1 and not suppress_viewer:
-            viewer_status = run_viewer(
-                viewer, filepath, pdffile_path,
-                number_errors > 1 or number_warnings > 0 and
-                tm_preferences['latexKeepLogWin'],
-                'pdfsync' in packages or synctex, line_number)
-        number_runs = command_parser.number_runs
-
-    elif command == 'bibtex':
-        use_biber = exists('{}.bcf'.format(file_without_suffix))
-        status = (run_biber(file_without_suffix) if use_biber else
-                  run_bibtex(file_without_suffix))
-        tex_status, fatal_error, number_errors, number_warnings = status
-
-    elif command == 'index':
-        use_makeglossaries = exists('{}.glo'.format(file_without_suffix))
-        status = (run_makeglossaries(filename, verbose) if use_makeglossaries
-                  else run_makeindex(filename, verbose))
-        tex_status, fatal_error, number_errors, number_warnings = status
-
-    elif command == 'clean':
-        removed_files = remove_auxiliary_files()
-        # Filter out bundle cache file (`.filename.lb`)
-        removed_files = [filepath for filepath in removed_files
-                         if not basename(filepath).startswith('.')]
-        if removed_files:
-            for removed_file in removed_files:
-                print('<p class"info">Removed {}</p>'.format(removed_file))
-        else:
-            print('<p class"info">Clean: No Auxiliary files found')
-
-    elif command == 'latex':
-        engine_options = construct_engine_options(typesetting_directives,
-                                                  tm_engine_options, synctex)
-        command = "{} {}".format(engine, engine_options)
-        status = run_latex(command, filename, cache_filename, verbose)
-        tex_status, fatal_error, number_errors, number_warnings = status
-        number_runs = 1
-
-        if engine == 'latex':
-            call("dvips {0}.dvi -o '{0}.ps'".format(file_without_suffix),
-                 shell=True)
-            call("ps2pdf '{}.ps'".format(file_without_suffix), shell=True)
-        if tm_autoview and number_errors < 1 and not suppress_viewer:
+    try:
+        if problematic_characters:
+            print('''<p class="error"><strong>
+                     The filename {0} contains a problematic character: {1}<br>
+                     Please remove all occurrences of {1} in the filename.
+                     </strong></p>
+                  '''.format(filename, problematic_characters.group(0)))
+        # Run the command passed on the command line or modified by preferences
+        elif command == 'latexmk':
+            from gutter import update_marks
+            from launcher import Process, PIPE, STDOUT
+            from parsing import LaTexMkParser
+
+            engine_options = construct_engine_options(
+                typesetting_directives, tm_engine_options, synctex)
+            write_latexmkrc(engine, engine_options, '/tmp/latexmkrc')
+            latexmkrc_path = "{}/config/latexmkrc".format(tm_bundle_support)
+            process = Process(
+                ['latexmk', '-pdf{}'.format('ps' if engine == 'latex' else ''),
+                 '-f', '-r', '/tmp/latexmkrc', '-r', latexmkrc_path, filename],
+                stdout=PIPE, stdin=PIPE, stderr=STDOUT)
+            command_parser = LaTexMkParser(process.stdout, verbose, filename)
+            status = command_parser.parse_stream()
+            update_marks(cache_filename, command_parser.marks)
+            fatal_error, number_errors, number_warnings = status
+            tex_status = process.wait()
+            remove("/tmp/latexmkrc")
+            if tm_autoview and number_errors < 1 and not suppress_viewer:
+                viewer_status = run_viewer(
+                    viewer, filepath, pdffile_path,
+                    number_errors > 1 or number_warnings > 0 and
+                    tm_preferences['latexKeepLogWin'],
+                    'pdfsync' in packages or synctex, line_number)
+            number_runs = command_parser.number_runs
+            totals = command_parser.totals()
+
+        elif command == 'bibtex':
+            use_biber = exists('{}.bcf'.format(file_without_suffix))
+            status = (run_biber(file_without_suffix) if use_biber else
+                      run_bibtex(file_without_suffix))
+            tex_status, fatal_error, number_errors, number_warnings = status
+
+        elif command == 'index':
+            status = run_index(filename, verbose)
+            tex_status, fatal_error, number_errors, number_warnings = status
+
+        elif command == 'clean':
+            from auxiliary import remove_auxiliary_files
+
+            removed_files = remove_auxiliary_files()
+            # Filter out bundle cache file (`.filename.lb`)
+            removed_files = [filepath for filepath in removed_files
+                             if not basename(filepath).startswith('.')]
+            if removed_files:
+                for removed_file in removed_files:
+                    print('<p class"info">Removed {}</p>'.format(removed_file))
+            else:
+                print('<p class"info">Clean: No Auxiliary files found')
+
+        elif command in {'latex', 'build'}:
+            from toolchain import probe
+
+            engine_options = construct_engine_options(
+                typesetting_directives, tm_engine_options, synctex)
+            ltxcmd = "{} {}".format(engine, engine_options)
+            draftcmd = None
+            if arguments.draftpasses and probe(engine).get('draftmode'):
+                draftcmd = "{} {}".format(engine, construct_engine_options(
+                    typesetting_directives, tm_engine_options, synctex,
+                    draftmode=True))
+            if command == 'build':
+                status = run_build(ltxcmd, filename, cache_filename, verbose,
+                                   arguments.max_runs, draftcmd)
+                status, number_runs = status[:4], status[4]
+            elif use_incremental and probe(engine).get('recorder'):
+                status = run_incremental(ltxcmd, filename, cache_filename,
+                                         verbose, arguments.max_runs, draftcmd)
+                status, number_runs = status[:4], status[4]
+            else:
+                status = run_latex(ltxcmd, filename, cache_filename, verbose)
+                number_runs = 1
+            tex_status, fatal_error, number_errors, number_warnings = status
+
+            if engine == 'latex':
+                from launcher import call
+
+                # Show our output before the output of `dvips` and `ps2pdf`
+                sys.stdout.flush()
+                call(['dvips', '{}.dvi'.format(file_without_suffix), '-o',
+                      '{}.ps'.format(file_without_suffix)], stdout=sys.stdout)
+                call(['ps2pdf', '{}.ps'.format(file_without_suffix)],
+                     stdout=sys.stdout)
+            if tm_autoview and number_errors < 1 and not suppress_viewer:
+                viewer_status = run_viewer(
+                    viewer, filepath, pdffile_path,
+                    number_errors > 1 or number_warnings > 0 and
+                    tm_preferences['latexKeepLogWin'],
+                    'pdfsync' in packages or synctex, line_number)
+
+        elif command == 'view' and not suppress_viewer:
             viewer_status = run_viewer(
                 viewer, filepath, pdffile_path,
                 number_errors > 1 or number_warnings > 0 and
                 tm_preferences['latexKeepLogWin'],
                 'pdfsync' in packages or synctex, line_number)
 
-    elif command == 'view' and not suppress_viewer:
-        viewer_status = run_viewer(
-            viewer, filepath, pdffile_path,
-            number_errors > 1 or number_warnings > 0 and
-            tm_preferences['latexKeepLogWin'],
-            'pdfsync' in packages or synctex, line_number)
-
-    elif command == 'sync':
-        if 'pdfsync' in packages or synctex:
-            _, sync_command = get_app_path_and_sync_command(
-                viewer, pdffile_path, filepath, line_number)
-            if sync_command:
-                viewer_status = call(sync_command, shell=True)
+        elif command == 'sync':
+            if 'pdfsync' in packages or synctex:
+                _, sync_command = get_app_path_and_sync_command(
+                    viewer, pdffile_path, filepath, line_number)
+                if sync_command:
+                    from launcher import call
+
+                    viewer_status = call(sync_command)
+                else:
+                    print("The viewer {} does not support pdfsync".format(
+                          viewer))
+                    exit(EXIT_SHOW_TOOL_TIP)
+
             else:
-                print("The viewer {} does not support pdfsync".format(viewer))
+                print("Either you need to include `pdfsync.sty` in your " +
+                      "document or you need to use an engine that supports " +
+                      "pdfsync.")
                 exit(EXIT_SHOW_TOOL_TIP)
 
-        else:
-            print("Either you need to include `pdfsync.sty` in your document" +
-                  "or you need to use an engine that supports pdfsync.")
-            exit(EXIT_SHOW_TOOL_TIP)
-
-    elif command == 'chktex':
-        command = "{} '{}'".format(command, filename)
-        process = Popen(command, shell=True, stdout=PIPE, stdin=PIPE,
-                        stderr=STDOUT, close_fds=True, universal_newlines=True)
-        parser = ChkTexParser(process.stdout, verbose, filename)
-        fatal_error, number_errors, number_warnings = parser.parse_stream()
-        tex_status = process.wait()
+        elif command == 'chktex':
+            from launcher import Process, PIPE, STDOUT
+            from parsing import ChkTexParser
+
+            process = Process(['chktex', filename], stdout=PIPE, stdin=PIPE,
+                              stderr=STDOUT)
+            parser = ChkTexParser(process.stdout, verbose, filename)
+            fatal_error, number_errors, number_warnings = parser.parse_stream()
+            tex_status = process.wait()
+    except ProgramNotFound as error:
+        print('''<p class="error">Error: {} was not found,
+                 Please make sure that it is installed and your PATH is
+                 setup properly.</p>'''.format(error.program))
+        tex_status = EXIT_PROGRAM_NOT_FOUND
 
     # Check status of running the viewer
     if viewer_status != 0:
@@ -1109,12 +1746,30 @@ if __name__ == '__main__':
                          number_warnings, '' if number_warnings == 1 else 's',
                          number_runs, '' if number_runs == 1 else 's'))
 
+    if renderer:
+        from events import Summary
+
+        errors, warnings = totals if totals else (number_errors,
+                                                  number_warnings)
+        renderer.render(Summary(fatal_error, errors, warnings))
+
+    if tm_preferences['latexDebug']:
+        from launcher import profile
+
+        # Show the programs we started and the time they took
+        print('<pre class="info">{}</pre>'.format(profile()))
+
     # Decide what to do with the Latex & View log window
     exit_code = (EXIT_DISCARD if not tm_preferences['latexKeepLogWin'] and
                  number_errors == 0 and viewer != 'TextMate' else EXIT_SUCCESS)
 
     # Output buttons at the bottom of the window
     if first_run:
+        try:
+            from urllib.parse import quote  # Python 3
+        except ImportError:
+            from urllib import quote  # Python 2
+
         print('</div></div>')  # Close divs `preText` and `commandOutput`
         pdf_file = '{}.pdf'.format(file_without_suffix)
         # only need to include the javascript library once
@@ -0,0 +1,56 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Run ``texmate.py`` inside a long-lived server.
+
+The server imports ``texmate.py`` and all of its modules once and then waits
+for requests on a Unix domain socket (see ``commandserver``). While the
+server is running, every invocation of ``texmate.py`` forwards its command
+line to the server, which saves the startup time of Python and the imports
+for every command. The server stops after it did not receive a request for
+a while.
+
+Usage:
+
+    texmated.py [-socket PATH] [-timeout SECONDS]
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from os import sys, path
+sys.path.insert(1, path.dirname(path.dirname(path.abspath(__file__))) +
+                "/lib/Python")
+
+from argparse import ArgumentParser
+
+from commandserver import serve, socket_path
+
+
+# -- Constants ----------------------------------------------------------------
+
+# Modules imported by the commands of `texmate.py` when they need them
+MODULES = ['argparse', 'functools', 'glob', 'multiprocessing.pool', 'pickle',
+           'shlex', 'subprocess', 'textwrap', 'auxiliary', 'build', 'events',
+           'gutter', 'launcher', 'output', 'parsing', 'tex', 'tmprefs',
+           'toolchain']
+
+
+# -- Main ---------------------------------------------------------------------
+
+if __name__ == '__main__':
+    arguments = ArgumentParser(description=__doc__.splitlines()[0])
+    arguments.add_argument(
+        '-socket', default=socket_path(),
+        help='the path of the socket the server listens on')
+    arguments.add_argument(
+        '-timeout', type=float, default=3600,
+        help='''stop the server after it did not receive a request for this
+                number of seconds''')
+    options = arguments.parse_args()
+
+    serve(path.join(path.dirname(path.abspath(__file__)), 'texmate.py'),
+          options.socket, options.timeout, MODULES)
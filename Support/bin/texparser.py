@@ -10,31 +10,281 @@ from os import sys, path
 sys.path.insert(1, path.dirname(path.dirname(path.abspath(__file__))) +
                 "/lib/Python")
 
-from argparse import ArgumentParser
+# The worker processes of ``parse_runs`` import this module too. We therefore
+# only import the modules needed by the functions below here. The main code
+# imports all other modules itself.
+
 from io import open
-from os import getenv
-from os.path import basename, dirname, join
-from pickle import load, dump
-from pipes import quote as shellquote
-from subprocess import check_output, STDOUT
+from os import devnull, getenv
+from os.path import basename, dirname, join, realpath
+from re import compile, MULTILINE
 from sys import version_info
 
-from parsing import LaTexMkParser
-from tex import encodings
-from gutter import update_marks
+from parsing import (BibTexParser, BiberParser, LaTexMkParser, LaTexParser,
+                     TexParser)
+from logreader import map_file, MappedLog
 
 # -- Module Import ------------------------------------------------------------
 
 PYTHON2 = version_info <= (3, 0)
 
-if PYTHON2:
-    import sys
-    reload(sys)  # noqa
-    sys.setdefaultencoding("utf-8")
+LATEXMK_BANNER = compile(b'^Latexmk: This is Latexmk', MULTILINE)
+# Banners of the tools run by latexmk (see ``LaTexMkParser``)
+RUN_BANNER = compile(b'^(?:This is (pdfTeX|latex2e|latex|LuaTeX|XeTeX|' +
+                     b'BibTeX|makeindex)|.*This is (Biber))', MULTILINE)
+# Lines handled by latexmk itself instead of one of its tools
+RUN_BOUNDARY = compile(b'^(?:Latexmk|Run number|This is |.*This is Biber)',
+                       MULTILINE)
+TOOLS = {b'Biber': BiberParser, b'BibTeX': BibTexParser,
+         b'makeindex': BibTexParser}
 
 
 # -- Functions ----------------------------------------------------------------
 
+def find_new_output(buffer, logpath, position=None):
+    r"""Determine the part of a log file that was not parsed yet.
+
+    This function returns a tuple containing the following values:
+
+        - The offset of the first byte in ``buffer`` that was not parsed yet.
+
+        - A dictionary describing the position in the log file up to which
+          we will parse the log file now. We can use this dictionary as
+          value for ``position`` the next time we parse the log file.
+
+        - A boolean value specifying if we only parse the text added after
+          ``position`` (``True``) or if we parse the whole file (``False``).
+
+    If the log file still contains the text parsed the last time, then we
+    only parse the text appended since then. If the file was truncated or
+    replaced by a new file, then we parse the whole file.
+
+    Arguments:
+
+        buffer
+
+            The content of the log file (see ``logreader.map_file``).
+
+        logpath
+
+            The real path of the log file.
+
+        position
+
+            The position returned by the last call of this function for
+            ``logpath`` or ``None``.
+
+    Returns: ``(int, {str: object}, bool)``
+
+    Examples:
+
+        >>> start, position, resumed = find_new_output(
+        ...     b'First line\nSecond ', '/tmp/test.log')
+        >>> start, position['offset'], resumed
+        (0, 11, False)
+        >>> start, position, resumed = find_new_output(
+        ...     b'First line\nSecond line\n', '/tmp/test.log', position)
+        >>> start, position['offset'], resumed
+        (11, 23, True)
+        >>> start, position, resumed = find_new_output(
+        ...     b'New line\n', '/tmp/test.log', position)
+        >>> start, position['offset'], resumed
+        (0, 9, False)
+
+    """
+    resumed = False
+    if position and position['log'] == logpath:
+        offset, tail = position['offset'], position['tail']
+        resumed = buffer[offset - len(tail):offset] == tail
+    if not resumed:
+        offset, tail = 0, b''
+
+    # Only parse complete lines. The remaining text will be parsed the next
+    # time we parse the log file.
+    end = max(buffer.rfind(b'\n', offset) + 1, offset)
+    tail = (tail + buffer[offset:end])[-64:]
+    return offset, {'log': logpath, 'offset': end, 'tail': tail}, resumed
+
+
+def split_builds(buffer, start, end):
+    r"""Split the output of multiple runs of latexmk into single runs.
+
+    ``latex_watch`` appends the output of each run of latexmk to the same log
+    file. This function returns a list containing the start and end offset of
+    each run in ``buffer[start:end]``.
+
+    Arguments:
+
+        buffer
+
+            The content of the log file (see ``logreader.map_file``).
+
+        start
+
+            The offset of the first byte that should be considered.
+
+        end
+
+            The offset after the last byte that should be considered.
+
+    Returns: ``[(int, int)]``
+
+    Examples:
+
+        >>> output = (b'Latexmk: This is Latexmk\nFirst\n' +
+        ...           b'Latexmk: This is Latexmk\nSecond\n')
+        >>> split_builds(output, 0, len(output))
+        [(0, 31), (31, 63)]
+        >>> split_builds(output, 25, len(output))
+        [(25, 31), (31, 63)]
+        >>> split_builds(output, 63, len(output))
+        []
+
+    """
+    starts = [matching.start() for matching in
+              LATEXMK_BANNER.finditer(buffer, start, end)]
+    if start < end and (not starts or starts[0] != start):
+        starts.insert(0, start)
+    return list(zip(starts, starts[1:] + [end]))
+
+
+def split_runs(buffer, start, end):
+    r"""Split the output of latexmk into the output of the tools it runs.
+
+    This function looks for the banners of the tools started by latexmk
+    (latex, bibtex, biber and makeindex). The output of a tool starts after
+    its banner and ends in front of the next line printed by latexmk itself
+    or the next banner. Since a parser always reads one more line after it
+    is done, the returned range also contains this line. The function
+    returns a list containing the name of the banner and the start and end
+    offset of the output for each tool.
+
+    Arguments:
+
+        buffer
+
+            The content of the log file (see ``logreader.map_file``).
+
+        start
+
+            The offset of the first byte that should be considered.
+
+        end
+
+            The offset after the last byte that should be considered.
+
+    Returns: ``[(bytes, int, int)]``
+
+    Examples:
+
+        >>> output = (b'Latexmk: Run number 1 of rule pdflatex\n' +
+        ...           b'This is pdfTeX, Version 3.14\n(./main.tex)\n' +
+        ...           b'Latexmk: Run number 1 of rule biber\n' +
+        ...           b'INFO - This is Biber 2.5\nINFO - Done\n')
+        >>> for tool, begin, stop in split_runs(output, 0, len(output)):
+        ...     print('{}: {}'.format(tool.decode('ascii'), ' | '.join(
+        ...           output[begin:stop].decode('ascii').splitlines())))
+        pdfTeX: (./main.tex) | Latexmk: Run number 1 of rule biber
+        Biber: INFO - Done
+
+    """
+    runs = []
+    for banner in RUN_BANNER.finditer(buffer, start, end):
+        begin = buffer.find(b'\n', banner.end(), end)
+        if begin < 0:
+            continue
+        boundary = RUN_BOUNDARY.search(buffer, begin + 1, end)
+        stop = buffer.find(b'\n', boundary.end(), end) if boundary else -1
+        runs.append((banner.group(1) or banner.group(2), begin + 1,
+                     end if stop < 0 else stop + 1))
+    return runs
+
+
+def parse_run(job):
+    """Parse the output of a single tool run by latexmk.
+
+    This function is run in the worker processes of ``parse_runs``.
+
+    Arguments:
+
+        job
+
+            A tuple containing the path of the log file, the name of the
+            banner and the offsets returned by ``split_runs``, the name of
+            the typeset tex file and the line length of the tex program.
+
+    Returns: ``(int, ([Event], {str: object}, int, int))``
+
+    """
+    logfile, tool, begin, stop, texfile, max_print_line = job
+    TexParser.max_print_line = max_print_line
+    buffer = map_file(logfile)
+    try:
+        stream = MappedLog(buffer, begin, stop)
+        if tool in TOOLS:
+            parser = TOOLS[tool](stream, False)
+        else:
+            parser = LaTexParser(stream, False, texfile)
+        events = list(parser.events())
+        return begin, (events, parser.get_state(), stream.position, stop)
+    finally:
+        if buffer:
+            buffer.close()
+
+
+def parse_runs(logfile, buffer, start, end, texfile, processes):
+    """Parse the output of all tools in a latexmk log using a process pool.
+
+    The returned dictionary maps the start offset of the output of each tool
+    to the events, the final state, the offset after the last read line and
+    the end offset of the parsed range (see ``LaTexMkParser.runs``).
+
+    Arguments:
+
+        logfile
+
+            The path of the log file.
+
+        buffer
+
+            The content of the log file (see ``logreader.map_file``).
+
+        start
+
+            The offset of the first byte that should be parsed.
+
+        end
+
+            The offset after the last byte that should be parsed.
+
+        texfile
+
+            The tex file typeset by latexmk.
+
+        processes
+
+            The number of worker processes.
+
+    Returns: ``{int: ([Event], {str: object}, int, int)}``
+
+    """
+    # Start the largest runs first, so they do not delay the others
+    jobs = sorted(((logfile, tool, begin, stop, texfile,
+                    TexParser.max_print_line)
+                   for tool, begin, stop in split_runs(buffer, start, end)),
+                  key=lambda job: job[2] - job[3])
+    if not jobs:
+        return {}
+    from multiprocessing import Pool
+
+    pool = Pool(min(processes, len(jobs)))
+    try:
+        return dict(pool.imap_unordered(parse_run, jobs))
+    finally:
+        pool.close()
+        pool.join()
+
+
 def notify(title='LaTeX Watch', summary='', messages=[], token=None):
     """Display a list of messages via a notification window.
 
@@ -72,22 +322,22 @@ def notify(title='LaTeX Watch', summary='', messages=[], token=None):
         >>> token = int(token)
 
     """
+    from launcher import check_output, STDOUT
+
     dialog = getenv('DIALOG')
     tm_support = getenv('TM_SUPPORT_PATH')
     nib_location = '{}/nibs/SimpleNotificationWindow.nib'.format(tm_support)
     log = '\n'.join(messages).replace('\\', '\\\\').replace('"', '\\"')
 
-    command = "{} nib".format(shellquote(dialog))
-    content = shellquote(
-        """{{ title = "{}"; summary = "{}"; log = "{}"; }}""".format(
-            title, summary, log))
+    command = [dialog, 'nib']
+    content = """{{ title = "{}"; summary = "{}"; log = "{}"; }}""".format(
+        title, summary, log)
 
     # Update notification window
     if token:
-        command_update = "{} --update {} --model {}".format(
-                         command, token, content)
-        notification_output = check_output(command_update, stderr=STDOUT,
-                                           shell=True, universal_newlines=True)
+        notification_output = check_output(
+            command + ['--update', '{}'.format(token), '--model', content],
+            stderr=STDOUT)
         # If the window still exists and we could therefore update it here we
         # return the token of the old window. If we could not update the
         # window we get an error message. In this case we try to open a new
@@ -96,10 +346,8 @@ def notify(title='LaTeX Watch', summary='', messages=[], token=None):
             return(int(token))
 
     # Create new notification window
-    command_load = "{} --load {} --model {}".format(
-                   command, shellquote(nib_location), content)
-    notification_output = check_output(command_load, shell=True,
-                                       universal_newlines=True)
+    notification_output = check_output(
+        command + ['--load', nib_location, '--model', content])
     return int(notification_output)
 
 
@@ -107,6 +355,19 @@ def notify(title='LaTeX Watch', summary='', messages=[], token=None):
 
 if __name__ == '__main__':
 
+    if PYTHON2:
+        import sys
+        reload(sys)  # noqa
+        sys.setdefaultencoding("utf-8")
+
+    from argparse import ArgumentParser
+    from pickle import load, dump
+
+    from gutter import update_marks
+    from output import install
+    from tex import get_max_print_line
+
+    install()
     parser = ArgumentParser(
         description='Parse output from latexmk.')
     parser.add_argument(
@@ -120,6 +381,25 @@ if __name__ == '__main__':
                 not exist yet or the old messages could not be read for some
                 other reasons, then `reload` will just fail silently.""")
 
+    parser.add_argument(
+        '-resume', action='store_true',
+        help="""Only parse the text appended to the log file since the last
+                time we parsed it. The position in the log file and the state
+                of the parser are stored in the cache. If a tool did not
+                finish its output yet, then we parse its output again the next
+                time. If the log file was truncated or replaced in the
+                meantime, then the whole file will be parsed.""")
+    parser.add_argument(
+        '-format', default='html', choices={'html', 'ndjson', 'text'},
+        help="""Specify the output format. The format `ndjson` writes one
+                JSON object for each warning or error and a final summary
+                object instead of HTML. The format `text` writes one line
+                for each message and a final summary line.""")
+    parser.add_argument(
+        '-jobs', type=int, default=1,
+        help="""Parse the output of the tools run by latexmk (latex, bibtex,
+                biber, makeindex) in the given number of processes. This is
+                useful for large log files containing many runs.""")
     parser.add_argument(
         'logfile',
         help="""The location of the log file that should be parsed.""")
@@ -130,6 +410,14 @@ if __name__ == '__main__':
                 generated.""")
     arguments = parser.parse_args()
 
+    if arguments.format != 'html':
+        from events import NDJSONDiagnosticRenderer, TextRenderer
+        # Write only the diagnostics to the standard output
+        TexParser.renderer = (NDJSONDiagnosticRenderer
+                              if arguments.format == 'ndjson' else
+                              TextRenderer)(sys.stdout)
+        sys.stdout = open(devnull, 'w')
+
     logfile = arguments.logfile
     notification_token = arguments.notify
     texfile = '{}.tex'.format(arguments.file)
@@ -147,16 +435,64 @@ if __name__ == '__main__':
             # Fail silently
             exit(0)
     else:
-        # Depending on the error the tex engine might return a log file in a
-        # different encoding.
-        for encoding in encodings:
-            try:
-                texparser = LaTexMkParser(open(logfile, encoding=encoding),
-                                          verbose=False, filename=texfile)
-                texparser.parse_stream()
-                break
-            except UnicodeDecodeError:
-                continue
+        try:
+            with open(cachefile, 'rb') as storage:
+                log_state = load(storage).get('log_state')
+        except:
+            log_state = None
+        if not arguments.resume or log_state is None or (
+                log_state['file'] != texfile):
+            log_state = {'position': None}
+
+        # We map the log file into memory. This way the parser only needs
+        # to read (and decode) the lines that might contain interesting
+        # information.
+        buffer = map_file(logfile)
+        start, position, resumed = find_new_output(
+            buffer, realpath(logfile), log_state['position'])
+        TexParser.max_print_line = get_max_print_line()
+        runs = {}
+        if arguments.jobs > 1:
+            runs = parse_runs(logfile, buffer, start, position['offset'],
+                              texfile, arguments.jobs)
+        texparser = LaTexMkParser(None, verbose=False, filename=texfile)
+        if resumed:
+            texparser.set_state(log_state['parser'])
+        # `latex_watch` appends the output of every run of latexmk to the log
+        # file. Every run stops the parser, when it reaches its end. Only the
+        # output of a run we parsed partly the last time continues with the
+        # stored state, every new run starts with a new parser. The summary
+        # counts the messages of all runs we parse now.
+        fatal_error, number_errors, number_warnings = False, 0, 0
+        for begin, end in split_builds(buffer, start, position['offset']):
+            if LATEXMK_BANNER.match(buffer, begin):
+                texparser = LaTexMkParser(None, verbose=False,
+                                          filename=texfile)
+            texparser.runs = runs
+            texparser.input_stream = MappedLog(buffer, begin, end)
+            texparser.done = False
+            errors, warnings = texparser.totals()
+            fatal_error |= texparser.parse_stream()[0]
+            number_errors += texparser.totals()[0] - errors
+            number_warnings += texparser.totals()[1] - warnings
+        parser_state = texparser.get_state()
+        if texparser.checkpoint:
+            # The last tool did not finish its output yet. We parse its
+            # output again, starting with its banner, the next time.
+            banners = list(RUN_BANNER.finditer(buffer, start,
+                                               position['offset']))
+            if banners:
+                offset = banners[-1].start()
+                position = {'log': position['log'], 'offset': offset,
+                            'tail': buffer[max(offset - 64, 0):offset]}
+                parser_state = texparser.checkpoint
+        if buffer:
+            buffer.close()
+        if TexParser.renderer:
+            from events import Summary
+
+            TexParser.renderer.render(Summary(fatal_error, number_errors,
+                                              number_warnings))
         # Sort marks by line number
         marks = sorted(texparser.marks, key=lambda marks: marks[1])
         update_marks(cachefile, marks)
@@ -175,8 +511,12 @@ if __name__ == '__main__':
             with open(cachefile, 'r+b') as storage:
                 typesetting_data = load(storage)
                 typesetting_data['messages'] = messages
+                typesetting_data['log_state'] = {
+                    'file': texfile, 'position': position,
+                    'parser': parser_state}
                 storage.seek(0)
                 dump(typesetting_data, storage)
+                storage.truncate()
         except:
             print('Could not access cache file {}!'.format(cachefile))
 
@@ -8,8 +8,8 @@ from __future__ import unicode_literals
 
 from os import getenv
 from os.path import join
-from pipes import quote
-from subprocess import check_output
+
+from launcher import check_output
 
 
 # -- Functions ----------------------------------------------------------------
@@ -62,6 +62,4 @@ def remove_auxiliary_files(directory='.',
 
     """
     clean_command = join(tm_bundle_support, 'bin/clean.rb')
-    return check_output('{} {}'.format(quote(clean_command),
-                                       quote(directory)),
-                        universal_newlines=True, shell=True).split('\n')[:-1]
+    return check_output([clean_command, directory]).split('\n')[:-1]
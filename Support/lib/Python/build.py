@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to run the steps of a build concurrently.
+
+A build of a tex document consists of steps that depend on each other. The
+bibliography and the indexes of a document for example both need the output
+of a latex run, but not each other. The function ``run_tasks`` runs every
+step (``Task``) as soon as all of its dependencies are done. Independent
+steps run at the same time in a pool of threads. Since the actual work
+happens in the processes of the tex tools, threads are sufficient.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from sys import exc_info
+
+try:
+    from queue import Queue  # Python 3
+except ImportError:
+    from Queue import Queue  # Python 2
+
+
+# -- Classes ------------------------------------------------------------------
+
+class Task(object):
+    """A single step of a build."""
+
+    def __init__(self, name, function, dependencies=()):
+        """Create a new task.
+
+        Arguments:
+
+            name
+
+                A name identifying the task.
+
+            function
+
+                The function that executes the task. We call this function
+                with a dictionary mapping the names of the dependencies of
+                the task to their results. The return value of the function
+                is the result of the task.
+
+            dependencies
+
+                The names of the tasks that have to be done before this task
+                can start.
+
+        Examples:
+
+            >>> task = Task('index', lambda results: 0, ['latex'])
+            >>> print(task.name, ', '.join(task.dependencies))
+            index latex
+
+        """
+        self.name = name
+        self.function = function
+        self.dependencies = tuple(dependencies)
+
+
+# -- Functions ----------------------------------------------------------------
+
+def run_tasks(tasks, workers=None, report=None):
+    """Run ``tasks`` concurrently while respecting their dependencies.
+
+    This function returns a dictionary mapping the name of every task to its
+    result. If a task raises an exception, then we wait for the running
+    tasks, start no new ones and raise the exception again.
+
+    Arguments:
+
+        tasks
+
+            A list of ``Task`` objects. Every dependency of a task has to be
+            listed before the task itself.
+
+        workers
+
+            The maximum number of tasks running at the same time. If this
+            value is ``None``, then we use the number of CPUs.
+
+        report
+
+            A function we call with every task and its result. We call this
+            function in the order of ``tasks`` in the main thread, as soon as
+            a task and all tasks in front of it are done.
+
+    Returns: ``{str: object}``
+
+    Examples:
+
+        >>> tasks = [
+        ...     Task('latex', lambda results: 1),
+        ...     Task('bibtex', lambda results: results['latex'] + 1,
+        ...          ['latex']),
+        ...     Task('index', lambda results: results['latex'] * 10,
+        ...          ['latex']),
+        ...     Task('final', lambda results: results['bibtex'] +
+        ...          results['index'], ['bibtex', 'index'])]
+        >>> results = run_tasks(tasks, 2,
+        ...                     lambda task, result: print(task.name, result))
+        latex 1
+        bibtex 2
+        index 10
+        final 12
+
+        >>> run_tasks([Task('broken', lambda results: 1 / 0)])
+        ... # doctest:+IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        ...
+        ZeroDivisionError: division by zero
+
+    """
+    names = set()
+    for task in tasks:
+        missing = set(task.dependencies) - names
+        if missing:
+            raise ValueError(
+                'Task {} depends on unknown or later task(s) {}'.format(
+                    task.name, ', '.join(sorted(missing))))
+        names.add(task.name)
+
+    results = {}
+    finished = Queue()
+    waiting = list(tasks)
+    reported = 0
+    running = 0
+    error = None
+
+    def execute(task, arguments):
+        try:
+            finished.put((task, task.function(arguments), None))
+        except Exception:
+            finished.put((task, None, exc_info()))
+
+    pool = ThreadPool(workers if workers else cpu_count())
+    try:
+        while waiting or running:
+            if error is None:
+                for task in [task for task in waiting
+                             if all(name in results
+                                    for name in task.dependencies)]:
+                    waiting.remove(task)
+                    running += 1
+                    pool.apply_async(execute, (task, {
+                        name: results[name] for name in task.dependencies}))
+            if not running:
+                break
+            task, result, failure = finished.get()
+            running -= 1
+            if failure:
+                error = error or failure
+                continue
+            results[task.name] = result
+            while (reported < len(tasks) and
+                   tasks[reported].name in results):
+                if report:
+                    report(tasks[reported], results[tasks[reported].name])
+                reported += 1
+    finally:
+        pool.close()
+        pool.join()
+    if error:
+        raise error[1]
+    return results
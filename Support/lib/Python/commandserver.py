@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to run a script inside a long-lived server.
+
+Starting a script like ``texmate.py`` takes considerable time: Python has to
+import all modules used by the script, including the expensive module
+``Foundation`` used to read the preferences of TextMate. The function
+``serve`` imports a script once and then waits for requests on a Unix domain
+socket. For every request it forks a new process, which runs the script with
+the command line arguments, the working directory and the environment of the
+client. The output of the script is sent back to the client.
+
+Scripts use ``forward`` to send their invocation to a running server. If no
+server is running, then ``forward`` returns ``None`` and the script just
+continues as usual.
+
+The protocol is simple: The client sends a single line containing a JSON
+object with the keys ``arguments``, ``directory`` and ``environment``. The
+server sends the output of the script followed by a null byte and the exit
+status of the script.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from io import open
+from json import dumps, loads
+from os import (chdir, close, dup2, environ, fork, getcwd, getenv, getuid,
+                lstat, mkdir, open as open_descriptor, O_RDONLY, unlink,
+                _exit)
+from os.path import exists, join
+from signal import signal, SIGCHLD, SIG_DFL, SIG_IGN
+from socket import error as SocketError, socket, timeout, AF_UNIX, SOCK_STREAM
+from stat import S_ISDIR, S_ISSOCK, S_IMODE
+from sys import version_info
+from tempfile import gettempdir
+from traceback import print_exc
+
+import sys
+
+
+# -- Constants ----------------------------------------------------------------
+
+# Set in the environment of every script run by the server
+SERVER_VARIABLE = 'TEXMATE_SERVER'
+
+
+# -- Functions ----------------------------------------------------------------
+
+def private_directory(name='texmate'):
+    """Return a directory only the current user can access.
+
+    The directory is located in ``$XDG_RUNTIME_DIR`` or otherwise in the
+    temporary directory (``$TMPDIR`` on macOS). We create the directory with
+    mode 0700, if it does not exist. If the directory belongs to another
+    user or other users can access it, then this function returns ``None``.
+
+    Returns: ``str`` or ``None``
+
+    Examples:
+
+        >>> directory = private_directory()
+        >>> S_IMODE(lstat(directory).st_mode) == 0o700
+        True
+
+    """
+    directory = join(getenv('XDG_RUNTIME_DIR') or gettempdir(),
+                     '{}-{}'.format(name, getuid()))
+    try:
+        mkdir(directory, 0o700)
+    except OSError:
+        pass
+    try:
+        status = lstat(directory)
+    except OSError:
+        return None
+    if (not S_ISDIR(status.st_mode) or status.st_uid != getuid() or
+            S_IMODE(status.st_mode) & 0o077):
+        return None
+    return directory
+
+
+def socket_path(name='texmate'):
+    """Return the default path of the socket for the server ``name``.
+
+    The socket is located in the private directory of the current user (see
+    ``private_directory``), so other users can neither connect to the
+    server nor replace it. This function returns ``None`` if there is no
+    safe location for the socket.
+
+    Returns: ``str`` or ``None``
+
+    Examples:
+
+        >>> socket_path().endswith('texmate.socket')
+        True
+
+    """
+    directory = private_directory(name)
+    return join(directory, '{}.socket'.format(name)) if directory else None
+
+
+def connect(path, owner=None):
+    """Connect to the server listening on ``path``.
+
+    This function returns ``None``, if no server is listening on ``path`` or
+    if ``path`` is not a socket belonging to the user ``owner``.
+
+    Arguments:
+
+        path
+
+            The path of the socket of the server.
+
+        owner
+
+            The id of the user the socket has to belong to. If this value is
+            ``None``, then we use the id of the current user.
+
+    Returns: ``socket`` or ``None``
+
+    Examples:
+
+        >>> connect('/nonexistent/texmate.socket') is None
+        True
+
+        A socket owned by another user is ignored
+
+        >>> from tempfile import mkdtemp
+        >>> from shutil import rmtree
+        >>> directory = mkdtemp()
+        >>> server = socket(AF_UNIX, SOCK_STREAM)
+        >>> server.bind(join(directory, 'texmate.socket'))
+        >>> server.listen(1)
+        >>> connect(join(directory, 'texmate.socket'), getuid() + 1) is None
+        True
+        >>> client = connect(join(directory, 'texmate.socket'))
+        >>> client is None
+        False
+        >>> client.close()
+        >>> server.close()
+        >>> rmtree(directory)
+
+    """
+    owner = getuid() if owner is None else owner
+    try:
+        status = lstat(path)
+    except OSError:
+        return None
+    if not S_ISSOCK(status.st_mode) or status.st_uid != owner:
+        return None
+    client = socket(AF_UNIX, SOCK_STREAM)
+    try:
+        client.connect(path)
+    except SocketError:
+        client.close()
+        return None
+    return client
+
+
+def forward(arguments, path=None):
+    """Run a script with the given arguments inside a running server.
+
+    This function writes the output of the script to the standard output and
+    returns the exit status of the script. If no server is running or if we
+    are already running inside the server, then this function returns
+    ``None``.
+
+    Arguments:
+
+        arguments
+
+            The command line arguments of the script (``sys.argv``).
+
+        path
+
+            The path of the socket of the server. If this value is ``None``,
+            then we use the default path (see ``socket_path``).
+
+    Returns: ``int`` or ``None``
+
+    """
+    if environ.get(SERVER_VARIABLE):
+        return None
+    path = path if path else socket_path()
+    client = connect(path) if path else None
+    if client is None:
+        return None
+    request = {'arguments': list(arguments), 'directory': getcwd(),
+               'environment': dict(environ)}
+    output = getattr(sys.stdout, 'buffer', sys.stdout)
+    try:
+        client.sendall(dumps(request).encode('utf-8') + b'\n')
+        # The output ends with a null byte followed by the exit status and a
+        # newline. Each of these parts may arrive in a different chunk.
+        found_nul = False
+        status = b''
+        while True:
+            data = client.recv(65536)
+            if not data:
+                # The server died before sending the exit status
+                return 1
+            if not found_nul:
+                data, nul, rest = data.partition(b'\0')
+                output.write(data)
+                output.flush()
+                found_nul = bool(nul)
+                data = rest
+            if found_nul:
+                status += data
+                if status.endswith(b'\n'):
+                    break
+        return int(status)
+    finally:
+        client.close()
+
+
+def receive_request(connection):
+    """Read the request sent by a client.
+
+    Returns: ``{str: object}``
+
+    """
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return loads(data.decode('utf-8'))
+
+
+def run_request(connection, code, request):
+    """Run ``code`` for ``request`` and send the output to the client.
+
+    This function redirects the standard output and the standard error of
+    the current process to ``connection``. It should therefore only run in a
+    process forked from the server.
+
+    Returns: ``int``
+
+    """
+    environ.clear()
+    environ.update(request['environment'])
+    environ[SERVER_VARIABLE] = '1'
+    chdir(request['directory'])
+    sys.argv = request['arguments']
+
+    stdin = open_descriptor('/dev/null', O_RDONLY)
+    dup2(stdin, 0)
+    close(stdin)
+    dup2(connection.fileno(), 1)
+    dup2(connection.fileno(), 2)
+    if version_info >= (3, 0):
+        # The locale of the server does not have to match the one of the
+        # client, so we always write UTF-8
+        sys.stdout = open(1, 'w', encoding='utf-8', buffering=1,
+                          closefd=False)
+        sys.stderr = open(2, 'w', encoding='utf-8', buffering=1,
+                          closefd=False)
+
+    status = 0
+    try:
+        exec(code, {'__name__': '__main__', '__file__': code.co_filename})
+    except SystemExit as exit:
+        status = (exit.code if isinstance(exit.code, int) else
+                  0 if exit.code is None else 1)
+    except Exception:
+        print_exc()
+        status = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return status
+
+
+def serve(script, path=None, idle_timeout=3600, modules=()):
+    """Serve requests to run ``script`` until the server is idle too long.
+
+    Arguments:
+
+        script
+
+            The path of the script the server should run.
+
+        path
+
+            The path of the socket of the server. If this value is ``None``,
+            then we use the default path (see ``socket_path``).
+
+        idle_timeout
+
+            The server stops after it did not receive a request for this
+            number of seconds.
+
+        modules
+
+            The names of modules the server should import in advance. Scripts
+            that import modules only when they need them (like
+            ``texmate.py``) would otherwise import these modules again in
+            every process running a request.
+
+    """
+    path = path if path else socket_path()
+    if path is None:
+        raise SystemExit('Could not create a private directory for the '
+                         'socket of the server')
+    if exists(path):
+        running = connect(path)
+        if running:
+            running.close()
+            raise SystemExit('A server is already listening on {}'.format(
+                path))
+        unlink(path)
+
+    with open(script, encoding='utf-8') as source:
+        code = compile(source.read(), script, 'exec')
+    # Import all modules used by the script in advance
+    exec(code, {'__name__': '__server__', '__file__': script})
+    for module in modules:
+        __import__(module)
+
+    # Let the system reap the processes that ran the script
+    signal(SIGCHLD, SIG_IGN)
+    server = socket(AF_UNIX, SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+    server.settimeout(idle_timeout)
+    try:
+        while True:
+            try:
+                connection, _ = server.accept()
+            except timeout:
+                break
+            if fork() == 0:
+                server.close()
+                signal(SIGCHLD, SIG_DFL)
+                connection.settimeout(None)
+                status = 1
+                try:
+                    status = run_request(connection, code,
+                                         receive_request(connection))
+                finally:
+                    try:
+                        connection.sendall('\0{}\n'.format(status).encode(
+                            'ascii'))
+                    finally:
+                        _exit(status)
+            connection.close()
+    finally:
+        server.close()
+        unlink(path)
@@ -0,0 +1,695 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains the events produced by the parsers in ``parsing``.
+
+The parsers do not print anything themselves. Instead they produce a stream
+of small event objects. The renderers in this module turn such a stream into
+HTML for the output window of TextMate, into plain text, or into newline
+delimited JSON (one JSON object per event or per diagnostic).
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from json import dumps
+from os import sys, path
+sys.path.insert(1, path.dirname(path.abspath(__file__)))
+
+try:
+    from urllib.parse import quote  # Python 3
+except ImportError:
+    from urllib import quote  # Python 2
+
+
+# -- Functions ----------------------------------------------------------------
+
+_paths = {}
+
+
+def intern_path(filepath):
+    """Return a shared copy of ``filepath``.
+
+    Log files mention the same few files over and over again. Events that
+    refer to the same file therefore share a single string object.
+
+    Arguments:
+
+        filepath
+
+            The path that should be interned.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> first = intern_path(''.join(['/tmp/', 'file.tex']))
+        >>> second = intern_path(''.join(['/tmp/', 'file.tex']))
+        >>> first is second
+        True
+
+    """
+    return _paths.setdefault(filepath, filepath)
+
+
+def make_link(file, line=1):
+    """Create a TextMate link for ``file`` pointing to ``line``.
+
+    Arguments:
+
+        file
+
+            The path to the file that should be opened if we click the link
+            generated by this function.
+
+        line
+
+            The line which should be displayed when TextMate opens ``file``.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> print(make_link('Tests/TeX/makeindex.tex', 1))
+        txmt://open/?url=file://Tests/TeX/makeindex.tex&line=1
+        >>> print(make_link('Wide Open Spaces.txt', 20))
+        txmt://open/?url=file://Wide%20Open%20Spaces.txt&line=20
+
+    """
+    return "txmt://open/?url=file://{}&line={}".format(
+           quote(file.encode('utf-8')), line)
+
+
+# -- Events -------------------------------------------------------------------
+
+class Event(object):
+    """Base class for all events produced while parsing tex output.
+
+    Every event class lists its attributes in ``fields``. The values of these
+    attributes can be specified as positional or keyword arguments when we
+    create a new event. Attributes not specified on creation use the value
+    stored in ``defaults``. The attribute ``tool`` stores the name of the
+    program (e.g. ``latex`` or ``bibtex``) that produced the parsed output.
+
+    """
+
+    __slots__ = ('tool',)
+    fields = ()
+    defaults = {}
+    kind = 'event'
+    severity = 'info'
+
+    def __init__(self, *values, **keywords):
+        """Create a new event.
+
+        Examples:
+
+            >>> message = Message('warning', 'Overfull \\\\hbox')
+            >>> print(message.severity)
+            warning
+            >>> print(message.text)
+            Overfull \\hbox
+
+        """
+        self.tool = keywords.pop('tool', None)
+        for field, value in zip(self.fields, values):
+            keywords[field] = value
+        for field in self.fields:
+            setattr(self, field, keywords.get(field,
+                                              self.defaults.get(field)))
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.as_dict() == other.as_dict())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(field, getattr(self, field))
+            for field in self.fields))
+
+    def as_dict(self):
+        """Return a dictionary containing the data stored in this event.
+
+        Returns: ``{str: object}``
+
+        Examples:
+
+            >>> event = Include('figure.pdf', tool='latex')
+            >>> for key, value in sorted(event.as_dict().items()):
+            ...     print('{}: {}'.format(key, value))
+            event: include
+            name: figure.pdf
+            severity: info
+            tool: latex
+
+        """
+        data = {field: getattr(self, field) for field in self.fields}
+        data.update({'event': self.kind, 'severity': self.severity,
+                     'tool': self.tool})
+        return data
+
+
+class Message(Event):
+    """A message of the tex program without location information.
+
+    The attribute ``severity`` is one of the following strings:
+
+        ``info``, ``warning``, ``error``, ``fatal``
+
+            An informative message, a warning, an error or an error that
+            stopped the tex program.
+
+        ``format``
+
+            A warning about the layout of the document (e.g. an overfull box).
+
+        ``latexmk``
+
+            A message of latexmk itself.
+
+        ``verbose``
+
+            A line that did not match any known pattern.
+
+    """
+
+    __slots__ = ('severity', 'text')
+    fields = __slots__
+    kind = 'message'
+
+
+class Diagnostic(Event):
+    """A warning or error pointing to a certain line of a file.
+
+    The attribute ``file`` stores the absolute (interned) path of the file,
+    while ``name`` stores the path as mentioned in the output of the tex
+    program. The attribute ``details`` may contain additional lines of output
+    describing the problem.
+
+    """
+
+    __slots__ = ('severity', 'text', 'file', 'line', 'name', 'details')
+    fields = __slots__
+    kind = 'diagnostic'
+
+    def __init__(self, *values, **keywords):
+        super(Diagnostic, self).__init__(*values, **keywords)
+        self.file = intern_path(self.file)
+
+    @property
+    def mark(self):
+        """Return the gutter mark for this diagnostic.
+
+        Returns: ``(str, int, str, str)``
+
+        Examples:
+
+            >>> mark = Diagnostic('error', 'Undefined control sequence.',
+            ...                   '/tmp/file.tex', 2, 'file.tex').mark
+            >>> print('{}:{} {} {}'.format(*mark))
+            /tmp/file.tex:2 error Undefined control sequence.
+
+        """
+        return (self.file, self.line, self.severity, self.text)
+
+
+class FileOpened(Event):
+    """The tex program started to process the file ``name``."""
+
+    __slots__ = ('name',)
+    fields = __slots__
+    kind = 'file'
+
+
+class Include(Event):
+    """The tex program included the (graphics) file ``name``."""
+
+    __slots__ = ('name',)
+    fields = __slots__
+    kind = 'include'
+
+
+class Transcript(Event):
+    """The tex program wrote its log to ``file``.
+
+    If ``complete`` is ``False``, then the program stopped before writing the
+    whole transcript.
+
+    """
+
+    __slots__ = ('file', 'name', 'complete')
+    fields = __slots__
+    defaults = {'complete': True}
+    kind = 'transcript'
+
+    def __init__(self, *values, **keywords):
+        super(Transcript, self).__init__(*values, **keywords)
+        self.file = intern_path(self.file)
+
+
+class Written(Event):
+    """A program wrote the output described by ``description`` to ``file``."""
+
+    __slots__ = ('description', 'file', 'name')
+    fields = __slots__
+    kind = 'written'
+
+
+class RunStart(Event):
+    """Latexmk started the program ``program`` using the banner ``banner``.
+
+    The attribute ``number`` counts the programs started by the current call
+    of latexmk.
+
+    """
+
+    __slots__ = ('program', 'banner', 'number')
+    fields = __slots__
+    kind = 'run'
+
+
+class RunSummary(Event):
+    """Latexmk finished a run containing ``errors`` errors and ``warnings``
+    warnings."""
+
+    __slots__ = ('errors', 'warnings')
+    fields = __slots__
+    kind = 'run_summary'
+
+
+class Version(Event):
+    """The program ``program`` reported its version ``version``."""
+
+    __slots__ = ('program', 'version')
+    fields = __slots__
+    kind = 'version'
+
+
+class Progress(Event):
+    """A program processed the file ``name`` with result ``status``."""
+
+    __slots__ = ('description', 'name', 'status')
+    fields = __slots__
+    kind = 'progress'
+
+
+class Sorting(Event):
+    """Makeindex sorted the index entries using ``status``."""
+
+    __slots__ = ('status',)
+    fields = __slots__
+    kind = 'sorting'
+
+
+class GlossaryType(Event):
+    """Makeglossaries added the glossary ``glossary_type``."""
+
+    __slots__ = ('glossary_type', 'files')
+    fields = __slots__
+    kind = 'glossary_type'
+
+
+class XindyRun(Event):
+    """Makeglossaries ran xindy for the glossary ``glossary_type``."""
+
+    __slots__ = ('glossary_type', 'language')
+    fields = __slots__
+    kind = 'xindy'
+
+
+class GlossaryWritten(Event):
+    """Makeglossaries wrote the glossary ``glossary_type`` to ``file``."""
+
+    __slots__ = ('glossary_type', 'file', 'name')
+    fields = __slots__
+    kind = 'glossary_written'
+
+
+class Repeated(Event):
+    """The warning ``text`` occurred ``count`` times in ``location``.
+
+    The parsers report only the first occurrence of certain warnings (see
+    ``parsing.WarningAggregator``). At the end of a run they report a
+    ``Repeated`` event for each of these warnings that occurred more than
+    once. The attribute ``lines`` contains the line ranges mentioned by the
+    warnings as a list of tuples ``(first, last)``. The attribute
+    ``location`` contains the file TeX read when it reported the warning,
+    or ``None`` if we do not know this file.
+
+    """
+
+    __slots__ = ('severity', 'text', 'location', 'count', 'lines')
+    fields = __slots__
+    kind = 'repeated'
+
+    def describe(self):
+        """Return a short description of the occurrences of the warning.
+
+        Returns: ``str``
+
+        Examples:
+
+            >>> print(Repeated('format', 'Overfull', 'main.tex', 3,
+            ...                [(1, 2), (7, 7)]).describe())
+            3 times in main.tex (lines 1–2, 7)
+            >>> print(Repeated('warning', 'LaTeX Font Warning', None, 2,
+            ...                []).describe())
+            2 times
+
+        """
+        description = '{} times'.format(self.count)
+        if self.location:
+            description += ' in {}'.format(self.location)
+        if self.lines:
+            description += ' (lines {})'.format(', '.join(
+                str(first) if first == last else '{}–{}'.format(first, last)
+                for first, last in self.lines))
+        return description
+
+
+class Summary(Event):
+    """A program finished with ``errors`` errors and ``warnings`` warnings.
+
+    The attribute ``fatal`` specifies if the program stopped because of a
+    fatal error.
+
+    """
+
+    __slots__ = ('fatal', 'errors', 'warnings')
+    fields = __slots__
+    kind = 'summary'
+
+
+class ErrorContext(Event):
+    """The line ``text`` shows the context of the last error."""
+
+    __slots__ = ('text', 'fatal')
+    fields = __slots__
+    defaults = {'fatal': False}
+    kind = 'error_context'
+    severity = 'error'
+
+
+# -- Renderers ----------------------------------------------------------------
+
+class Renderer(object):
+    """Write a stream of events to an output stream.
+
+    Subclasses implement a method ``format_<kind>`` for every kind of event
+    (see ``Event.kind``) they want to write. This method returns the text for
+    a single event. Events without such a method produce no output.
+
+    """
+
+    def __init__(self, output=None):
+        """Create a new renderer.
+
+        Arguments:
+
+            output
+
+                The stream the renderer writes to. If this value is ``None``,
+                then the renderer writes to the current value of
+                ``sys.stdout``.
+
+        """
+        self.output = output
+
+    def render(self, event):
+        """Write the text for ``event`` to the output stream.
+
+        Errors should show up as soon as possible. After we write an error we
+        therefore ask the output stream to show its content. If the output
+        stream is an ``output.OutputSink``, then we use its method ``alert``
+        for this purpose, otherwise we flush the stream.
+
+        Arguments:
+
+            event
+
+                The event that should be written.
+
+        """
+        text = self.format(event)
+        if text is None:
+            return
+        output = self.output if self.output else sys.stdout
+        print(text, file=output)
+        if event.severity in {'error', 'fatal'}:
+            getattr(output, 'alert', output.flush)()
+
+    def render_stream(self, events):
+        """Write the text for all events in ``events``."""
+        for event in events:
+            self.render(event)
+
+    def format(self, event):
+        """Return the text for ``event`` or ``None``.
+
+        Arguments:
+
+            event
+
+                The event that should be written.
+
+        Returns: ``str`` or ``None``
+
+        Examples:
+
+            >>> print(Renderer().format(Include('figure.pdf')))
+            None
+
+        """
+        method = getattr(self, 'format_{}'.format(event.kind), None)
+        return method(event) if method else None
+
+
+class HTMLRenderer(Renderer):
+    """Render events as HTML for the output window of TextMate.
+
+    Examples:
+
+        >>> renderer = HTMLRenderer()
+        >>> renderer.render(Message('format', 'Underfull \\\\hbox'))
+        <p class="fmtWarning">Underfull \\hbox</p>
+        >>> renderer.render(FileOpened('file.tex'))
+        <h4>Processing: file.tex</h4>
+
+    """
+
+    css_classes = {'format': 'fmtWarning', 'fatal': 'error',
+                   'latexmk': 'ltxmk'}
+
+    def format_message(self, event):
+        if event.severity == 'verbose':
+            return '<p>{}</p>'.format(event.text)
+        return '<p class="{}">{}</p>'.format(
+            self.css_classes.get(event.severity, event.severity), event.text)
+
+    def format_diagnostic(self, event):
+        link = make_link(event.file, event.line)
+        if event.tool == 'chktex':
+            text = '<p class="{}">{}: <a href="{}">{}:{}</a></p>'.format(
+                event.severity, event.severity.capitalize(), link, event.name,
+                event.text)
+            if event.details:
+                text += '\n<pre>{}</pre>'.format(event.details)
+            return text
+        if event.severity == 'error':
+            return ('<p class="error">Latex Error: <a href="' +
+                    '{}">{}:{}</a> {}</p>'.format(link, event.name,
+                                                  event.line, event.text))
+        return '<p class="{}"><a href="{}">{}</a></p>'.format(
+            event.severity, link, event.text)
+
+    def format_file(self, event):
+        return '<h4>Processing: {}</h4>'.format(event.name)
+
+    def format_include(self, event):
+        return '<ul><li>Including: {}</li></ul>'.format(event.name)
+
+    def format_transcript(self, event):
+        if not event.complete:
+            return ('<p class="error">A fatal error occurred, log file is ' +
+                    'in <a href="{}">{}</a></p>'.format(
+                        make_link(event.file, event.name), event.name))
+        return '<p>Complete transcript is in <a href="{}">{}</a></p>'.format(
+            make_link(event.file), event.name)
+
+    def format_written(self, event):
+        return '<p class="info">{} <a href="{}">{}</a></p>'.format(
+            event.description, make_link(event.file), event.name)
+
+    def format_run(self, event):
+        return '<div class="{}">{}<h3>{}</h3>'.format(
+            event.program, '<hr>' if event.program == 'latex' else '',
+            event.banner)
+
+    def format_run_summary(self, event):
+        return '''<hr><p>Found {} error{}, and {} warning{} in this run</p>
+                  '''.format(event.errors, '' if event.errors == 1 else 's',
+                             event.warnings,
+                             '' if event.warnings == 1 else 's')
+
+    def format_version(self, event):
+        if event.program == 'makeglossaries':
+            return ('<h2>Make Glossaries</h2>' +
+                    '<p class="info" >Version: <i>{}</i></p>'.format(
+                        event.version))
+        return ('<p class="info">Run <strong>Makeindex</strong>, ' +
+                'version {}<p>'.format(event.version))
+
+    def format_progress(self, event):
+        return '<p class="info">{} {}: <strong>{}</strong>'.format(
+            event.description, event.name, event.status)
+
+    def format_sorting(self, event):
+        return ('<p class="info">Sorting entries: <strong>' +
+                '{}</strong><p>'.format(event.status))
+
+    def format_glossary_type(self, event):
+        return ('<p class="info">Add Glossary Type <strong>' +
+                '{}</strong><i> (Files: {})</i></p>'.format(
+                    event.glossary_type, event.files))
+
+    def format_xindy(self, event):
+        return ('<h3>Run xindy for glossary type {}</h3>'.format(
+                event.glossary_type) +
+                '<p class="info">Language: {}</p>'.format(event.language))
+
+    def format_glossary_written(self, event):
+        return ('<p class="info">Finished glossary for type <strong>' +
+                '{}</strong>. Output is in <a href="{}">{}</a></p>'.format(
+                    event.glossary_type, make_link(event.file, 1),
+                    event.name))
+
+    def format_repeated(self, event):
+        return '<p class="{}">Repeated {}: {}</p>'.format(
+            self.css_classes.get(event.severity, event.severity),
+            event.describe(), event.text)
+
+    def format_error_context(self, event):
+        return '<p class="error">\n{}\n</p>'.format(
+            event.text if event.fatal else '<pre>{}</pre>'.format(event.text))
+
+
+class TextRenderer(Renderer):
+    """Render events as plain text.
+
+    Only messages, diagnostics, error context lines and summaries produce
+    output. Every line starts with the severity of the event.
+
+    Examples:
+
+        >>> renderer = TextRenderer()
+        >>> renderer.render(Diagnostic('warning', 'Citation undefined',
+        ...                            '/tmp/file.tex', 7, './file.tex'))
+        warning: /tmp/file.tex:7: Citation undefined
+        >>> renderer.render(Message('info', 'This is BibTeX'))
+        info: This is BibTeX
+        >>> renderer.render(Include('figure.pdf'))
+        >>> renderer.render(Summary(False, 1, 2))
+        info: 1 error, 2 warnings
+
+    """
+
+    def format_message(self, event):
+        return '{}: {}'.format(event.severity, event.text)
+
+    format_error_context = format_message
+
+    def format_diagnostic(self, event):
+        return '{}: {}:{}: {}'.format(event.severity, event.file, event.line,
+                                      event.text)
+
+    def format_repeated(self, event):
+        return '{}: repeated {}: {}'.format(event.severity, event.describe(),
+                                            event.text)
+
+    def format_summary(self, event):
+        return '{}: {} error{}, {} warning{}'.format(
+            'fatal' if event.fatal else 'info', event.errors,
+            '' if event.errors == 1 else 's', event.warnings,
+            '' if event.warnings == 1 else 's')
+
+
+class NDJSONRenderer(Renderer):
+    """Render events as newline delimited JSON.
+
+    Examples:
+
+        >>> NDJSONRenderer().render(Sorting('2 comparisons', tool='makeindex'))
+        ... # doctest:+NORMALIZE_WHITESPACE
+        {"event": "sorting", "severity": "info", "status": "2 comparisons",
+         "tool": "makeindex"}
+
+    """
+
+    def format(self, event):
+        return dumps(event.as_dict(), sort_keys=True, ensure_ascii=False)
+
+
+class NDJSONDiagnosticRenderer(NDJSONRenderer):
+    """Render only warnings, errors and summaries as newline delimited JSON.
+
+    Every warning or error produces an object containing its ``severity``,
+    ``file``, ``line``, ``message``, the ``tool`` that reported it and the
+    number of the ``run`` (see ``RunStart``). Messages
+    without location information use ``null`` for ``file`` and ``line``.
+    Repeated warnings (see ``Repeated``) produce an object containing the
+    ``count`` and the ``lines`` of the occurrences. A ``Summary`` produces
+    an object containing the values of its attributes.
+
+    Examples:
+
+        >>> renderer = NDJSONDiagnosticRenderer()
+        >>> renderer.render(Message('info', 'This is BibTeX'))
+        >>> renderer.render(RunStart('latex', 'This is pdfTeX', 3))
+        >>> renderer.render(Diagnostic('warning', 'Citation undefined',
+        ...                            '/tmp/file.tex', 7, 'file.tex',
+        ...                            tool='latex'))
+        ... # doctest:+NORMALIZE_WHITESPACE
+        {"event": "diagnostic", "file": "/tmp/file.tex", "line": 7,
+         "message": "Citation undefined", "run": 3, "severity": "warning",
+         "tool": "latex"}
+        >>> renderer.render(Summary(False, 0, 1))
+        ... # doctest:+NORMALIZE_WHITESPACE
+        {"errors": 0, "event": "summary", "fatal": false, "warnings": 1}
+
+    """
+
+    severities = {'warning', 'error', 'fatal'}
+
+    def __init__(self, output=None):
+        super(NDJSONDiagnosticRenderer, self).__init__(output)
+        self.run = 0
+
+    def format(self, event):
+        if event.kind == 'run':
+            self.run = event.number
+            return None
+        if event.kind == 'summary':
+            return dumps({'event': 'summary', 'fatal': event.fatal,
+                          'errors': event.errors,
+                          'warnings': event.warnings}, sort_keys=True)
+        if event.kind == 'repeated' and event.severity in self.severities:
+            return dumps({'event': 'repeated', 'severity': event.severity,
+                          'file': event.location, 'lines': event.lines,
+                          'count': event.count, 'message': event.text,
+                          'tool': event.tool, 'run': max(self.run, 1)},
+                         sort_keys=True, ensure_ascii=False)
+        if (event.kind not in {'diagnostic', 'message'} or
+                event.severity not in self.severities):
+            return None
+        return dumps({'event': 'diagnostic', 'severity': event.severity,
+                      'file': getattr(event, 'file', None),
+                      'line': getattr(event, 'line', None),
+                      'message': event.text, 'tool': event.tool,
+                      'run': max(self.run, 1)},
+                     sort_keys=True, ensure_ascii=False)
@@ -11,8 +11,8 @@ from io import open
 from os import getenv
 from os.path import normpath, realpath
 from pickle import load, dump
-from pipes import quote as shellquote
-from subprocess import call
+
+from launcher import call, ProgramNotFound
 
 
 # -- Functions ----------------------------------------------------------------
@@ -92,7 +92,7 @@ def update_marks(cache_filename, marks_to_set=[]):
               cache_filename))
 
     marks_remove = {}
-    mate = getenv('TM_MATE')
+    mate = getenv('TM_MATE', 'mate')
     for filepath, mark in marks_to_remove:
         path = normpath(realpath(filepath))
         marks = marks_remove.get(path)
@@ -104,25 +104,26 @@ def update_marks(cache_filename, marks_to_set=[]):
     marks_add = {}
     for filepath, line, mark, message in marks_to_set:
         path = normpath(realpath(filepath))
-        message = shellquote(message) if message else None
         marks = marks_add.get(path)
         if marks:
             marks.append((line, mark, message))
         else:
             marks_add[path] = [(line, mark, message)]
 
-    commands = {filepath: '{} {}'.format(mate,
-                                         ' '.join(['-c {}'.format(mark) for
-                                                   mark in marks]))
+    # Update all marks of a file with a single call of `mate`
+    commands = {filepath: [mate] + [argument for mark in marks
+                                    for argument in ('-c', mark)]
                 for filepath, marks in marks_remove.items()}
 
     for filepath, markers in marks_add.items():
-        command = ' '.join(['-l {} -s {}{}'.format(line, mark,
-                                                   ":{}".format(content) if
-                                                   content else '')
-                            for line, mark, content in markers])
-        commands[filepath] = '{} {}'.format(commands.get(filepath, mate),
-                                            command)
+        command = commands.setdefault(filepath, [mate])
+        for line, mark, content in markers:
+            command.extend(['-l', '{}'.format(line), '-s', '{}{}'.format(
+                mark, ":{}".format(content) if content else '')])
 
     for filepath, command in commands.items():
-        call("{} {}".format(command, shellquote(filepath)), shell=True)
+        try:
+            call(command + [filepath])
+        except ProgramNotFound:
+            # Without `mate` we can not set any marks
+            break
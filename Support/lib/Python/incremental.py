@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to decide which steps of a build are necessary.
+
+If we run a tex engine with the option ``-recorder``, then it writes the
+names of all files it read and wrote into a file with the extension
+``.fls``. After every build we store a fingerprint of each of these files in
+the cache of the project. The next build only needs to run the engine if one
+of the fingerprints changed.
+
+A fingerprint contains the modification time, the size and the content hash
+of a file. We only hash a file if its modification time or size changed,
+so checking an unchanged project takes a few milliseconds. Files outside the
+project directory (the packages of the tex distribution) are only compared
+by modification time and size.
+
+The tools creating the bibliography and the indexes only depend on some of
+the files written by the engine. The functions ``bibliography_inputs`` and
+``index_inputs`` return digests of exactly these inputs, so we can skip
+these tools too, if their input did not change.
+
+The state of the last build is stored under the key ``incremental`` of the
+cache file of the project (``.filename.lb``).
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from hashlib import sha1
+from io import open
+from os import getcwd, stat
+from os.path import exists, isabs, join, normpath, relpath, splitext
+from pickle import dump, load
+from re import compile
+
+
+# -- Constants ----------------------------------------------------------------
+
+# Lines of an aux file read by bibtex
+BIBTEX_LINE = compile(br'^\\(?:citation|bibdata|bibstyle)\{')
+BIBDATA = compile(br'^\\bibdata\{([^}]*)\}')
+BIBSTYLE = compile(br'^\\bibstyle\{([^}]*)\}')
+# Data sources listed in the control file of biber
+BIBER_DATASOURCE = compile(br'<bcf:datasource[^>]*>([^<]+)</bcf:datasource>')
+# Lines of an aux file containing cross-references
+REFERENCE_LINE = compile(br'^\\(?:newlabel|bibcite)\{')
+INCLUDED_AUX = compile(br'^\\@input\{([^}]+)\}')
+# Lines of other auxiliary files that do not matter for the document
+NOISE_LINE = compile(br'^\s*(?:\\relax\s*)?$')
+# Files written by latex and read again by the next run
+REFERENCE_EXTENSIONS = ['.toc', '.lof', '.lot', '.out', '.nav']
+# Files written by the bibliography and index tools and read by latex
+TOOL_EXTENSIONS = ['.bbl', '.ind', '.gls', '.acr']
+
+
+# -- Functions ----------------------------------------------------------------
+
+def read_recorder_file(filename):
+    """Read the files recorded by a tex engine run with ``-recorder``.
+
+    This function returns the files read by the engine and the files written
+    by it. Paths inside the working directory of the engine are returned
+    relative to this directory. If the file does not exist, then this
+    function returns two empty lists.
+
+    Returns: ``([str], [str])``
+
+    Examples:
+
+        >>> from os import remove
+        >>> with open('/tmp/test.fls', 'w') as fls:
+        ...     _ = fls.write('PWD /tmp\\n'
+        ...                   'INPUT /usr/texmf/tex/latex/base/article.cls\\n'
+        ...                   'INPUT ./test.tex\\n'
+        ...                   'INPUT ./test.aux\\n'
+        ...                   'OUTPUT test.aux\\n'
+        ...                   'INPUT ./test.tex\\n'
+        ...                   'OUTPUT test.pdf\\n')
+        >>> inputs, outputs = read_recorder_file('/tmp/test.fls')
+        >>> print('\\n'.join(inputs))
+        /usr/texmf/tex/latex/base/article.cls
+        test.tex
+        test.aux
+        >>> print(' '.join(outputs))
+        test.aux test.pdf
+        >>> remove('/tmp/test.fls')
+
+    """
+    inputs, outputs = [], []
+    directory = getcwd()
+    try:
+        with open(filename, encoding='utf-8', errors='replace') as recorder:
+            for line in recorder:
+                kind, _, path = line.rstrip('\n').partition(' ')
+                if kind == 'PWD':
+                    directory = path
+                    continue
+                path = normpath(path if isabs(path) else
+                                join(directory, path))
+                if not relpath(path, directory).startswith('..'):
+                    path = relpath(path, directory)
+                files = (inputs if kind == 'INPUT' else
+                         outputs if kind == 'OUTPUT' else None)
+                if files is not None and path not in files:
+                    files.append(path)
+    except (IOError, OSError):
+        pass
+    return inputs, outputs
+
+
+def digest(filename, lines=None):
+    """Return a hash of the content of ``filename``.
+
+    If ``lines`` is a regular expression, then we only hash the lines
+    matching it. This function returns ``None`` if the file does not exist.
+
+    Returns: ``str`` or ``None``
+
+    Examples:
+
+        >>> from os import remove
+        >>> with open('/tmp/test.aux', 'w') as aux:
+        ...     _ = aux.write('\\\\relax\\n\\\\citation{knuth}\\n')
+        >>> first = digest('/tmp/test.aux', BIBTEX_LINE)
+        >>> with open('/tmp/test.aux', 'w') as aux:
+        ...     _ = aux.write('\\\\relax\\n\\\\citation{knuth}\\n'
+        ...                   '\\\\newlabel{intro}{{1}{1}}\\n')
+        >>> digest('/tmp/test.aux', BIBTEX_LINE) == first
+        True
+        >>> digest('/tmp/test.aux') == first
+        False
+        >>> remove('/tmp/test.aux')
+        >>> digest('/tmp/test.aux') is None
+        True
+
+    """
+    content = sha1()
+    try:
+        with open(filename, 'rb') as data:
+            if lines is None:
+                for block in iter(lambda: data.read(1 << 16), b''):
+                    content.update(block)
+            else:
+                for line in data:
+                    if lines.match(line):
+                        content.update(line)
+    except (IOError, OSError):
+        return None
+    return content.hexdigest()
+
+
+def references_digest(file_without_suffix):
+    """Return a hash of the cross-reference data written by latex.
+
+    The hash covers the labels and bibliography entries in the aux file of
+    the document and the aux files it includes, as well as the tables of
+    contents, figures and tables, the PDF bookmarks and the navigation file
+    of beamer. Other lines of the aux files and empty or ``\\relax`` lines
+    do not change the hash. If the hash changes after a latex run, then the
+    document needs another run to resolve its references.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> from os import remove
+        >>> with open('/tmp/test.aux', 'w') as aux:
+        ...     _ = aux.write('\\\\relax\\n\\\\newlabel{intro}{{1}{1}}\\n')
+        >>> first = references_digest('/tmp/test')
+        >>> with open('/tmp/test.aux', 'w') as aux:
+        ...     _ = aux.write('\\\\relax\\n\\\\newlabel{intro}{{1}{1}}\\n'
+        ...                   '\\\\gdef \\\\@abspage@last{1}\\n')
+        >>> references_digest('/tmp/test') == first
+        True
+        >>> with open('/tmp/test.toc', 'w') as toc:
+        ...     _ = toc.write('\\\\contentsline {section}{Intro}{1}\\n')
+        >>> references_digest('/tmp/test') == first
+        False
+        >>> remove('/tmp/test.aux')
+        >>> remove('/tmp/test.toc')
+
+    """
+    content = sha1()
+    auxfiles = ['{}.aux'.format(file_without_suffix)]
+    for auxfile in auxfiles:
+        try:
+            with open(auxfile, 'rb') as aux:
+                for line in aux:
+                    included = INCLUDED_AUX.match(line)
+                    if included:
+                        name = included.group(1).decode('utf-8', 'replace')
+                        if name not in auxfiles:
+                            auxfiles.append(name)
+                    elif REFERENCE_LINE.match(line):
+                        content.update(line)
+        except (IOError, OSError):
+            pass
+    for extension in REFERENCE_EXTENSIONS:
+        content.update(extension.encode('ascii'))
+        try:
+            with open('{}{}'.format(file_without_suffix, extension),
+                      'rb') as auxiliary:
+                for line in auxiliary:
+                    if not NOISE_LINE.match(line):
+                        content.update(line)
+        except (IOError, OSError):
+            pass
+    return content.hexdigest()
+
+
+def tool_outputs(filenames):
+    """Return the files the bibliography and index tools may write.
+
+    Arguments:
+
+        filenames
+
+            The files read by bibtex, makeindex and makeglossaries.
+
+    Returns: ``[str]``
+
+    Examples:
+
+        >>> print(' '.join(tool_outputs(['test.aux', 'test.idx'])[:4]))
+        test.bbl test.ind test.gls test.acr
+
+    """
+    outputs = []
+    for filename in filenames:
+        for extension in TOOL_EXTENSIONS:
+            output = '{}{}'.format(splitext(filename)[0], extension)
+            if output not in outputs:
+                outputs.append(output)
+    return outputs
+
+
+def fingerprint(filename, previous=None):
+    """Return the fingerprint of ``filename``.
+
+    The fingerprint is a list containing the modification time, the size and
+    the content hash of the file. We only hash files inside the current
+    directory. If the modification time and the size still match the
+    fingerprint ``previous``, then we reuse its hash. This function returns
+    ``None`` if the file does not exist.
+
+    Returns: ``[float, int, str]`` or ``None``
+
+    Examples:
+
+        >>> from os import remove
+        >>> with open('test.tmp', 'w') as data:
+        ...     _ = data.write('TeX')
+        >>> first = fingerprint('test.tmp')
+        >>> fingerprint('test.tmp', first) == first
+        True
+        >>> remove('test.tmp')
+        >>> fingerprint('test.tmp') is None
+        True
+
+    """
+    try:
+        status = stat(filename)
+    except OSError:
+        return None
+    signature = [status.st_mtime, status.st_size]
+    if previous and previous[:2] == signature:
+        return previous
+    local = not isabs(filename) and not filename.startswith('..')
+    return signature + [digest(filename) if local else None]
+
+
+def snapshot(filenames, previous={}):
+    """Return the fingerprints of all files in ``filenames``.
+
+    Arguments:
+
+        filenames
+
+            The files we want to fingerprint.
+
+        previous
+
+            A dictionary containing older fingerprints of the files (see
+            ``fingerprint``).
+
+    Returns: ``{str: [float, int, str]}``
+
+    """
+    return {filename: fingerprint(filename, previous.get(filename))
+            for filename in filenames}
+
+
+def outdated(fingerprints):
+    """Return the files whose fingerprint changed.
+
+    Arguments:
+
+        fingerprints
+
+            A dictionary mapping file names to the fingerprints recorded
+            after the last build.
+
+    Returns: ``[str]``
+
+    Examples:
+
+        >>> from os import remove
+        >>> with open('test.tmp', 'w') as data:
+        ...     _ = data.write('TeX')
+        >>> fingerprints = {'test.tmp': fingerprint('test.tmp')}
+        >>> outdated(fingerprints) == []
+        True
+        >>> with open('test.tmp', 'w') as data:
+        ...     _ = data.write('LaTeX')
+        >>> for filename in outdated(fingerprints):
+        ...     print(filename)
+        test.tmp
+        >>> remove('test.tmp')
+
+    """
+    changed = []
+    for filename, recorded in fingerprints.items():
+        current = fingerprint(filename, recorded)
+        if current is None or recorded is None:
+            if current != recorded:
+                changed.append(filename)
+        elif current[2] != recorded[2] or (current[2] is None and
+                                           current[:2] != recorded[:2]):
+            changed.append(filename)
+    return sorted(changed)
+
+
+def bibliography_inputs(file_without_suffix, auxfiles=()):
+    """Return digests of the input of bibtex or biber.
+
+    For biber we hash the control file (``.bcf``) and the data sources it
+    lists. For bibtex we hash the lines of the aux files bibtex reads, the
+    bib files listed in them and the bibliography style, if it is stored in
+    the current directory. The returned dictionary is empty, if the
+    document has no bibliography.
+
+    Arguments:
+
+        file_without_suffix
+
+            The name of the tex file without its extension.
+
+        auxfiles
+
+            The aux files processed by bibtex (see ``bibtex_runs`` in
+            ``texmate.py``).
+
+    Returns: ``{str: str}``
+
+    """
+    inputs = {}
+    control_file = '{}.bcf'.format(file_without_suffix)
+    if exists(control_file):
+        sources = [control_file]
+        with open(control_file, 'rb') as control:
+            sources.extend(source.decode('utf-8', 'replace') for source in
+                           BIBER_DATASOURCE.findall(control.read()))
+    else:
+        sources = []
+        for auxfile in auxfiles:
+            aux_digest = digest(auxfile, BIBTEX_LINE)
+            if aux_digest is None:
+                continue
+            inputs[auxfile] = aux_digest
+            with open(auxfile, 'rb') as aux:
+                for line in aux:
+                    bibstyle = BIBSTYLE.match(line)
+                    if bibstyle:
+                        style = '{}.bst'.format(bibstyle.group(1).decode(
+                            'utf-8', 'replace').strip())
+                        if exists(style):
+                            inputs[style] = digest(style)
+                    bibdata = BIBDATA.match(line)
+                    if bibdata:
+                        sources.extend(
+                            '{}.bib'.format(splitext(name.strip())[0])
+                            for name in bibdata.group(1).decode(
+                                'utf-8', 'replace').split(','))
+        if not sources:
+            return {}
+    for source in sources:
+        if not exists(source):
+            from tex import expand_name
+            source = expand_name(source)
+        inputs[source] = digest(source)
+    return inputs
+
+
+def index_inputs(index_files):
+    """Return digests of the input of makeindex and makeglossaries.
+
+    Arguments:
+
+        index_files
+
+            The index files and glossary files of the document.
+
+    Returns: ``{str: str}``
+
+    """
+    return {index_file: digest(index_file) for index_file in index_files}
+
+
+def load_state(cache_filename, command):
+    """Return the state of the last build stored in ``cache_filename``.
+
+    If the last build used a command other than ``command``, then this
+    function returns an empty state.
+
+    Returns: ``{str: object}``
+
+    Examples:
+
+        >>> from os import remove
+        >>> store_state('.test.lb', {'command': ['pdflatex', 'test.tex']})
+        >>> load_state('.test.lb', ['pdflatex', 'test.tex']) != {}
+        True
+        >>> load_state('.test.lb', ['xelatex', 'test.tex'])
+        {}
+        >>> remove('.test.lb')
+        >>> load_state('.test.lb', ['pdflatex', 'test.tex'])
+        {}
+
+    """
+    try:
+        with open(cache_filename, 'rb') as storage:
+            state = load(storage).get('incremental', {})
+    except Exception:
+        return {}
+    return state if state.get('command') == command else {}
+
+
+def store_state(cache_filename, state):
+    """Store the state of the current build in ``cache_filename``.
+
+    All other data in the cache file stays unchanged.
+
+    """
+    try:
+        with open(cache_filename, 'rb') as storage:
+            typesetting_data = load(storage)
+    except Exception:
+        typesetting_data = {}
+    typesetting_data['incremental'] = state
+    try:
+        with open(cache_filename, 'wb') as storage:
+            dump(typesetting_data, storage)
+    except (IOError, OSError):
+        pass
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to start external programs.
+
+The functions in this module execute programs directly from a list of
+arguments. In contrast to ``shell=True`` this saves one ``/bin/sh`` process
+per program and we do not have to quote the arguments. All programs share
+the environment of the current process (``os.environ``).
+
+For every program this module records the wall time, the CPU time used by
+the program and its exit status in the list ``spawns``. The function
+``profile`` summarizes this list, which shows where a command of the bundle
+spends its time.
+
+If a program does not exist, then the functions of this module raise
+``ProgramNotFound``.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import namedtuple
+from errno import ENOENT
+from os import environ
+from os.path import basename
+from subprocess import CalledProcessError, Popen, PIPE, STDOUT  # noqa
+from timeit import default_timer
+try:
+    from os import wait4, WEXITSTATUS, WIFSIGNALED, WTERMSIG
+except ImportError:  # Windows
+    wait4 = None
+
+
+# -- Global Variables ---------------------------------------------------------
+
+# One entry for every program started by this module
+Spawn = namedtuple('Spawn', ['arguments', 'wall', 'cpu', 'status'])
+spawns = []
+
+
+# -- Classes ------------------------------------------------------------------
+
+class ProgramNotFound(OSError):
+    """Raised if a program we want to start does not exist.
+
+    The attribute ``program`` contains the name of the program.
+
+    """
+
+    def __init__(self, program):
+        """Create an error for the missing program ``program``."""
+        OSError.__init__(self, ENOENT, '{}: command not found'.format(program))
+        self.program = program
+
+
+class Process(Popen):
+    """A program started without a shell.
+
+    The constructor takes the same arguments as ``subprocess.Popen``, but
+    ``arguments`` always has to be a list. When the program ends, ``wait``
+    records the program in ``spawns``.
+
+    If the program does not exist, then the constructor raises
+    ``ProgramNotFound``.
+
+    Examples:
+
+        >>> process = Process(['sh', '-c', 'exit 3'])
+        >>> process.wait()
+        3
+        >>> print(' '.join(spawns[-1].arguments), spawns[-1].status)
+        sh -c exit 3 3
+        >>> spawns[-1].cpu >= 0 and spawns[-1].wall >= 0
+        True
+        >>> Process(['nonexistent-tool']) # doctest:+IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        ...
+        ProgramNotFound: [Errno 2] nonexistent-tool: command not found
+
+    """
+
+    def __init__(self, arguments, **keywords):
+        """Start the program specified by ``arguments``."""
+        keywords.setdefault('env', environ)
+        keywords.setdefault('close_fds', True)
+        self.arguments = list(arguments)
+        self.started = default_timer()
+        self.recorded = False
+        try:
+            Popen.__init__(self, self.arguments, **keywords)
+        except OSError as error:
+            if error.errno != ENOENT:
+                raise
+        else:
+            return
+        # Raise the error outside of the handler, so Python 3 does not show
+        # the original error as its context
+        raise ProgramNotFound(self.arguments[0])
+
+    def wait(self, *arguments, **keywords):
+        """Wait for the program to end and return its exit status.
+
+        Returns: ``int``
+
+        """
+        cpu = None
+        timeout = keywords.get('timeout', arguments[0] if arguments else None)
+        if self.returncode is None and wait4 and timeout is None:
+            try:
+                _, status, usage = wait4(self.pid, 0)
+            except OSError:
+                pass
+            else:
+                self.returncode = (-WTERMSIG(status) if WIFSIGNALED(status)
+                                   else WEXITSTATUS(status))
+                cpu = usage.ru_utime + usage.ru_stime
+        status = Popen.wait(self, *arguments, **keywords)
+        if not self.recorded:
+            self.recorded = True
+            spawns.append(Spawn(self.arguments,
+                                default_timer() - self.started, cpu, status))
+        return status
+
+
+# -- Functions ----------------------------------------------------------------
+
+def call(arguments, **keywords):
+    """Run a program and return its exit status.
+
+    Returns: ``int``
+
+    Examples:
+
+        >>> call(['true'])
+        0
+
+    """
+    return Process(arguments, **keywords).wait()
+
+
+def check_output(arguments, **keywords):
+    """Run a program and return its standard output as text.
+
+    If the program exits with a non-zero status, then this function raises
+    ``CalledProcessError``.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> print(check_output(['echo', 'Tex', 'Mate']).strip())
+        Tex Mate
+        >>> check_output(['false']) # doctest:+IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        ...
+        CalledProcessError: Command '['false']' returned non-zero exit status 1
+
+    """
+    process = Process(arguments, stdout=PIPE, universal_newlines=True,
+                      **keywords)
+    output, _ = process.communicate()
+    if process.returncode:
+        raise CalledProcessError(process.returncode, arguments)
+    return output
+
+
+def profile():
+    """Return a summary of all programs started so far.
+
+    The summary contains one line per program with its wall time, CPU time
+    and exit status, followed by the total wall time.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> del spawns[:]
+        >>> call(['true'])
+        0
+        >>> print(profile()) # doctest:+ELLIPSIS
+        true           ... s ... s  status 0
+        1 process, ... s
+
+    """
+    lines = ['{:<12} {:>7.3f} s {:>7} s  status {}'.format(
+             basename(spawn.arguments[0]), spawn.wall,
+             '?' if spawn.cpu is None else '{:.3f}'.format(spawn.cpu),
+             spawn.status) for spawn in spawns]
+    lines.append('{} process{}, {:.3f} s'.format(
+        len(spawns), '' if len(spawns) == 1 else 'es',
+        sum(spawn.wall for spawn in spawns)))
+    return '\n'.join(lines)
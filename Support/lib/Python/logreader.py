@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to read (large) log files of tex programs.
+
+Depending on the error the tex engine might write text in different encodings
+into the same log file. The class ``Decoder`` therefore decodes the output of
+tex programs line by line. The readers in this module provide the
+``readline`` interface used by the parsers in ``parsing`` and decode every
+line only once.
+
+The class ``MappedLog`` reads a log file via a memory map. Lines are only
+decoded when a parser reads them. Parsers that are not interested in the
+content of every line can use the method ``skip`` to jump over lines that can
+not match any of their patterns, without decoding these lines at all.
+
+The class ``PipedLog`` provides the same interface for output read from a
+pipe while the tex program is still running. It reads the output in chunks
+and only decodes the lines a parser actually reads.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from io import open, TextIOBase
+from mmap import mmap, ACCESS_READ
+from os import read as read_descriptor
+from os import sys, path
+sys.path.insert(1, path.dirname(path.abspath(__file__)))
+
+from tex import encodings
+
+
+# -- Constants ----------------------------------------------------------------
+
+# Number of bytes ``PipedLog`` reads from its stream at once
+CHUNK_SIZE = 64 * 1024
+
+
+# -- Functions ----------------------------------------------------------------
+
+def map_file(filepath):
+    """Return a read only memory map containing the content of ``filepath``.
+
+    Since we can not map empty files, this function returns an empty bytes
+    object for them.
+
+    Arguments:
+
+        filepath
+
+            The path of the file that should be mapped.
+
+    Returns: ``mmap`` or ``bytes``
+
+    Examples:
+
+        >>> buffer = map_file('Tests/Log/bibtex.log')
+        >>> buffer[:14] == b'This is BibTeX'
+        True
+        >>> buffer.close()
+
+    """
+    with open(filepath, 'rb') as log:
+        try:
+            return mmap(log.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            return b''
+
+
+def text_stream(stream):
+    """Return a stream providing the decoded lines of ``stream``.
+
+    If ``stream`` already returns text, then this function returns it
+    unchanged. We wrap binary streams in a ``PipedLog`` and other streams
+    only providing ``readline`` in a ``DecodedStream``.
+
+    Arguments:
+
+        stream
+
+            A stream like object containing data produced by a tex program.
+
+    Returns: ``stream like object``
+
+    Examples:
+
+        >>> from io import BytesIO, StringIO
+        >>> stream = StringIO('Text')
+        >>> text_stream(stream) is stream
+        True
+        >>> print(text_stream(BytesIO(b'Bytes')).readline())
+        Bytes
+
+    """
+    if stream is None or isinstance(stream, (TextIOBase, DecodedStream,
+                                             MappedLog, PipedLog)):
+        return stream
+    if hasattr(stream, 'read'):
+        return PipedLog(stream)
+    return DecodedStream(stream)
+
+
+# -- Classes ------------------------------------------------------------------
+
+class Decoder(object):
+    """Decode lines of tex output.
+
+    We try the encodings in ``tex.encodings`` in order until one of them
+    is able to decode a line. Since most lines of a log file are valid UTF-8,
+    we always try the first encoding first. If a line is not valid in this
+    encoding, then we remember the encoding that worked in its place and try
+    it first for the next line that is not valid in the first encoding.
+
+    """
+
+    def __init__(self, encodings=encodings):
+        """Create a new decoder.
+
+        Arguments:
+
+            encodings
+
+                The encodings the decoder should try in order.
+
+        """
+        self.encodings = encodings
+        self.fallback = None
+
+    def decode(self, line):
+        """Decode a single line.
+
+        Arguments:
+
+            line
+
+                The bytes of a single line.
+
+        Returns: ``str``
+
+        Examples:
+
+            >>> decoder = Decoder()
+            >>> print(decoder.decode('Ünicöde'.encode('utf-8')))
+            Ünicöde
+            >>> print(decoder.decode('Ünicöde'.encode('mac_roman')))
+            Ünicöde
+            >>> print(decoder.fallback)
+            mac_roman
+
+        """
+        try:
+            return line.decode(self.encodings[0])
+        except UnicodeDecodeError:
+            pass
+        if self.fallback:
+            try:
+                return line.decode(self.fallback)
+            except UnicodeDecodeError:
+                pass
+        for encoding in self.encodings[1:]:
+            try:
+                text = line.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+            self.fallback = encoding
+            return text
+        return line.decode(self.encodings[0], 'replace')
+
+
+class DecodedStream(object):
+    """Decode the lines of a stream returning bytes."""
+
+    def __init__(self, stream):
+        r"""Create a new reader for the binary stream ``stream``.
+
+        Arguments:
+
+            stream
+
+                A stream like object providing the method ``readline``.
+
+        Examples:
+
+            >>> from io import BytesIO
+            >>> log = DecodedStream(BytesIO('Ünicöde\n'.encode('mac_roman')))
+            >>> print(log.readline().rstrip())
+            Ünicöde
+            >>> log.readline() == ''
+            True
+
+        """
+        self.stream = stream
+        self.decoder = Decoder()
+
+    def readline(self):
+        """Read and decode the next line.
+
+        Returns: ``str``
+
+        """
+        line = self.stream.readline()
+        return self.decoder.decode(line) if isinstance(line, bytes) else line
+
+
+class MappedLog(object):
+    """Read the lines of a memory mapped log file."""
+
+    def __init__(self, buffer, start=0, end=None):
+        r"""Create a new reader for the bytes in ``buffer[start:end]``.
+
+        Arguments:
+
+            buffer
+
+                A memory map (see ``map_file``) or a bytes object.
+
+            start
+
+                The offset of the first byte that should be read.
+
+            end
+
+                The offset after the last byte that should be read. If this
+                value is ``None``, then the reader stops at the end of
+                ``buffer``.
+
+        Examples:
+
+            >>> log = MappedLog(b'First\nSecond\nThird', start=6)
+            >>> print(log.readline().rstrip())
+            Second
+            >>> print(log.readline())
+            Third
+            >>> log.readline() == ''
+            True
+
+        """
+        self.buffer = buffer
+        self.position = start
+        self.end = len(buffer) if end is None else end
+        self.decoder = Decoder()
+
+    def readline(self):
+        """Read and decode the next line.
+
+        The returned line includes its trailing newline character. At the
+        end of the log this method returns an empty string.
+
+        Returns: ``str``
+
+        """
+        end = self.buffer.find(b'\n', self.position, self.end)
+        end = self.end if end < 0 else end + 1
+        line = self.buffer[self.position:end]
+        self.position = end
+        return self.decoder.decode(line) if line else ''
+
+    def skip(self, prefilter, width=79):
+        r"""Skip lines that can not contain text found by ``prefilter``.
+
+        After calling this method, the next line returned by ``readline`` is
+        the first line containing a match for ``prefilter``. Since
+        ``prefilter`` has to find all lines that TeX might have wrapped (see
+        ``parsing.make_prefilter``) the skipped lines can not be part of the
+        same statement as the next line.
+
+        Arguments:
+
+            prefilter
+
+                A compiled bytes regex.
+
+            width
+
+                The maximum line length of the tex program.
+
+        Examples:
+
+            >>> from re import compile
+            >>> log = MappedLog(b'One\nTwo\nError: Three\nFour\n')
+            >>> log.skip(compile(b'Error'))
+            >>> print(log.readline().rstrip())
+            Error: Three
+            >>> log.skip(compile(b'Error'))
+            >>> log.readline() == ''
+            True
+
+        """
+        start = self.position
+        if start == 0:
+            # The prefilter finds long lines by the preceding newline
+            # character, so we never skip the first line, if it is long.
+            end = self.buffer.find(b'\n', 0, self.end)
+            if (self.end if end < 0 else end) >= width:
+                return
+        matching = prefilter.search(self.buffer, max(start - 1, 0), self.end)
+        if not matching:
+            self.position = self.end
+            return
+        start = self.buffer.rfind(b'\n', start, matching.start() + 1)
+        if start >= 0:
+            self.position = start + 1
+
+
+class PipedLog(object):
+    """Read the lines of tex output from a pipe.
+
+    The reader stores the output in a buffer, which it extends by reading
+    chunks of at most ``size`` bytes from the stream. Lines are only copied
+    out of the buffer and decoded when a parser reads them. Like
+    ``MappedLog`` this class provides the method ``skip``, so parsers can
+    jump over lines that do not interest them without decoding them.
+
+    """
+
+    def __init__(self, stream, size=CHUNK_SIZE):
+        r"""Create a new reader for the binary stream ``stream``.
+
+        Arguments:
+
+            stream
+
+                A binary stream like object, usually the standard output of
+                a tex program started via ``subprocess.Popen``.
+
+            size
+
+                The maximum number of bytes read from ``stream`` at once.
+
+        Examples:
+
+            >>> from io import BytesIO
+            >>> log = PipedLog(BytesIO('First\nÜnicöde'.encode('mac_roman')),
+            ...                size=4)
+            >>> print(log.readline().rstrip())
+            First
+            >>> print(log.readline())
+            Ünicöde
+            >>> log.readline() == ''
+            True
+
+        """
+        self.size = size
+        self.buffer = bytearray()
+        # Offset of the first unread byte in ``buffer``
+        self.start = 0
+        self.finished = False
+        # Number of bytes removed from the front of ``buffer``
+        self.discarded = 0
+        self.decoder = Decoder()
+        # Return the data available right now instead of waiting until the
+        # tex program wrote a whole chunk
+        if hasattr(stream, 'read1'):
+            self.read = stream.read1
+            return
+        try:
+            descriptor = stream.fileno()
+        except (AttributeError, IOError, ValueError):
+            self.read = stream.read
+        else:
+            self.read = lambda size: read_descriptor(descriptor, size)
+
+    def fill(self):
+        """Append the next chunk of the stream to the buffer.
+
+        Before we read new data we remove the lines already read from the
+        buffer. This method returns ``False`` at the end of the stream.
+
+        Returns: ``bool``
+
+        """
+        if self.finished:
+            return False
+        if self.start > self.size:
+            # Keep the newline in front of the next line (see ``skip``)
+            del self.buffer[:self.start - 1]
+            self.discarded += self.start - 1
+            self.start = 1
+        chunk = self.read(self.size)
+        if not chunk:
+            self.finished = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def find_newline(self):
+        """Return the offset after the end of the next line in the buffer.
+
+        Returns: ``int``
+
+        """
+        searched = 0
+        while True:
+            end = self.buffer.find(b'\n', self.start + searched)
+            if end >= 0:
+                return end + 1
+            searched = len(self.buffer) - self.start
+            if not self.fill():
+                return len(self.buffer)
+
+    def readline(self):
+        """Read and decode the next line.
+
+        The returned line includes its trailing newline character. At the
+        end of the stream this method returns an empty string.
+
+        Returns: ``str``
+
+        """
+        end = self.buffer.find(b'\n', self.start) + 1
+        if not end:
+            end = self.find_newline()
+        line = self.buffer[self.start:end]
+        self.start = end
+        return self.decoder.decode(line) if line else ''
+
+    def skip(self, prefilter, width=79):
+        r"""Skip lines that can not contain text found by ``prefilter``.
+
+        This method works like ``MappedLog.skip``. Since the text after the
+        last newline in the buffer might be incomplete, we keep this text in
+        the buffer until we either find a match or reach the end of the
+        stream.
+
+        Arguments:
+
+            prefilter
+
+                A compiled bytes regex.
+
+            width
+
+                The maximum line length of the tex program.
+
+        Examples:
+
+            >>> from io import BytesIO
+            >>> from re import compile
+            >>> log = PipedLog(BytesIO(b'One\nTwo\nError: Three\nFour\n'),
+            ...                size=5)
+            >>> log.skip(compile(b'Error'))
+            >>> print(log.readline().rstrip())
+            Error: Three
+            >>> log.skip(compile(b'Error'))
+            >>> log.readline() == ''
+            True
+
+        """
+        if self.discarded == 0 and self.start == 0:
+            # The prefilter finds long lines by the preceding newline
+            # character, so we never skip the first line, if it is long.
+            end = self.buffer.find(b'\n', 0, self.find_newline())
+            if (len(self.buffer) if end < 0 else end) >= width:
+                return
+        while True:
+            start = self.start
+            matching = prefilter.search(self.buffer, start - 1 if start else 0)
+            if matching:
+                break
+            last = self.buffer.rfind(b'\n', start)
+            if last >= 0:
+                self.start = last + 1
+            if not self.fill():
+                self.start = len(self.buffer)
+                return
+        start = self.buffer.rfind(b'\n', start, matching.start() + 1)
+        if start >= 0:
+            self.start = start + 1
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to write output for the HTML window.
+
+TextMate shows the output of our commands while they are still running.
+Writing every single line to the HTML window is slow, if a command produces
+thousands of lines (e.g. for a document containing lots of box warnings). The
+class ``OutputSink`` therefore collects output and writes it in larger
+chunks: when enough text is waiting, when the oldest waiting text is older
+than a short time interval, or when we report an error.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from atexit import register
+from threading import RLock, Timer
+from time import time
+
+import sys
+
+
+# -- Classes ------------------------------------------------------------------
+
+class OutputSink(object):
+    """Buffer text written to a stream and write it in chunks."""
+
+    def __init__(self, stream, size=8192, interval=0.05):
+        """Create a new output sink.
+
+        Arguments:
+
+            stream
+
+                The stream the buffered text will be written to.
+
+            size
+
+                The number of buffered characters that causes the sink to
+                write its content to ``stream``.
+
+            interval
+
+                The maximum number of seconds text stays in the buffer.
+
+        Examples:
+
+            >>> from io import StringIO
+            >>> stream = StringIO()
+            >>> sink = OutputSink(stream, size=10, interval=None)
+            >>> _ = sink.write('Hello')
+            >>> print(stream.getvalue())
+            <BLANKLINE>
+            >>> _ = sink.write(' World')
+            >>> print(stream.getvalue())
+            Hello World
+
+        """
+        self.stream = stream
+        self.size = size
+        self.interval = interval
+        self.parts = []
+        self.length = 0
+        self.lock = RLock()
+        self.timer = None
+        self.last_alert = None
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def write(self, text):
+        """Add ``text`` to the buffer.
+
+        Arguments:
+
+            text
+
+                The text that should be written.
+
+        """
+        with self.lock:
+            self.parts.append(text)
+            self.length += len(text)
+            if self.length >= self.size:
+                self.flush()
+            elif self.timer is None and self.interval is not None:
+                self.timer = Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        return len(text)
+
+    def flush(self):
+        """Write the buffered text to the underlying stream.
+
+        Examples:
+
+            >>> from io import StringIO
+            >>> stream = StringIO()
+            >>> sink = OutputSink(stream)
+            >>> _ = sink.write('Hello')
+            >>> sink.flush()
+            >>> print(stream.getvalue())
+            Hello
+            >>> sink.close()
+
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.parts:
+                self.stream.write(''.join(self.parts))
+                self.parts = []
+                self.length = 0
+            self.stream.flush()
+
+    def close(self):
+        """Write the buffered text and stop the timer of this sink.
+
+        Examples:
+
+            >>> from io import StringIO
+            >>> stream = StringIO()
+            >>> sink = OutputSink(stream)
+            >>> _ = sink.write('Goodbye')
+            >>> sink.close()
+            >>> print(stream.getvalue())
+            Goodbye
+
+        """
+        with self.lock:
+            timer = self.timer
+            self.flush()
+        if timer is not None:
+            timer.join()
+
+    def alert(self):
+        """Show the buffered text right away, since it contains an error.
+
+        To keep a flood of errors from producing lots of small writes, only
+        the first error of each time interval causes an immediate write. The
+        text for the following errors will be written after the time interval
+        has passed.
+
+        Examples:
+
+            >>> from io import StringIO
+            >>> stream = StringIO()
+            >>> sink = OutputSink(stream)
+            >>> _ = sink.write('Error')
+            >>> sink.alert()
+            >>> print(stream.getvalue())
+            Error
+            >>> _ = sink.write(' Another Error')
+            >>> sink.alert()
+            >>> print(stream.getvalue())
+            Error
+            >>> sink.close()
+            >>> print(stream.getvalue())
+            Error Another Error
+
+        """
+        with self.lock:
+            now = time()
+            if (self.interval is None or self.last_alert is None or
+                    now - self.last_alert >= self.interval):
+                self.last_alert = now
+                self.flush()
+
+
+# -- Functions ----------------------------------------------------------------
+
+def install(size=8192, interval=0.05):
+    """Replace ``sys.stdout`` with an ``OutputSink`` writing to it.
+
+    The sink will be closed when the interpreter exits. If
+    ``sys.stdout`` is already an ``OutputSink`` then this function does
+    nothing.
+
+    Arguments:
+
+        size
+
+            The number of buffered characters that causes the sink to write
+            its content to ``stdout``.
+
+        interval
+
+            The maximum number of seconds text stays in the buffer.
+
+    Returns: ``OutputSink``
+
+    """
+    if not isinstance(sys.stdout, OutputSink):
+        sys.stdout = OutputSink(sys.stdout, size, interval)
+        register(sys.stdout.close)
+    return sys.stdout
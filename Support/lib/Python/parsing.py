@@ -4,7 +4,13 @@
 # Author: Brad Miller
 # -----------------------------------------------------------------------------
 
-"""This module contains code to parse tex (log) files."""
+"""This module contains code to parse tex (log) files.
+
+The parsers in this module turn the output of tex programs into a stream of
+events (see ``events``). The method ``parse_stream`` renders these events as
+HTML.
+
+"""
 
 # -- Imports ------------------------------------------------------------------
 
@@ -15,62 +21,619 @@ from __future__ import unicode_literals
 from os import sys, path
 sys.path.insert(1, path.dirname(path.abspath(__file__)))
 
-from re import compile, match, search, UNICODE
+from collections import OrderedDict
+from copy import copy
+from re import compile, escape, match, search, IGNORECASE, UNICODE
 from os import getcwd
 from os.path import basename, join, splitext
-from sys import stdout, version_info
+
 try:
-    from urllib.parse import quote  # Python 3
+    from re import _parser as sre_parse  # Python 3.11+
 except ImportError:
-    from urllib import quote  # Python 2
+    import sre_parse
 
-from tex import encodings
+from events import (Diagnostic, ErrorContext, FileOpened, GlossaryType,
+                    GlossaryWritten, HTMLRenderer, Include, Message, Progress,
+                    Repeated, RunStart, RunSummary, Sorting, Transcript,
+                    Version, Written, XindyRun)
+from events import make_link  # noqa
+from logreader import text_stream
 
 # -- Module Import ------------------------------------------------------------
 
-PYTHON2 = version_info <= (3, 0)
+try:
+    unichr  # Python 2
+except NameError:
+    unichr = chr  # Python 3
 
 
 # -- Functions ----------------------------------------------------------------
 
-def make_link(file, line=1):
-    """Create a TextMate link for ``file`` pointing to ``line``.
+def find_trigger(pattern):
+    r"""Determine a literal string required by every match of ``pattern``.
+
+    This function returns a tuple containing the following values:
+
+        - A literal string that has to be part of every line matched by
+          ``pattern``. If we can not determine such a string, then this value
+          will be empty.
+
+        - A boolean value specifying if every line matched by ``pattern``
+          starts with the literal string (``True``) or if the literal string
+          might occur anywhere inside the line (``False``).
+
+    Arguments:
+
+        pattern
+
+            A compiled regular expression. We assume that this expression will
+            be used via ``pattern.match``.
+
+    Returns: ``(str, bool)``
+
+    Examples:
+
+        >>> def show(regex):
+        ...     print('"{}" {}'.format(*find_trigger(compile(regex))))
+        >>> show('^Document Class')
+        "Document Class" True
+        >>> show(r'(\w+ written in) (.*)\.$')
+        " written in " False
+        >>> show('.*pdfTeX warning.*')
+        "pdfTeX warning" False
+        >>> show('(Transcript written in) (.*)')
+        "Transcript written in " True
+        >>> show('(---)|(There were .*)')
+        "" False
+
+    """
+    if pattern.flags & IGNORECASE:
+        return '', False
+    try:
+        tokens = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return '', False
+    if tokens and tokens[0] == (sre_parse.AT, sre_parse.AT_BEGINNING):
+        tokens = tokens[1:]
+
+    # Collect runs of consecutive literal characters. Groups do not interrupt
+    # a run, since their content has to match right after the preceding text.
+    runs = [[]]
+
+    def collect(tokens):
+        for operation, argument in tokens:
+            if operation == sre_parse.LITERAL:
+                runs[-1].append(unichr(argument))
+            elif (operation == sre_parse.SUBPATTERN and
+                  not (len(argument) > 2 and argument[1] & IGNORECASE)):
+                collect(argument[-1])
+            else:
+                runs.append([])
+
+    collect(tokens)
+    prefix = ''.join(runs[0])
+    if prefix:
+        return prefix, True
+    return max((''.join(run) for run in runs), key=len), False
+
+
+def find_literals(pattern):
+    r"""Determine literal strings, one of which is part of every match.
+
+    In contrast to ``find_trigger`` this function also takes alternatives
+    consisting only of literal text into account. The pattern ``\.(sty|tex):``
+    for example requires one of the strings ``.sty:`` or ``.tex:``.
+    If we can not determine useful strings for ``pattern``, then the returned
+    set contains the empty string.
+
+    Arguments:
+
+        pattern
+
+            A compiled regular expression.
+
+    Returns: ``{str}``
+
+    Examples:
+
+        >>> def show(regex):
+        ...     print(' '.join('"{}"'.format(literal) for literal in
+        ...                    sorted(find_literals(compile(regex)))))
+        >>> show(r'^([\w ]+(?:\.sty|\.tex|\.ltx)):(\d+):\s+(.*)')
+        ".ltx:" ".sty:" ".tex:"
+        >>> show('.*pdfTeX warning.*')
+        "pdfTeX warning"
+        >>> show('(---)|(There were .*)')
+        ""
+
+    """
+    if pattern.flags & IGNORECASE:
+        return {''}
+    try:
+        tokens = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return {''}
+
+    # Every run stores the possible values of consecutive literal text
+    runs = [{''}]
+
+    def alternatives(branch):
+        options = set()
+        for tokens in branch[1]:
+            if any(operation != sre_parse.LITERAL
+                   for operation, _ in tokens):
+                return None
+            options.add(''.join(unichr(argument) for _, argument in tokens))
+        return options
+
+    def collect(tokens):
+        for operation, argument in tokens:
+            if (operation == sre_parse.SUBPATTERN and
+                    not (len(argument) > 2 and argument[1] & IGNORECASE)):
+                collect(argument[-1])
+                continue
+            options = (
+                {unichr(argument)} if operation == sre_parse.LITERAL else
+                alternatives(argument) if operation == sre_parse.BRANCH else
+                None)
+            if options is None:
+                runs.append({''})
+            elif len(runs[-1]) * len(options) > 16:
+                runs.append(options)
+            else:
+                runs[-1] = {run + option for run in runs[-1]
+                            for option in options}
+
+    collect(tokens)
+    return max(runs, key=lambda run: min(len(literal) for literal in run))
+
+
+def make_prefilter(patterns, width=79):
+    r"""Create a bytes regex finding lines that might match ``patterns``.
+
+    The returned expression finds every line containing one of the literals
+    determined by ``find_literals``. Since TeX wraps lines, which are longer
+    than ``width`` characters, the expression also finds the newline
+    character in front of every line containing at least ``width`` bytes. If
+    we can not determine useful literals for one of the patterns, then this
+    function returns ``None``.
 
     Arguments:
 
-        file
+        patterns
 
-            The path to the file that should be opened if we click the link
-            generated by this function.
+            A list of tuples of the form ``(pattern, function)``, where
+            ``pattern`` is a compiled regular expression.
 
-        line
+        width
 
-            The line which should be displayed when TextMate opens ``file``.
+            The maximum line length of the tex program (``max_print_line``).
 
-    Returns: ``str``
+    Returns: ``compiled bytes regex`` or ``None``
 
     Examples:
 
-        >>> print(make_link('Tests/TeX/makeindex.tex', 1))
-        txmt://open/?url=file://Tests/TeX/makeindex.tex&line=1
-        >>> print(make_link('Wide Open Spaces.txt', 20))
-        txmt://open/?url=file://Wide%20Open%20Spaces.txt&line=20
+        >>> prefilter = make_prefilter([(compile('Warning--'), None),
+        ...                             (compile('.*Output to (.*)'), None)])
+        >>> prefilter.search(b'No match\nOutput to file.bbl').start()
+        9
+        >>> prefilter.search(b'\n'.join([b'Some Text'] * 9 +
+        ...                              [b'x' * 79])).start()
+        89
+        >>> make_prefilter([(compile('(---)|(There were .*)'), None)])
 
     """
-    return "txmt://open/?url=file://{}&line={}".format(
-           quote(file.encode('utf-8')), line)
+    literals = set()
+    for pattern, _ in patterns:
+        options = find_literals(pattern)
+        if '' in options:
+            return None
+        literals |= options
+    return compile(b'|'.join([escape(literal.encode('utf-8'))
+                              for literal in sorted(literals)] +
+                             ['\n[^\n]{{{}}}'.format(width).encode('ascii')]))
+
+
+def lru_cache(size):
+    """Return a decorator caching the ``size`` most recent results.
+
+    All arguments of the decorated function have to be hashable. We use this
+    function instead of ``functools.lru_cache``, which is not available in
+    Python 2.
+
+    Arguments:
+
+        size
+
+            The maximum number of cached results.
+
+    Returns: ``function``
+
+    Examples:
+
+        >>> @lru_cache(2)
+        ... def square(number):
+        ...     print('Compute {}²'.format(number))
+        ...     return number * number
+        >>> square(2)
+        Compute 2²
+        4
+        >>> square(2)
+        4
+        >>> square(3), square(4)
+        Compute 3²
+        Compute 4²
+        (9, 16)
+        >>> square(2)
+        Compute 2²
+        4
+
+    """
+    def decorator(function):
+        cache = OrderedDict()
+
+        def cached(*arguments):
+            try:
+                result = cache.pop(arguments)
+            except KeyError:
+                result = function(*arguments)
+                if len(cache) >= size:
+                    cache.popitem(last=False)
+            cache[arguments] = result
+            return result
+
+        cached.__doc__ = function.__doc__
+        return cached
+    return decorator
 
 
 # -- Classes ------------------------------------------------------------------
 
+class PatternDispatcher(object):
+    """Find the first pattern matching a line of tex output.
+
+    Checking every pattern of a parser against every line is expensive, since
+    most lines of a log file do not match any pattern at all. This class
+    therefore determines a literal “trigger” for each pattern. A pattern will
+    only be tried if its trigger is part of the line. Patterns that always
+    start with their trigger are indexed by the first character of the
+    trigger. The patterns are still tried in their original order, so the
+    first matching pattern wins.
+
+    """
+
+    def __init__(self, patterns):
+        """Create a new dispatcher for a list of patterns.
+
+        Arguments:
+
+            patterns
+
+                A list of tuples of the form ``(pattern, function)``, where
+                ``pattern`` is a compiled regular expression.
+
+        Examples:
+
+            >>> dispatcher = PatternDispatcher([
+            ...     (compile('Warning--'), 'warning'),
+            ...     (compile('.*Output to (.*)$'), 'finish_run')])
+            >>> print(', '.join(dispatcher.table))
+            W
+
+        """
+        entries = [find_trigger(pattern) + (pattern, function)
+                   for pattern, function in patterns]
+        self.default = tuple(entry for entry in entries if not entry[1])
+        self.table = {}
+        for trigger, anchored, _, _ in entries:
+            if anchored:
+                character = trigger[0]
+                self.table[character] = tuple(
+                    entry for entry in entries
+                    if not entry[1] or entry[0][0] == character)
+
+    def dispatch(self, line):
+        """Return the match and function of the first pattern matching line.
+
+        If no pattern matches, then this method returns ``(None, None)``.
+
+        Arguments:
+
+            line
+
+                The line of tex output that should be checked.
+
+        Returns: ``(match, function)``
+
+        Examples:
+
+            >>> dispatcher = PatternDispatcher([
+            ...     (compile('Warning--(.*)'), 'warning'),
+            ...     (compile('.*Output to (.*)$'), 'finish_run')])
+            >>> matching, function = dispatcher.dispatch('Output to file.bbl')
+            >>> print(function)
+            finish_run
+            >>> print(matching.group(1))
+            file.bbl
+            >>> dispatcher.dispatch('(./file.tex')
+            (None, None)
+
+        """
+        for trigger, anchored, pattern, function in self.table.get(
+                line[:1], self.default):
+            if anchored:
+                if not line.startswith(trigger):
+                    continue
+            elif trigger not in line:
+                continue
+            matching = pattern.match(line)
+            if matching:
+                return matching, function
+        return None, None
+
+
+# The patterns of a parser only depend on its class (and for latex on the
+# name of the document), so all parsers using the same patterns share their
+# dispatcher and prefilter.
+cached_dispatcher = lru_cache(32)(PatternDispatcher)
+cached_prefilter = lru_cache(32)(make_prefilter)
+
+
+class FileStack(object):
+    """Track the files TeX currently reads.
+
+    TeX prints an opening parenthesis followed by the path of a file when it
+    starts to read the file and a closing parenthesis when it is done with
+    it. The paths are relative (``./chapter.tex``), absolute or resolved by
+    kpathsea (``/usr/local/texlive/…/article.cls``). Quoted paths contain
+    spaces. Since parentheses that do not belong to a file (e.g. in
+    ``(hyperref)`` or in box warnings) are balanced too, we push a
+    placeholder for them. This way every closing parenthesis removes the
+    entry of the matching opening parenthesis.
+
+    Lines showing the content of boxes or the context of an error contain
+    text of the document. This text might contain unbalanced parentheses, so
+    we ignore these lines.
+
+    """
+
+    TOKENS = compile(r'\((?:"([^"\n]+)"|(\.{0,2}/[^\s()"]*\.[A-Za-z]\w*|' +
+                     r'\.{0,2}/[^()\n]*?\.[A-Za-z]\w*|' +
+                     r'[A-Za-z_][^\s()"/]*\.[A-Za-z]\w*)(?=[\s()"]|$))?|(\))')
+    MARKERS = compile(r'\(|\)')
+    IGNORE = compile(r'\[\]|\\|<|l\.\d|Overfull \\|Underfull \\')
+    IGNORE_START = frozenset('[\\<lOU')
+
+    def __init__(self, filename):
+        r"""Create a new stack containing only the file ``filename``.
+
+        Arguments:
+
+            filename
+
+                The name of the file TeX processes. This file is always
+                the bottom of the stack.
+
+        Examples:
+
+            >>> files = FileStack('main.tex')
+            >>> files.scan('(./main.tex (/usr/share/texmf/tex/latex/book.cls')
+            >>> print(files.current)
+            /usr/share/texmf/tex/latex/book.cls
+            >>> files.scan('Document Class: book (size10.clo)) (Font)')
+            >>> print(files.current)
+            main.tex
+            >>> files.scan('("./chapter one.tex" [1]')
+            >>> print(files.current)
+            chapter one.tex
+            >>> files.scan(r'[]\OT1/cmr/m/n/10 text)')
+            >>> print(files.current)
+            chapter one.tex
+            >>> files.scan(')) ) [2]')
+            >>> print(files.current)
+            main.tex
+
+        """
+        self.stack = [filename]
+
+    @property
+    def current(self):
+        """Return the file TeX currently reads.
+
+        Returns: ``str``
+
+        """
+        for filename in reversed(self.stack):
+            if filename is not None:
+                return filename
+
+    def scan(self, line):
+        """Update the stack using the parentheses in ``line``.
+
+        Arguments:
+
+            line
+
+                A (rewrapped) line of tex output.
+
+        """
+        if '(' in line:
+            if line[0] in self.IGNORE_START and self.IGNORE.match(line):
+                return
+            stack = self.stack
+            for quoted, filename, closing in self.TOKENS.findall(line):
+                if closing:
+                    if len(stack) > 1:
+                        stack.pop()
+                    continue
+                filename = quoted or filename or None
+                if filename and filename.startswith('./'):
+                    filename = filename[2:]
+                stack.append(filename)
+        elif ')' in line and not (line[0] in self.IGNORE_START and
+                                  self.IGNORE.match(line)):
+            # Without opening parentheses we only need to close files
+            stack = self.stack
+            del stack[max(len(stack) - line.count(')'), 1):]
+
+
+class WarningAggregator(object):
+    """Report repeated box and font warnings only once.
+
+    Documents containing tables or long URLs cause thousands of nearly
+    identical box warnings. We group these warnings and font warnings by
+    their signature (the text of the warning with every number replaced by
+    ``#``), their severity and the file TeX read when it reported them. Only
+    the first warning of each group is reported directly. For the other
+    warnings we only remember how often they occurred and which lines they
+    mention. The memory used therefore grows with the number of distinct
+    problems, not with the size of the log. For each group we store at most
+    ``max_ranges`` line ranges. If a group mentions more ranges, then the
+    last range covers all remaining lines.
+
+    """
+
+    NUMBERS = compile(r'\d+(?:\.\d+)?')
+    LINES = compile(r'lines? (\d+)(?:--(\d+))?')
+    max_ranges = 10
+
+    def __init__(self):
+        r"""Create a new aggregator without any warnings.
+
+        Examples:
+
+            >>> aggregator = WarningAggregator()
+            >>> aggregator.add(Message('format', 'Overfull \hbox (1.5pt ' +
+            ...                        'too wide) in paragraph at lines ' +
+            ...                        '4--7'), 'main.tex')
+            True
+            >>> aggregator.add(Message('format', 'Overfull \hbox (3pt ' +
+            ...                        'too wide) in paragraph at lines ' +
+            ...                        '8--9'), 'main.tex')
+            False
+            >>> aggregator.add(Message('warning', 'LaTeX Warning: Label(s) ' +
+            ...                        'may have changed.'), 'main.tex')
+            True
+            >>> for event in aggregator.repeated():
+            ...     print(event.describe())
+            2 times in main.tex (lines 4–9)
+            >>> list(aggregator.repeated())
+            []
+
+        """
+        self.groups = OrderedDict()
+
+    @staticmethod
+    def aggregates(event):
+        """Check if we group ``event`` with similar events.
+
+        Returns: ``bool``
+
+        """
+        return (event.kind in {'message', 'diagnostic'} and
+                (event.severity == 'format' or
+                 event.text.startswith('LaTeX Font Warning')))
+
+    def add(self, event, location):
+        """Add ``event`` to its group.
+
+        This method returns ``True`` if the event should be reported, i.e. if
+        it is the first event of its group or if we do not group events of
+        its kind.
+
+        Arguments:
+
+            event
+
+                An event produced by a parser.
+
+            location
+
+                The file TeX read when it produced ``event``.
+
+        Returns: ``bool``
+
+        """
+        if not self.aggregates(event):
+            return True
+        if event.kind == 'diagnostic':
+            location = event.name
+            lines = (event.line, event.line)
+        else:
+            matching = self.LINES.search(event.text)
+            lines = ((int(matching.group(1)),
+                      int(matching.group(2) or matching.group(1)))
+                     if matching else None)
+        key = (event.severity, self.NUMBERS.sub('#', event.text), location)
+        group = self.groups.get(key)
+        if group is None:
+            self.groups[key] = [event, location, 1, [lines] if lines else []]
+            return True
+        group[2] += 1
+        if lines:
+            ranges = group[3]
+            if ranges and ranges[-1][0] <= lines[0] <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], lines[1]))
+            elif len(ranges) < self.max_ranges:
+                ranges.append(lines)
+            else:
+                # The last range covers all remaining lines
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], lines[1]))
+        return False
+
+    def repeated(self):
+        """Return events describing all warnings that occurred repeatedly.
+
+        Afterwards the aggregator forgets all warnings.
+
+        Returns: ``[Repeated]``
+
+        """
+        events = [Repeated(event.severity, event.text, location, count,
+                           ranges, tool=event.tool)
+                  for event, location, count, ranges in self.groups.values()
+                  if count > 1]
+        self.groups.clear()
+        return events
+
+
 class TexParser(object):
     """Parse TeX typesetting streams.
 
-    This class reads output from a tex program and tries to convert this
-    information into HTML.
+    This class reads output from a tex program and converts this information
+    into a stream of events. Subclasses store the name of the program they
+    parse in ``tool``. The attribute ``state_attributes`` lists the
+    attributes describing the current parsing state (see ``get_state``).
+
+    TeX wraps lines longer than ``max_print_line`` characters. The default
+    value of this attribute is the default value of TeX. Scripts should set
+    it to the value used by the current tex distribution (see
+    ``tex.get_max_print_line``).
+
+    Parsers that set ``aggregate`` report repeated box and font warnings only
+    once, unless they are verbose (see ``WarningAggregator``).
+
+    ``parse_stream`` writes the events using ``renderer``. If this attribute
+    is ``None``, then it writes HTML (see ``events.HTMLRenderer``). Scripts
+    can set it to a renderer for another output format. All parsers then
+    share this renderer.
+
+    Subclasses store their regex patterns in ``patterns`` (see ``events``).
+    The patterns are compiled once per class and shared by all instances, so
+    creating a parser, e.g. for every run inside a latexmk transcript, is
+    cheap.
 
     """
 
+    tool = None
+    patterns = ()
+    files = None
+    aggregate = False
+    max_print_line = 79
+    renderer = None
+    state_attributes = ('done', 'number_errors', 'number_warnings',
+                        'fatal_error')
+
     def __init__(self, input_stream, verbose):
         """Initialize a new TexParser.
 
@@ -79,6 +642,8 @@ class TexParser(object):
             input_stream
 
                 A stream like object containing data produced by a tex program.
+                If the stream returns bytes, then the parser decodes its
+                lines (see ``logreader.text_stream``).
 
             verbose
 
@@ -93,22 +658,30 @@ class TexParser(object):
             ...     parser = TexParser(log, True)
 
         """
-        self.input_stream = input_stream
-        self.patterns = []
+        self.input_stream = text_stream(input_stream)
         self.done = False
         self.verbose = verbose
         self.number_errors = 0
         self.number_warnings = 0
         self.fatal_error = False
+        self.pending = []
+        self.subparser = None
+        self.aggregator = (WarningAggregator() if self.aggregate and
+                           not verbose else None)
 
     def get_rewrapped_line(self):
-        """Try to get exactly one line of coherent tex output.
+        r"""Try to get exactly one line of coherent tex output.
 
         Sometimes TeX breaks up lines with hard line breaks. This is
         annoying. Even more annoying is that it sometime does not break line,
         for two distinct warnings. This function attempts to return a single
         statement.
 
+        TeX breaks a line after ``max_print_line`` characters. Depending on
+        the engine a character is a byte (pdfTeX) or a unicode character
+        (XeTeX, LuaTeX), so we check both lengths for lines containing
+        multibyte characters.
+
         Returns: ``str``
 
         Examples:
@@ -124,34 +697,121 @@ class TexParser(object):
             \EU1/AvenirNext(0)/m/n/... on all fair paths ...
             ...
 
-        """
-        def to_utf8(string):
-            if PYTHON2:
-                for encoding in encodings:
-                    try:
-                        return string.decode(encoding)
-                    except UnicodeDecodeError:
-                        continue
-            else:
-                return string
+            >>> from io import StringIO
+            >>> parser = TexParser(StringIO('Wrapped \nline\nüber ab\ncd\n'),
+            ...                    True)
+            >>> parser.max_print_line = 8
+            >>> print(parser.get_rewrapped_line().rstrip())
+            Wrapped line
+            >>> print(parser.get_rewrapped_line().rstrip())
+            über abcd
 
-        statement = ""
+        """
+        width = self.max_print_line
+        parts = []
         while True:
-            line = to_utf8(self.input_stream.readline())
+            line = self.input_stream.readline()
             if not line:
-                return statement
-            statement += line.rstrip('\n')
-            if not (len(line) == 80 and not line[78] in {'!', '.', ')'}):
+                return ''.join(parts)
+            line = line.rstrip('\n')
+            parts.append(line)
+            length = len(line)
+            if length < width <= 4 * length:
+                length = len(line.encode('utf-8'))
+            if length != width or line[-1] in {'!', '.', ')'}:
                 break
-        return statement + '\n'
+        parts.append('\n')
+        return ''.join(parts)
 
-    def parse_stream(self):
+    def events(self):
         """Process the input stream one line at a time.
 
-        We match against each pattern in the patterns dictionary. If a pattern
-        matches we call the corresponding method in the dictionary. The
-        dictionary is organized with patterns as the keys and methods as the
-        values.
+        We match against each pattern in ``patterns``. If a pattern matches
+        we call the corresponding method. The patterns are stored as tuples
+        of the form ``(pattern, method name)``. The first pattern that
+        matches wins. To find this pattern quickly we use a
+        ``PatternDispatcher``, which is shared by all parsers using the same
+        patterns.
+
+        The methods called for matching patterns report their findings via
+        ``emit``. This generator yields the reported events as soon as the
+        method for a line returns. If a method sets ``subparser`` to another
+        parser, then we yield the events of this parser next and add its
+        errors and warnings to the ones of this parser afterwards.
+
+        If this parser is not verbose and the input stream provides a method
+        ``skip`` (see ``logreader.MappedLog``), then we use a prefilter (see
+        ``make_prefilter``) to jump over lines that can not match any pattern.
+
+        Returns: ``generator``
+
+        Examples:
+
+            >>> with open('Tests/Log/bibtex.log') as log:
+            ...     parser = BibTexParser(log, False)
+            ...     events = list(parser.events())
+            >>> print(events[0].text) # doctest:+ELLIPSIS
+            This is BibTeX, Version 0.99d (TeX Live 2014)
+            >>> print(events[0].tool)
+            bibtex
+
+        """
+        dispatcher = cached_dispatcher(self.patterns)
+        skip = getattr(self.input_stream, 'skip', None)
+        prefilter = (self.get_prefilter()
+                     if skip and not self.verbose else None)
+
+        scan = self.files.scan if self.files else None
+
+        def next_line():
+            if prefilter and not self.done:
+                skip(prefilter, self.max_print_line)
+            line = self.get_rewrapped_line()
+            if scan:
+                scan(line)
+            return line
+
+        line = next_line()
+        while line and not self.done:
+            line = line.rstrip("\n")
+
+            matching, method = dispatcher.dispatch(line)
+            if matching:
+                getattr(self, method)(matching, line)
+            elif self.verbose:
+                self.emit(Message('verbose', line))
+            if self.pending:
+                for event in self.take_events():
+                    yield event
+
+            if self.subparser:
+                parser, self.subparser = self.subparser, None
+                for event in parser.events():
+                    yield event
+                self.merge(parser)
+
+            line = next_line()
+        if not self.done:
+            self.bad_run()
+        self.report_repeated()
+        for event in self.take_events():
+            yield event
+
+    def get_prefilter(self):
+        """Return a prefilter finding all lines this parser is interested in.
+
+        Subclasses that need to see lines not matched by any of their
+        patterns override this method (see ``make_prefilter``).
+
+        Returns: ``compiled bytes regex`` or ``None``
+
+        """
+        return cached_prefilter(self.patterns, self.max_print_line)
+
+    def parse_stream(self):
+        """Process the input stream and print the result.
+
+        By default this method prints HTML (see ``renderer``).
 
         This method returns a tuple containing the following values:
 
@@ -176,27 +836,150 @@ class TexParser(object):
             (False, 0, 0)
 
         """
-        line = self.get_rewrapped_line()
-        while line and not self.done:
-            line = line.rstrip("\n")
-            found_match = False
-
-            # Process matching patterns until we find one
-            for patttern, function in self.patterns:
-                matching = patttern.match(line)
-                if matching:
-                    function(matching, line)
-                    stdout.flush()
-                    found_match = True
-                    break
-            if self.verbose and not found_match:
-                print('<p>{}</p>'.format(line))
-
-            line = self.get_rewrapped_line()
-        if not self.done:
-            self.bad_run()
+        self.render(self.events())
         return self.fatal_error, self.number_errors, self.number_warnings
 
+    def render(self, events):
+        """Write ``events`` using ``renderer``.
+
+        ``parse_stream`` renders the events of the parser as soon as the
+        parser reports them. Scripts that run tools concurrently can instead
+        collect the events of ``events`` and render them later using this
+        method.
+
+        Arguments:
+
+            events
+
+                An iterable containing the events that should be written.
+
+        Examples:
+
+            >>> with open('Tests/Log/bibtex.log') as log:
+            ...     parser = BibTexParser(log, False)
+            ...     events = list(parser.events())
+            >>> parser.render(events[-1:])
+            <p class="error">I couldn't open style file natbib.bst</p>
+
+        """
+        renderer = self.renderer if self.renderer else HTMLRenderer()
+        renderer.render_stream(events)
+        sys.stdout.flush()
+
+    def get_state(self):
+        """Return the current parsing state of this parser.
+
+        The state is a dictionary containing only plain data (numbers,
+        strings and sets), which can be stored using ``pickle``. Together with
+        ``set_state`` we can therefore continue parsing output appended to a
+        log file, without processing the old content of the file again.
+
+        Returns: ``{str: object}``
+
+        Examples:
+
+            >>> filepath = 'Tests/Log/latexmk_external_bibliography.log'
+            >>> with open(filepath) as log:
+            ...     parser = LaTexMkParser(log, False, filepath)
+            ...     events = list(parser.events())
+            >>> state = parser.get_state()
+            >>> print(state['parser'])
+            LaTexMkParser
+            >>> state['number_runs'], state['done']
+            (3, True)
+
+        """
+        state = {attribute: copy(getattr(self, attribute))
+                 for attribute in self.state_attributes}
+        state['parser'] = type(self).__name__
+        return state
+
+    def set_state(self, state):
+        """Restore the parsing state ``state`` returned by ``get_state``.
+
+        Arguments:
+
+            state
+
+                A parsing state created by a parser of the same class.
+
+        Examples:
+
+            >>> filepath = 'Tests/Log/latexmk.log'
+            >>> with open(filepath) as log:
+            ...     parser = LaTexMkParser(log, False, filepath)
+            ...     events = list(parser.events())
+            >>> resumed = LaTexMkParser(None, False, filepath)
+            >>> resumed.set_state(parser.get_state())
+            >>> resumed.marks == parser.marks
+            True
+            >>> LaTexParser(None, False, filepath).set_state(
+            ...     parser.get_state())
+            Traceback (most recent call last):
+            ...
+            ValueError: Can not use state of LaTexMkParser for LaTexParser
+
+        """
+        parser = type(self).__name__
+        if state.get('parser') != parser:
+            raise ValueError('Can not use state of {} for {}'.format(
+                             state.get('parser'), parser))
+        for attribute in self.state_attributes:
+            setattr(self, attribute, copy(state[attribute]))
+
+    def emit(self, event):
+        """Report ``event`` to the consumer of this parser.
+
+        Arguments:
+
+            event
+
+                An event (see ``events``) describing a part of the parsed
+                output.
+
+        This method returns ``False``, if the event only repeats an earlier
+        warning (see ``WarningAggregator``) and was therefore not reported.
+
+        Returns: ``bool``
+
+        """
+        if event.tool is None:
+            event.tool = self.tool
+        if self.aggregator and not self.aggregator.add(
+                event, self.files.current if self.files else None):
+            return False
+        self.pending.append(event)
+        return True
+
+    def report_repeated(self):
+        """Report the warnings that occurred repeatedly since the last call."""
+        if self.aggregator:
+            for event in self.aggregator.repeated():
+                self.pending.append(event)
+
+    def take_events(self):
+        """Return and forget the events reported since the last call.
+
+        Returns: ``[Event]``
+
+        """
+        events, self.pending = self.pending, []
+        return events
+
+    def merge(self, parser):
+        """Add the errors and warnings found by the subparser ``parser``.
+
+        Arguments:
+
+            parser
+
+                A parser that processed a part of the input stream of this
+                parser.
+
+        """
+        self.number_errors += parser.number_errors
+        self.number_warnings += parser.number_warnings
+
     def info(self, matching, line):
         """Print a message containing ``line``.
 
@@ -217,24 +1000,22 @@ class TexParser(object):
                 A string containing the regex pattern which lead to the call
                 of this function
 
-        Returns: ``str``
-
         """
-        print('<p class="info">{}</p>'.format(line))
+        self.emit(Message('info', line))
 
     def error(self, matching, line):
-        print('<p class="error">{}</p>'.format(line))
+        self.emit(Message('error', line))
         self.number_errors += 1
 
     def warning(self, matching, line):
-        print('<p class="warning">{}</p>'.format(line))
+        self.emit(Message('warning', line))
         self.number_warnings += 1
 
     def warning_format(self, matching, line):
-        print('<p class="fmtWarning">{}</p>'.format(line))
+        self.emit(Message('format', line))
 
     def fatal(self, matching, line):
-        print('<p class="error">{}</p>'.format(line))
+        self.emit(Message('fatal', line))
         self.fatal_error = True
 
     def bad_run(self):
@@ -244,21 +1025,19 @@ class TexParser(object):
 class BibTexParser(TexParser):
     """Parse and format messages from bibtex"""
 
-    def __init__(self, input_stream, verbose):
-        """Initialize the regex patterns for the BibTexParser"""
-        super(BibTexParser, self).__init__(input_stream, verbose)
-        self.patterns.extend([
-            (compile("Warning--"), self.warning),
-            (compile(r'I found no \\\w+ command'), self.error),
-            (compile("I couldn't open style file"), self.error),
-            (compile(r"You're missing a field name---line (\d+)"), self.error),
-            (compile(r'Too many commas in name \d+ of'), self.error),
-            (compile('I was expecting a'), self.error),
-            (compile('This is BibTeX'), self.info),
-            (compile('The style'), self.info),
-            (compile('Database'), self.info),
-            (compile(r'(---)|(\(There were .*\))'), self.finish_run)
-        ])
+    tool = 'bibtex'
+    patterns = (
+        (compile("Warning--"), 'warning'),
+        (compile(r'I found no \\\w+ command'), 'error'),
+        (compile("I couldn't open style file"), 'error'),
+        (compile(r"You're missing a field name---line (\d+)"), 'error'),
+        (compile(r'Too many commas in name \d+ of'), 'error'),
+        (compile('I was expecting a'), 'error'),
+        (compile('This is BibTeX'), 'info'),
+        (compile('The style'), 'info'),
+        (compile('Database'), 'info'),
+        (compile(r'(---)|(\(There were .*\))'), 'finish_run'),
+    )
 
     def parse_stream(self):
         r"""Parse log messages from bibtex.
@@ -297,16 +1076,14 @@ class BibTexParser(TexParser):
 class BiberParser(TexParser):
     """Parse and format messages from biber"""
 
-    def __init__(self, input_stream, verbose):
-        """Initialize the regex patterns for the BiberParser"""
-        super(BiberParser, self).__init__(input_stream, verbose)
-        self.patterns.extend([
-            (compile('INFO - This is Biber'), self.info),
-            (compile('WARN'), self.warning),
-            (compile('ERROR'), self.error),
-            (compile('FATAL'), self.fatal),
-            (compile('^.*Output to (.*)$'), self.finish_run),
-        ])
+    tool = 'biber'
+    patterns = (
+        (compile('INFO - This is Biber'), 'info'),
+        (compile('WARN'), 'warning'),
+        (compile('ERROR'), 'error'),
+        (compile('FATAL'), 'fatal'),
+        (compile('^.*Output to (.*)$'), 'finish_run'),
+    )
 
     def parse_stream(self):
         """Parse log messages from biber.
@@ -332,28 +1109,25 @@ class BiberParser(TexParser):
 
     def finish_run(self, matching, line):
         log = matching.group(1)
-        print('<p>Complete transcript is in <a href="{}">{}</a></p>'.format(
-              make_link(join(getcwd(), log)), log))
+        self.emit(Transcript(join(getcwd(), log), log))
         self.done = True
 
 
 class MakeIndexParser(TexParser):
     """Parse and format messages from makeindex."""
 
-    def __init__(self, input_stream, verbose):
-        """Initialize the regex patterns for the MakeIndexParser"""
-        super(MakeIndexParser, self).__init__(input_stream, verbose)
-        self.patterns.extend([
-            (compile(r'This is makeindex, version (\d+\.\d+)'),
-             self.run_makeindex),
-            (compile(r'(\w+ \w+ file) (?:\./)?' +
-                     r'(.*\.(?:(?:idx)|(?:ind))).*\((.*)\)'),
-             self.work_with_file),
-            (compile(r'Sorting entries.*\((.*)\)'), self.sorting),
-            (compile(r'(Transcript written in) (.*)\.$'),
-             self.transcript_written),
-            (compile(r'(\w+ written in) (.*)\.$'), self.written)
-        ])
+    tool = 'makeindex'
+    patterns = (
+        (compile(r'This is makeindex, version (\d+\.\d+)'),
+         'run_makeindex'),
+        (compile(r'(\w+ \w+ file) (?:\./)?' +
+                 r'(.*\.(?:(?:idx)|(?:ind))).*\((.*)\)'),
+         'work_with_file'),
+        (compile(r'Sorting entries.*\((.*)\)'), 'sorting'),
+        (compile(r'(Transcript written in) (.*)\.$'),
+         'transcript_written'),
+        (compile(r'(\w+ written in) (.*)\.$'), 'written'),
+    )
 
     def parse_stream(self):
         """Parse log messages from makeindex.
@@ -383,27 +1157,22 @@ class MakeIndexParser(TexParser):
 
     def run_makeindex(self, matching, line):
         version = matching.group(1)
-        print('<p class="info">Run <strong>Makeindex</strong>, ' +
-              'version {}<p>'.format(version))
+        self.emit(Version('makeindex', version))
 
     def sorting(self, matching, line):
         status = matching.group(1)
-        print('<p class="info">Sorting entries: <strong>' +
-              '{}</strong><p>'.format(status))
+        self.emit(Sorting(status))
 
     def work_with_file(self, matching, line):
         description = matching.group(1)
         filename = matching.group(2)
         status = matching.group(3)
-        print('<p class="info">{} {}: <strong>{}</strong>'.format(description,
-              filename, status))
+        self.emit(Progress(description, filename, status))
 
     def written(self, matching, line):
         description = matching.group(1)
         filename = matching.group(2)
-        filepath = make_link(join(getcwd(), filename))
-        print('<p class="info">{} <a href="{}">{}</a></p>'.format(
-              description, filepath, filename))
+        self.emit(Written(description, join(getcwd(), filename), filename))
 
     def transcript_written(self, matching, line):
         self.written(matching, line)
@@ -413,27 +1182,30 @@ class MakeIndexParser(TexParser):
 class MakeGlossariesParser(MakeIndexParser):
     """Parse and format messages from makeglossaries."""
 
+    tool = 'makeglossaries'
+    state_attributes = TexParser.state_attributes + ('types',)
+    patterns = MakeIndexParser.patterns + (
+        (compile('^.*makeglossaries version (.*)$'), 'begin_run'),
+        (compile('^.*added glossary type \'(.*)\' \((.*)\).*$'),
+         'add_type'),
+        (compile(r'(\w+ \w+ file) (?:\./)?' +
+                 r'(.*\.(?:(?:acr)|(?:ist)|(?:glo)|(?:gls))).*\((.*)\)',
+                 UNICODE),
+         'work_with_file'),
+        (compile(r'(\w+ written in) (.*)\.$'), 'written'),
+        (compile('^.*Markup written into file "(.*)".$'),
+         'finish_markup'),
+        (compile('^.*xindy.*-L (.*) -I.*-t ".*\.(.*)" -o.*$'),
+         'run_xindy'),
+        (compile('Cannot locate xindy module'), 'warning'),
+        (compile('ERROR'), 'error'),
+        (compile('Warning'), 'warning'),
+        (compile('^\*\*\*'), 'info'),
+    )
+
     def __init__(self, input_stream, verbose):
-        """Initialize the regex patterns for the MakeGlossariesParser"""
+        """Initialize a new MakeGlossariesParser"""
         super(MakeGlossariesParser, self).__init__(input_stream, verbose)
-        self.patterns.extend([
-            (compile('^.*makeglossaries version (.*)$'), self.begin_run),
-            (compile('^.*added glossary type \'(.*)\' \((.*)\).*$'),
-             self.add_type),
-            (compile(r'(\w+ \w+ file) (?:\./)?' +
-                     r'(.*\.(?:(?:acr)|(?:ist)|(?:glo)|(?:gls))).*\((.*)\)',
-                     UNICODE),
-             self.work_with_file),
-            (compile(r'(\w+ written in) (.*)\.$'), self.written),
-            (compile('^.*Markup written into file "(.*)".$'),
-             self.finish_markup),
-            (compile('^.*xindy.*-L (.*) -I.*-t ".*\.(.*)" -o.*$'),
-             self.run_xindy),
-            (compile('Cannot locate xindy module'), self.warning),
-            (compile('ERROR'), self.error),
-            (compile('Warning'), self.warning),
-            (compile('^\*\*\*'), self.info),
-        ])
         self.types = {}
 
     def parse_stream(self):
@@ -466,24 +1238,20 @@ class MakeGlossariesParser(MakeIndexParser):
 
     def begin_run(self, matching, line):
         version = matching.group(1)
-        print('<h2>Make Glossaries</h2>' +
-              '<p class="info" >Version: <i>{}</i></p>'''.format(version))
+        self.emit(Version('makeglossaries', version))
 
     def add_type(self, matching, line):
         glossary_type = matching.group(1)
         files = matching.group(2)
         for file in files.split(','):
             self.types[file] = glossary_type
-        print('<p class="info">Add Glossary Type <strong>' +
-              '{}</strong><i> (Files: {})</i></p>'.format(glossary_type,
-                                                          files))
+        self.emit(GlossaryType(glossary_type, files))
 
     def run_xindy(self, matching, line):
         language = matching.group(1)
         file = matching.group(2)
         glossary_type = self.types[file]
-        print('<h3>Run xindy for glossary type {}</h3>'.format(glossary_type) +
-              '<p class="info">Language: {}</p>'.format(language))
+        self.emit(XindyRun(glossary_type, language))
 
     def transcript_written(self, matching, line):
         self.written(matching, line)
@@ -491,48 +1259,74 @@ class MakeGlossariesParser(MakeIndexParser):
     def finish_markup(self, m, line):
         mkfile = m.group(1)
         glossary_type = self.types[mkfile[-3:]]
-        print('<p class="info">Finished glossary for type <strong>' +
-              '{}</strong>. Output is in <a href="{}">{}</a></p>'.format(
-                  glossary_type, make_link(join(getcwd(), mkfile), 1), mkfile))
+        self.emit(GlossaryWritten(glossary_type, join(getcwd(), mkfile),
+                                  mkfile))
 
 
 class LaTexParser(TexParser):
     """Parse log messages from latex."""
 
+    tool = 'latex'
+    aggregate = True
+    state_attributes = TexParser.state_attributes + ('file_stack', 'marks')
+
     def __init__(self, input_stream, verbose, filename):
-        """Initialize the regex patterns for the LaTexParser."""
+        """Initialize a new LaTexParser."""
         super(LaTexParser, self).__init__(input_stream, verbose)
         self.suffix = splitext(filename)[0]
-        self.filename = self.current_file = filename
+        self.filename = filename
+        # Track the files TeX reads to attribute warnings to the right file
+        self.files = FileStack(filename)
         # Save gutter marks for errors and warnings
         self.marks = set()
-        self.patterns.extend([
-            (compile('^Document Class'), self.info),
-            (compile('.*?\(\.\/([^\)]*?\.(tex|{})( |$))'.format(self.suffix)),
-             self.detect_new_file),
-            (compile('.*\<use (.*?)\>'), self.detect_include),
-            (compile('^Output written'), self.info),
+        self.patterns = self.document_patterns(self.suffix)
+
+    @classmethod
+    @lru_cache(16)
+    def document_patterns(cls, suffix):
+        r"""Return the patterns for the document with the name ``suffix``.
+
+        Two of the patterns contain the name of the document without its
+        extension. We compile the patterns only once for every name.
+
+        Returns: ``((compiled regex, str), ...)``
+
+        Examples:
+
+            >>> patterns = LaTexParser.document_patterns('main')
+            >>> patterns is LaTexParser.document_patterns('main')
+            True
+            >>> print(patterns[1][0].pattern)
+            .*?\(\.\/([^\)]*?\.(tex|main)( |$))
+
+        """
+        return (
+            (compile('^Document Class'), 'info'),
+            (compile('.*?\(\.\/([^\)]*?\.(tex|{})( |$))'.format(suffix)),
+             'detect_new_file'),
+            (compile('.*\<use (.*?)\>'), 'detect_include'),
+            (compile('^Output written'), 'info'),
             (compile('LaTeX Warning:.*?input line (\d+)(\.|$)'),
-             self.handle_warning),
-            (compile('LaTeX Warning:.*'), self.warning),
-            (compile('.*pdfTeX warning.*'), self.warning),
-            (compile('LaTeX Font Warning:.*'), self.warning),
-            (compile('Overfull.*wide'), self.warning_format),
-            (compile('Underfull.*badness'), self.warning_format),
+             'handle_warning'),
+            (compile('LaTeX Warning:.*'), 'warning'),
+            (compile('.*pdfTeX warning.*'), 'warning'),
+            (compile('LaTeX Font Warning:.*'), 'warning'),
+            (compile('Overfull.*wide'), 'warning_format'),
+            (compile('Underfull.*badness'), 'warning_format'),
             (compile('^([\.\/\w\-\ \u0300-\u036F]+' +
-                     '(?:\.sty|\.tex|\.{}))'.format(self.suffix) +
+                     '(?:\.sty|\.tex|\.{}))'.format(suffix) +
                      ':(\d+):\s+(.*)', UNICODE),
-             self.handle_error),
-            (compile('([^:]*):(\d+): LaTeX Error:(.*)'), self.handle_error),
-            (compile('([^:]*):(\d+): (Emergency stop)'), self.handle_error),
-            (compile('Runaway argument'), self.pdf_latex_error),
+             'handle_error'),
+            (compile('([^:]*):(\d+): LaTeX Error:(.*)'), 'handle_error'),
+            (compile('([^:]*):(\d+): (Emergency stop)'), 'handle_error'),
+            (compile('Runaway argument'), 'pdf_latex_error'),
             # We need the (.*) at the beginning of the regular expression
             # since in some edge cases cases the output about the transcript
             # might actually not start at the beginning of the line.
-            (compile('(.*)Transcript written on (.*)\.$'), self.finish_run),
-            (compile('\!.*'), self.handle_old_style_errors),
-            (compile('^\s+==>'), self.fatal)
-        ])
+            (compile('(.*)Transcript written on (.*)\.$'), 'finish_run'),
+            (compile('\!.*'), 'handle_old_style_errors'),
+            (compile('^\s+==>'), 'fatal'),
+        )
 
     def parse_stream(self):
         """Parse log messages from makeglossaries.
@@ -610,61 +1404,79 @@ class LaTexParser(TexParser):
         """
         return super(LaTexParser, self).parse_stream()
 
+    @property
+    def current_file(self):
+        return self.files.current
+
+    @property
+    def file_stack(self):
+        return self.files.stack
+
+    @file_stack.setter
+    def file_stack(self, stack):
+        self.files.stack = stack
+
+    def get_prefilter(self):
+        return cached_prefilter(self.patterns + ((FileStack.MARKERS, None),),
+                                self.max_print_line)
+
+    def read_line(self):
+        line = self.input_stream.readline()
+        self.files.scan(line)
+        return line
+
     def detect_new_file(self, matching, line):
-        self.current_file = matching.group(1).rstrip()
-        print("<h4>Processing: {}</h4>".format(self.current_file))
+        self.emit(FileOpened(matching.group(1).rstrip()))
 
     def detect_include(self, matching, line):
         filepath = matching.group(1)
-        print("<ul><li>Including: {}</li></ul>".format(filepath))
+        self.emit(Include(filepath))
 
     def handle_warning(self, matching, line):
         filepath = join(getcwd(), self.current_file)
         linenumber = int(matching.group(1))
-        print('<p class="warning"><a href="{}">{}</a></p>'.format(
-              make_link(filepath, linenumber), line))
-        self.marks.add((filepath, linenumber, 'warning', line))
+        diagnostic = Diagnostic('warning', line, filepath, linenumber,
+                                self.current_file)
+        if self.emit(diagnostic):
+            self.marks.add(diagnostic.mark)
         self.number_warnings += 1
 
     def handle_error(self, matching, line):
         filename = matching.group(1)
         linenumber = int(matching.group(2))
         description = matching.group(3)
-        filepath = join(getcwd(), filename)
-        print('<p class="error">Latex Error: <a href="' +
-              '{}">{}:{}</a> {}</p>'.format(make_link(filepath, linenumber),
-                                            filename, linenumber, description))
-        self.marks.add((filepath, linenumber, 'error', description))
+        diagnostic = Diagnostic('error', description,
+                                join(getcwd(), filename), linenumber,
+                                filename)
+        self.emit(diagnostic)
+        self.marks.add(diagnostic.mark)
         self.number_errors += 1
         if search('Fatal error', description):
             self.fatal_error = True
 
     def handle_old_style_errors(self, matching, line):
         if search('[Ee]rror', line):
-            print('<p class="error">{}</p>'.format(line))
+            self.emit(Message('error', line))
             self.number_errors += 1
         else:
-            print('<p class="warning">{}</p>'.format(line))
+            self.emit(Message('warning', line))
             self.number_warnings += 1
 
     def pdf_latex_error(self, matching, line):
         self.number_errors += 1
-        print('<p class="error">'.format(line))
-        line = self.input_stream.readline()
+        line = self.read_line()
         if line and match('^ ==> Fatal error occurred', line):
-            print('{}'.format(line.rstrip('\n')))
+            self.emit(ErrorContext(line.rstrip('\n'), True))
             self.fatal_error = True
         elif line:
-            print('<pre>{}</pre>'.format(line.rstrip('\n')))
-        print('</p>')
-        stdout.flush()
+            self.emit(ErrorContext(line.rstrip('\n')))
 
     def warning(self, matching, line):
         # We might have gotten here by matching $1 of the following regex:
         #   (LaTeX Warning:.*) ?input line (\d+)(\.|$)
         # Lets read the next line and check if we find the remaining regex
         # pattern
-        next_line = self.input_stream.readline().strip('\n')
+        next_line = self.read_line().strip('\n')
         match_next_line = match('.*?input line (\d+)(\.|$)', next_line)
         if match_next_line:
             return (self.handle_warning(match_next_line,
@@ -676,40 +1488,64 @@ class LaTexParser(TexParser):
 
     def finish_run(self, matching, line):
         filename = matching.group(2).strip('"')
-        filepath = make_link(join(getcwd(), filename))
-        print('<p>Complete transcript is in <a href="{}">{}</a></p>'.format(
-              filepath, filename))
+        self.report_repeated()
+        self.emit(Transcript(join(getcwd(), filename), filename))
         self.done = True
 
     def bad_run(self):
         logfile = basename(self.filename)
         logfile = logfile.replace(self.suffix, 'log')
         logpath = join(getcwd(), logfile)
-        print('<p class="error">A fatal error occurred, log file is in ' +
-              '<a href="{}">{}</a></p>'.format(make_link(logpath, logfile),
-                                               logfile))
+        self.emit(Transcript(logpath, logfile, complete=False))
 
 
 class LaTexMkParser(TexParser):
-    """Parse log messages from latexmk."""
+    """Parse log messages from latexmk.
+
+    The attribute ``runs`` may contain the results of tool runs (latex,
+    bibtex, biber or makeindex) parsed in advance, for example by another
+    process. It maps the offset of the first line after the banner of a tool
+    to a tuple containing the events and final state of the parser for this
+    tool, the offset after the last line read by the parser and the end of
+    the range the parser read from. If this parser reaches such a run, it
+    reports the stored results instead of parsing the run again (see
+    ``replay_run``).
+
+    If the output ends before the last tool finished its run, then the
+    attribute ``checkpoint`` contains the parsing state in front of the
+    banner of this tool (see ``get_state``). Otherwise this attribute is
+    ``None``. Scripts parsing a growing log file use the checkpoint to parse
+    the unfinished run again, once the tool wrote the rest of its output.
+
+    """
+
+    tool = 'latexmk'
+    state_attributes = TexParser.state_attributes + (
+        'marks', 'number_runs', 'number_tools', 'finished_errors',
+        'finished_warnings')
+    patterns = (
+        (compile('This is (pdfTeX|latex2e|latex|LuaTeX|XeTeX)'),
+         'start_latex'),
+        (compile('This is BibTeX'), 'start_bibtex'),
+        (compile('.*This is Biber'), 'start_biber'),
+        (compile('^Latexmk: All targets \(.*?\) are up-to-date'),
+         'finish_run'),
+        (compile('This is makeindex'), 'start_bibtex'),
+        (compile('^Latexmk'), 'latexmk'),
+        (compile('Run number'), 'new_run'),
+    )
 
     def __init__(self, input_stream, verbose, filename):
-        """Initialize the regex patterns for the LaTexMkParser."""
+        """Initialize a new LaTexMkParser."""
         super(LaTexMkParser, self).__init__(input_stream, verbose)
         self.filename = filename
         self.marks = set()
-        self.patterns.extend([
-            (compile('This is (pdfTeX|latex2e|latex|LuaTeX|XeTeX)'),
-             self.start_latex),
-            (compile('This is BibTeX'), self.start_bibtex),
-            (compile('.*This is Biber'), self.start_biber),
-            (compile('^Latexmk: All targets \(.*?\) are up-to-date'),
-             self.finish_run),
-            (compile('This is makeindex'), self.start_bibtex),
-            (compile('^Latexmk'), self.latexmk),
-            (compile('Run number'), self.new_run)
-        ])
         self.number_runs = 0
+        self.number_tools = 0
+        self.finished_errors = 0
+        self.finished_warnings = 0
+        self.runs = {}
+        self.checkpoint = None
 
     def parse_stream(self):
         """Parse log messages from latexmk.
@@ -770,35 +1606,96 @@ class LaTexMkParser(TexParser):
         """
         return super(LaTexMkParser, self).parse_stream()
 
+    def replay_run(self):
+        """Use the stored results for the run the subparser would parse.
+
+        We only use the results, if the parser for the run was done before
+        it reached the end of its range. Otherwise the subparser parses the
+        run as usual.
+
+        """
+        run = self.runs.get(getattr(self.input_stream, 'position', None))
+        if not run:
+            return
+        events, state, position, stop = run
+        if not state['done'] or (position >= stop and
+                                 stop < self.input_stream.end):
+            return
+        parser = self.subparser
+        parser.set_state(state)
+        parser.events = lambda: iter(events)
+        self.input_stream.position = position
+
+    def totals(self):
+        """Return the number of errors and warnings found in all runs.
+
+        The attributes ``number_errors`` and ``number_warnings`` only count
+        the messages of the current run of latexmk.
+
+        Returns: ``(int, int)``
+
+        Examples:
+
+            >>> filepath = 'Tests/Log/latexmk_external_bibliography.log'
+            >>> with open(filepath) as log:
+            ...     parser = LaTexMkParser(log, False, filepath)
+            ...     events = list(parser.events())
+            >>> parser.number_warnings, parser.totals()
+            (0, (0, 5))
+
+        """
+        return (self.finished_errors + self.number_errors,
+                self.finished_warnings + self.number_warnings)
+
+    def start_run(self, program, banner, parser):
+        """Report the start of ``program`` and parse its output.
+
+        Arguments:
+
+            program
+
+                The name of the tool started by latexmk.
+
+            banner
+
+                The first line printed by the tool.
+
+            parser
+
+                The parser for the output of the tool.
+
+        """
+        self.checkpoint = self.get_state()
+        self.number_tools += 1
+        self.emit(RunStart(program, banner, self.number_tools))
+        self.subparser = parser
+        self.replay_run()
+
     def start_bibtex(self, matching, line):
-        print('<div class="bibtex"><h3>{}</h3>'.format(line[:-1]))
-        parser = BibTexParser(self.input_stream, self.verbose)
-        fatal_error, number_errors, number_warnings = parser.parse_stream()
-        self.number_errors += number_errors
-        self.number_warnings += number_warnings
+        self.start_run('bibtex', line[:-1],
+                       BibTexParser(self.input_stream, self.verbose))
 
     def start_biber(self, matching, line):
-        print('<div class="biber"><h3>{}</h3>'.format(line))
-        parser = BiberParser(self.input_stream, self.verbose)
-        fatal_error, number_errors, number_warnings = parser.parse_stream()
-        self.number_errors += number_errors
-        self.number_warnings += number_warnings
+        self.start_run('biber', line,
+                       BiberParser(self.input_stream, self.verbose))
 
     def start_latex(self, matching, line):
-        print('<div class="latex"><hr><h3>{}</h3>'.format(line[:-1]))
-        parser = LaTexParser(self.input_stream, self.verbose, self.filename)
-        fatal_error, number_errors, number_warnings = parser.parse_stream()
-        self.number_errors += number_errors
-        self.number_warnings += number_warnings
-        self.marks = parser.marks
+        self.start_run('latex', line[:-1],
+                       LaTexParser(self.input_stream, self.verbose,
+                                   self.filename))
+
+    def merge(self, parser):
+        super(LaTexMkParser, self).merge(parser)
+        if isinstance(parser, LaTexParser):
+            self.marks = parser.marks
+        if parser.done:
+            self.checkpoint = None
 
     def new_run(self, matching, line):
         if self.number_runs > 0:
-            print('''<hr><p>Found {} error{}, and {} warning{} in this run</p>
-                  '''.format(self.number_errors,
-                             '' if self.number_errors == 1 else 's',
-                             self.number_warnings,
-                             '' if self.number_warnings == 1 else 's'))
+            self.emit(RunSummary(self.number_errors, self.number_warnings))
+        self.finished_errors += self.number_errors
+        self.finished_warnings += self.number_warnings
         self.number_warnings = 0
         self.number_errors = 0
         self.number_runs += 1
@@ -808,25 +1705,28 @@ class LaTexMkParser(TexParser):
         self.done = True
 
     def latexmk(self, matching, line):
-        print('<p class="ltxmk">{}</p>'.format(line))
+        self.emit(Message('latexmk', line))
 
 
 class ChkTexParser(TexParser):
     """Parse the output from chktex."""
 
+    tool = 'chktex'
+    state_attributes = TexParser.state_attributes + ('number_runs',)
+    patterns = (
+        (compile('^ChkTeX'), 'info'),
+        (compile('Warning \d+ in (.*.tex) line (\d+):(.*)'),
+         'handle_warning'),
+        (compile('Error \d+ in (.*.tex) line (\d+):(.*)'),
+         'handle_error'),
+        (compile('(\d+) errors printed; (\d+) warnings printed;'),
+         'finish_run'),
+    )
+
     def __init__(self, input_stream, verbose, filename):
-        """Initialize the regex patterns for the ChkTexParser."""
+        """Initialize a new ChkTexParser."""
         super(ChkTexParser, self).__init__(input_stream, verbose)
         self.fileName = filename
-        self.patterns.extend([
-            (compile('^ChkTeX'), self.info),
-            (compile('Warning \d+ in (.*.tex) line (\d+):(.*)'),
-             self.handle_warning),
-            (compile('Error \d+ in (.*.tex) line (\d+):(.*)'),
-             self.handle_error),
-            (compile('(\d+) errors printed; (\d+) warnings printed;'),
-             self.finish_run)
-        ])
         self.number_runs = 0
 
     def parse_stream(self):
@@ -862,16 +1762,17 @@ class ChkTexParser(TexParser):
 
     def handle(self, matching, line, error_class='warning'):
         filename = matching.group(1)
-        linenumber = matching.group(2)
+        linenumber = int(matching.group(2))
         description = matching.group(3)
-        print('<p class="{}">{}: <a href="{}">{}:{}</a></p>'.format(
-              error_class, 'Error' if error_class == 'error' else 'Warning',
-              make_link(join(getcwd(), filename), linenumber), filename,
-              description))
         details = self.input_stream.readline()
         if len(details) > 2:
-            print('<pre>{}\n{}</pre>'.format(details[:-1],
-                  self.input_stream.readline()[:-1])),
+            details = '{}\n{}'.format(details[:-1],
+                                      self.input_stream.readline()[:-1])
+        else:
+            details = None
+        self.emit(Diagnostic(error_class, description,
+                             join(getcwd(), filename), linenumber, filename,
+                             details))
         if error_class == 'error':
             self.number_errors += 1
         else:
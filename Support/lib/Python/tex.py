@@ -14,11 +14,11 @@ from __future__ import unicode_literals
 from io import open
 from os import chdir, getenv, EX_OSFILE  # noqa
 from os.path import basename, dirname, isfile, join, normpath, realpath
-from pipes import quote as shellquote
 from re import compile
-from subprocess import Popen, PIPE
 from sys import exit, stdout
 
+from launcher import Process, PIPE, ProgramNotFound
+
 
 # -- Global Variables ---------------------------------------------------------
 
@@ -61,13 +61,45 @@ def expand_name(filename, program='pdflatex'):
     if isfile(filename):
         return filename
     stdout.flush()
-    run_object = Popen("kpsewhich -progname='{}' {}".format(
-        program, shellquote(filename)), shell=True, stdout=PIPE,
-        universal_newlines=True)
-    expanded_filepath = run_object.stdout.read().strip()
+    try:
+        run_object = Process(['kpsewhich', '-progname={}'.format(program),
+                              filename], stdout=PIPE, universal_newlines=True)
+    except ProgramNotFound:
+        return filename
+    expanded_filepath = run_object.communicate()[0].strip()
     return expanded_filepath if expanded_filepath else filename
 
 
+def get_max_print_line(default=79):
+    """Get the maximum length of lines written by tex programs.
+
+    TeX wraps all lines longer than the value of the variable
+    ``max_print_line``. This function asks ``kpsewhich`` for the value used
+    by the current tex distribution. If we can not determine the value, then
+    we return ``default``.
+
+    Arguments:
+
+        default
+
+            The value returned if we can not determine ``max_print_line``.
+
+    Returns: ``int``
+
+    Examples:
+
+        >>> get_max_print_line() >= 79
+        True
+
+    """
+    try:
+        run_object = Process(['kpsewhich', '-var-value=max_print_line'],
+                             stdout=PIPE, stderr=PIPE, universal_newlines=True)
+        return int(run_object.communicate()[0])
+    except (OSError, ValueError):
+        return default
+
+
 def determine_typesetting_directory(ts_directives,
                                     master_document=getenv('TM_LATEX_MASTER'),
                                     tex_file=getenv('TM_FILEPATH', '')):
@@ -1,13 +1,330 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to read the preferences of the LaTeX bundle.
+
+The class ``Preferences`` reads the preferences using a backend:
+
+- ``CoreFoundationBackend`` reads the preferences of TextMate via the
+  CoreFoundation preferences API. Importing ``Foundation`` and synchronizing
+  the preferences of TextMate takes considerable time. The backend is
+  therefore usually wrapped in a ``SnapshotBackend``, which stores the values
+  in a cache file and only reads them again after the preference file of
+  TextMate changed.
+
+- ``FileBackend`` reads the preferences from a JSON or property list file and
+  from environment variables (like ``TM_LATEX_ENGINE``). This backend does
+  not need PyObjC and is used on systems other than macOS.
+
+"""
+
 # -- Imports ------------------------------------------------------------------
 
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from Foundation import CFPreferencesAppSynchronize, CFPreferencesCopyAppValue
-from os import getenv
+from io import open
+from json import dumps, load
+from os import getenv, getpid, makedirs, rename, stat
+from os.path import dirname, expanduser, isdir, join, splitext
+from re import sub
+from sys import platform
+
+
+# -- Functions ----------------------------------------------------------------
+
+def environment_variable(key):
+    """Return the name of the environment variable overriding ``key``.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> print(environment_variable('latexEngine'))
+        TM_LATEX_ENGINE
+        >>> print(environment_variable('latexKeepLogWin'))
+        TM_LATEX_KEEP_LOG_WIN
+
+    """
+    return 'TM_{}'.format(sub('([a-z])([A-Z])', r'\1_\2', key).upper())
+
+
+def convert(value, default):
+    """Convert the string ``value`` to the type of ``default``.
+
+    Returns: ``bool`` or ``str``
+
+    Examples:
+
+        >>> convert('1', True), convert('no', True), convert('YES', False)
+        (True, False, True)
+        >>> print(convert('xelatex', 'pdflatex'))
+        xelatex
+
+    """
+    if isinstance(default, bool):
+        return value.strip().lower() in {'1', 'true', 'yes'}
+    return value
+
+
+def plain(value):
+    """Convert a value read via PyObjC to a plain Python value.
+
+    Returns: ``bool``, ``int``, ``float`` or ``str``
+
+    Examples:
+
+        >>> plain(True), plain(3), plain(1.5)
+        (True, 3, 1.5)
+
+    """
+    for kind in (bool, int, float):
+        if isinstance(value, kind):
+            return kind(value)
+    return '{}'.format(value)
+
+
+def cache_location(filename='latexpreferences.json'):
+    """Return the path of the user level cache file ``filename``.
+
+    ``SnapshotBackend`` stores its values in the default file.
+
+    Returns: ``str``
+
+    """
+    cache_directory = ('~/Library/Caches/TextMate' if platform == 'darwin'
+                       else join(getenv('XDG_CACHE_HOME', '~/.cache'),
+                                 'textmate'))
+    return join(expanduser(cache_directory), filename)
+
+
+def default_backend():
+    """Return the backend used to read the preferences on this system.
+
+    If the environment variable ``TM_LATEX_PREFERENCES`` contains the path of
+    a preference file, then we use a ``FileBackend`` for this file. On macOS
+    we otherwise read the preferences of TextMate. On other systems we read
+    the file ``latex.json`` in the TextMate configuration directory.
+
+    Returns: ``CoreFoundationBackend``, ``FileBackend`` or
+             ``SnapshotBackend``
+
+    """
+    preference_file = getenv('TM_LATEX_PREFERENCES')
+    if preference_file:
+        return FileBackend(preference_file)
+    if platform == 'darwin':
+        return SnapshotBackend(CoreFoundationBackend())
+    return FileBackend(join(expanduser(getenv('XDG_CONFIG_HOME',
+                                              '~/.config')),
+                            'textmate', 'latex.json'))
+
+
+# -- Classes ------------------------------------------------------------------
+
+class CoreFoundationBackend(object):
+    """Read the preferences of TextMate via CoreFoundation.
+
+    The attribute ``source`` stores the path of the preference file written
+    for TextMate (see ``SnapshotBackend``).
+
+    """
+
+    def __init__(self, identifier=None):
+        """Create a backend for the application ``identifier``.
+
+        If ``identifier`` is ``None``, then we use the value of the
+        environment variable ``TM_APP_IDENTIFIER``.
+
+        """
+        self.identifier = (identifier if identifier else
+                           getenv('TM_APP_IDENTIFIER',
+                                  'com.macromates.textmate'))
+        self.source = expanduser('~/Library/Preferences/{}.plist'.format(
+            self.identifier))
 
+    def read(self, keys, defaults={}):
+        """Return the values of all keys in ``keys`` that are set.
+
+        The values of TextMate's preferences already have the right type, so
+        this backend ignores ``defaults``.
+
+        Returns: ``{str: object}``
+
+        """
+        from Foundation import (CFPreferencesAppSynchronize,
+                                CFPreferencesCopyAppValue)
+
+        CFPreferencesAppSynchronize(self.identifier)
+        values = {}
+        for key in keys:
+            value = CFPreferencesCopyAppValue(key, self.identifier)
+            if value is not None:
+                values[key] = plain(value)
+        return values
+
+
+class FileBackend(object):
+    """Read the preferences from a file and from environment variables.
+
+    The file contains a dictionary stored either as JSON (extension
+    ``.json``) or as property list. A preference file that does not exist
+    counts as empty. Environment variables (see ``environment_variable``)
+    override the values stored in the file.
+
+    """
+
+    def __init__(self, source):
+        """Create a backend reading the preference file ``source``."""
+        self.source = source
+
+    def read(self, keys, defaults={}):
+        """Return the values of all keys in ``keys`` that are set.
+
+        The values of environment variables are converted to the type of the
+        corresponding value in ``defaults``.
+
+        Returns: ``{str: object}``
+
+        Examples:
+
+            >>> from os import environ, remove
+            >>> with open('/tmp/latex.json', 'w') as preference_file:
+            ...     _ = preference_file.write('{"latexEngine": "xelatex", '
+            ...                               '"latexVerbose": true}')
+            >>> environ['TM_LATEX_VERBOSE'] = '0'
+            >>> values = FileBackend('/tmp/latex.json').read(
+            ...     ['latexEngine', 'latexVerbose', 'latexViewer'],
+            ...     {'latexVerbose': True})
+            >>> print(values['latexEngine'])
+            xelatex
+            >>> values['latexVerbose'], 'latexViewer' in values
+            (False, False)
+            >>> del environ['TM_LATEX_VERBOSE']
+            >>> remove('/tmp/latex.json')
+
+            >>> with open('/tmp/latex.plist', 'w') as preference_file:
+            ...     _ = preference_file.write('<plist><dict><key>')
+            >>> FileBackend('/tmp/latex.plist').read(['latexEngine'])
+            {}
+            >>> remove('/tmp/latex.plist')
+
+        """
+        try:
+            if splitext(self.source)[1] == '.json':
+                with open(self.source, encoding='utf-8') as preference_file:
+                    stored = load(preference_file)
+            else:
+                import plistlib
+                with open(self.source, 'rb') as preference_file:
+                    stored = (plistlib.load(preference_file)
+                              if hasattr(plistlib, 'load') else
+                              plistlib.readPlist(preference_file))
+        except Exception:
+            # Besides IO errors, a broken file raises different exceptions
+            # depending on the format and the Python version (e.g.
+            # `ValueError` or `xml.parsers.expat.ExpatError`).
+            stored = {}
+
+        values = {key: stored[key] for key in keys if key in stored}
+        for key in keys:
+            value = getenv(environment_variable(key))
+            if value is not None:
+                values[key] = convert(value, defaults.get(key, ''))
+        return values
+
+
+class SnapshotBackend(object):
+    """Store the values read by another backend in a cache file.
+
+    The cache contains the values together with the modification time, the
+    size and the inode of the source file of the wrapped backend. As long as
+    the source file does not change, we read the values from the cache
+    without using the wrapped backend at all.
+
+    """
+
+    def __init__(self, backend, cache=None):
+        """Wrap ``backend``, which needs an attribute ``source``.
+
+        If ``cache`` is ``None``, then we use the file returned by
+        ``cache_location``.
+
+        """
+        self.backend = backend
+        self.cache = cache if cache else cache_location()
+
+    def signature(self):
+        """Return a value identifying the current state of the source file.
+
+        This method returns ``None`` if the source file does not exist.
+
+        Returns: ``[object]`` or ``None``
+
+        """
+        try:
+            status = stat(self.backend.source)
+        except OSError:
+            return None
+        return [self.backend.source, status.st_mtime, status.st_size,
+                status.st_ino]
+
+    def read(self, keys, defaults={}):
+        """Return the values of all keys in ``keys`` that are set.
+
+        Returns: ``{str: object}``
+
+        Examples:
+
+            >>> from os import remove
+            >>> class Counter(object):
+            ...     source = '/tmp/latex.plist'
+            ...     reads = 0
+            ...     def read(self, keys, defaults):
+            ...         self.reads += 1
+            ...         return {'latexEngine': 'lualatex'}
+            >>> with open('/tmp/latex.plist', 'w') as source:
+            ...     _ = source.write('')
+            >>> counter = Counter()
+            >>> backend = SnapshotBackend(counter, '/tmp/latexprefs.json')
+            >>> print(backend.read(['latexEngine'])['latexEngine'])
+            lualatex
+            >>> print(backend.read(['latexEngine'])['latexEngine'])
+            lualatex
+            >>> counter.reads
+            1
+            >>> remove('/tmp/latex.plist')
+            >>> remove('/tmp/latexprefs.json')
+
+        """
+        signature = self.signature()
+        if signature is not None:
+            try:
+                with open(self.cache, encoding='utf-8') as cache:
+                    snapshot = load(cache)
+                if (snapshot['signature'] == signature and
+                        set(keys) <= set(snapshot['keys'])):
+                    return snapshot['values']
+            except (IOError, OSError, KeyError, ValueError):
+                pass
+
+        values = self.backend.read(keys, defaults)
+        if signature is not None:
+            try:
+                if not isdir(dirname(self.cache)):
+                    makedirs(dirname(self.cache))
+                # Replace the cache in one step, so concurrent commands never
+                # read a partially written file
+                temporary = '{}.{}'.format(self.cache, getpid())
+                with open(temporary, 'w', encoding='utf-8') as cache:
+                    # `dumps` returns a byte string in Python 2
+                    cache.write('{}'.format(dumps({
+                        'signature': signature, 'keys': list(keys),
+                        'values': values})))
+                rename(temporary, self.cache)
+            except (IOError, OSError):
+                pass
+        return values
 
-# -- Class --------------------------------------------------------------------
 
 class Preferences(object):
     """Process the current preferences of the LaTeX bundle.
@@ -17,9 +334,17 @@ class Preferences(object):
 
     """
 
-    def __init__(self):
+    def __init__(self, backend=None):
         """Create a new Preferences object from the current settings.
 
+        Arguments:
+
+            backend
+
+                The backend used to read the preferences. If this value is
+                ``None``, then we use the backend returned by
+                ``default_backend``.
+
         Examples:
 
             >>> preferences = Preferences()
@@ -30,25 +355,21 @@ class Preferences(object):
             True
 
         """
-        tm_identifier = getenv('TM_APP_IDENTIFIER', 'com.macromates.textmate')
-        CFPreferencesAppSynchronize(tm_identifier)
-
         self.default_values = {
             'latexAutoView': True,
             'latexEngine': "pdflatex",
             'latexEngineOptions': "",
+            'latexIncremental': False,
             'latexVerbose': False,
             'latexUselatexmk': True,
             'latexViewer': "TextMate",
             'latexKeepLogWin': True,
             'latexDebug': False,
         }
+        self.backend = backend if backend else default_backend()
         self.prefs = self.default_values.copy()
-
-        for key in self.prefs:
-            preference_value = CFPreferencesCopyAppValue(key, tm_identifier)
-            if preference_value is not None:
-                self.prefs[key] = preference_value
+        self.prefs.update(self.backend.read(sorted(self.prefs),
+                                            self.default_values))
 
     def __getitem__(self, key):
         """Return a value stored inside Preferences.
@@ -85,6 +406,7 @@ class Preferences(object):
               latexDebug = 0;
               latexEngine = pdflatex;
               latexEngineOptions = "";
+              latexIncremental = 0;
               latexKeepLogWin = 1;
               latexUselatexmk = 1;
               latexVerbose = 0;
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""This module contains code to probe the programs of the tex installation.
+
+Before we typeset a document we need to know if the tex engine exists,
+which version it has and if it supports options like ``-synctex``. Asking
+the engine itself (``--version``, ``--help``) takes considerable time,
+especially the first time after a restart. The function ``probe`` therefore
+stores the results in a user level cache file. The cache entry of a program
+stays valid as long as its resolved path, the modification time and inode of
+the binary and the value of ``PATH`` do not change. Updating the tex
+installation therefore invalidates the cache automatically.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from io import open
+from json import dumps, load
+from os import getenv, getpid, makedirs, rename, stat
+from os.path import dirname, isdir, realpath
+try:
+    from shutil import which  # Python 3
+except ImportError:
+    from distutils.spawn import find_executable as which  # Python 2
+
+from launcher import Process, PIPE, STDOUT
+from tmprefs import cache_location
+
+
+# -- Constants ----------------------------------------------------------------
+
+# Options we look for in the help text of a tex engine
+OPTIONS = ['draftmode', 'recorder', 'synctex']
+
+
+# -- Functions ----------------------------------------------------------------
+
+def signature(program):
+    """Return a value identifying the installed version of ``program``.
+
+    This function returns ``None`` if ``program`` could not be found.
+
+    Returns: ``[object]`` or ``None``
+
+    Examples:
+
+        >>> signature('nonexistent-tex-engine') is None
+        True
+        >>> signature('sh')[0].endswith('sh')
+        True
+
+    """
+    location = which(program)
+    if location is None:
+        return None
+    location = realpath(location)
+    try:
+        status = stat(location)
+    except OSError:
+        return None
+    return [location, status.st_mtime, status.st_ino, getenv('PATH', '')]
+
+
+def run(arguments):
+    """Run ``arguments`` and return the output of the program.
+
+    Returns: ``str``
+
+    Examples:
+
+        >>> print(run(['echo', 'TeX']))
+        TeX
+        <BLANKLINE>
+
+    """
+    process = Process(arguments, stdin=PIPE, stdout=PIPE, stderr=STDOUT,
+                      universal_newlines=True)
+    return process.communicate()[0]
+
+
+def inspect(program):
+    """Ask ``program`` for its version and the options it supports.
+
+    Returns: ``{str: object}``
+
+    """
+    help_text = run([program, '--help'])
+    information = {option: option in help_text for option in OPTIONS}
+    version = run([program, '--version']).splitlines()
+    information['version'] = version[0] if version else ''
+    return information
+
+
+def probe(program, cache=None):
+    """Return information about the tex program ``program``.
+
+    The returned dictionary contains the following keys:
+
+        exists
+
+            Specifies if ``program`` could be found in the ``PATH``.
+
+        version
+
+            The first line printed by ``program --version``.
+
+        draftmode, recorder, synctex
+
+            Specify if ``program`` supports the option of the same name.
+
+    If ``program`` could not be found, then the dictionary only contains the
+    key ``exists``. We only run ``program`` if the cache does not contain
+    up to date information about it.
+
+    Arguments:
+
+        program
+
+            The name of the tex program (e.g. ``pdflatex``).
+
+        cache
+
+            The path of the cache file. If this value is ``None``, then we
+            use a file in the cache directory of the user.
+
+    Returns: ``{str: object}``
+
+    Examples:
+
+        >>> from os import remove
+        >>> probe('nonexistent-tex-engine', '/tmp/toolchain.json')['exists']
+        False
+        >>> information = probe('sh', '/tmp/toolchain.json')
+        >>> information['exists'], information['synctex']
+        (True, False)
+        >>> probe('sh', '/tmp/toolchain.json') == information
+        True
+        >>> remove('/tmp/toolchain.json')
+
+    """
+    current = signature(program)
+    if current is None:
+        return {'exists': False}
+
+    cache = cache if cache else cache_location('latextoolchain.json')
+    try:
+        with open(cache, encoding='utf-8') as storage:
+            entries = load(storage)
+    except (IOError, OSError, ValueError):
+        entries = {}
+    entry = entries.get(program)
+    if entry and entry.get('signature') == current:
+        return entry['information']
+
+    information = inspect(program)
+    information['exists'] = True
+    entries[program] = {'signature': current, 'information': information}
+    try:
+        if not isdir(dirname(cache)):
+            makedirs(dirname(cache))
+        # Replace the cache in one step, so concurrent commands never read a
+        # partially written file
+        temporary = '{}.{}'.format(cache, getpid())
+        with open(temporary, 'w', encoding='utf-8') as storage:
+            # `dumps` returns a byte string in Python 2
+            storage.write('{}'.format(dumps(entries)))
+        rename(temporary, cache)
+    except (IOError, OSError):
+        pass
+    return information
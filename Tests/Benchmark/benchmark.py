@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the throughput of the parsers in ``parsing``.
+
+This script parses every log in ``Tests/Log`` and the synthetic logs created
+by the module ``logs`` with the matching subclass of ``TexParser``. For every
+log and reader (``mapped``: ``logreader.MappedLog`` as used by
+``texparser.py``, ``stream``: a binary stream as used by ``texmate.py``) it
+reports the number of lines parsed per second and the peak memory used while
+parsing.
+
+The results can be saved as JSON and compared with the results of an older
+version of the parsers. The script exits with status 1, if one of the logs
+took considerably longer to parse than before.
+
+Usage:
+
+    python Tests/Benchmark/benchmark.py [-lines LINES] [-repeat REPEAT]
+                                        [-save FILE] [-compare FILE]
+                                        [-threshold THRESHOLD]
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from os import sys, path
+TESTS = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(1, path.join(path.dirname(TESTS), 'Support', 'lib', 'Python'))
+
+from argparse import ArgumentParser
+from datetime import datetime
+from glob import glob
+from io import BytesIO, open
+from json import dumps, load
+from platform import platform, python_version
+from timeit import default_timer
+try:
+    from tracemalloc import get_traced_memory, start, stop
+except ImportError:  # Python 2
+    start = None
+
+from logreader import MappedLog
+from logs import LOGS
+from parsing import (BibTexParser, BiberParser, ChkTexParser, LaTexMkParser,
+                     LaTexParser, MakeGlossariesParser, MakeIndexParser)
+
+
+# -- Constants ----------------------------------------------------------------
+
+# Parsers for the logs in ``Tests/Log``
+PARSERS = {'biber': BiberParser,
+           'bibtex': BibTexParser,
+           'chktex': ChkTexParser,
+           'latex': LaTexParser,
+           'latexmk': LaTexMkParser,
+           'makeglossaries': MakeGlossariesParser,
+           'makeindex': MakeIndexParser}
+FIXTURES = {'biber.log': 'biber',
+            'bibtex.log': 'bibtex',
+            'chktex.log': 'chktex',
+            'external_bibliography.log': 'latex',
+            'latex.log': 'latex',
+            'latex_error.log': 'latex',
+            'latexmk.log': 'latexmk',
+            'latexmk_external_bibliography.log': 'latexmk',
+            'latexmk_external_bibliography_biber.log': 'latexmk',
+            'latexmk_makeindex.log': 'latexmk',
+            'makeglossaries.log': 'makeglossaries',
+            'makeindex.log': 'makeindex',
+            'ünicöde.log': 'latexmk'}
+READERS = ('mapped', 'stream')
+# Parse small logs repeatedly until a measurement takes at least this long
+MINIMUM_TIME = 0.2
+
+
+# -- Functions ----------------------------------------------------------------
+
+def create_parser(tool, log, reader):
+    """Create a parser for the bytes ``log`` read using ``reader``.
+
+    Returns: ``TexParser``
+
+    """
+    stream = MappedLog(log) if reader == 'mapped' else BytesIO(log)
+    parser_class = PARSERS[tool]
+    if tool in {'chktex', 'latex', 'latexmk'}:
+        return parser_class(stream, False, 'main.tex')
+    return parser_class(stream, False)
+
+
+def parse(tool, log, reader):
+    """Parse ``log`` and return the number of events."""
+    return sum(1 for _ in create_parser(tool, log, reader).events())
+
+
+def measure_time(tool, log, reader, repeat):
+    """Return the shortest time needed to parse ``log`` once.
+
+    Returns: ``float``
+
+    """
+    iterations = 1
+    while True:
+        times = []
+        for _ in range(repeat):
+            begin = default_timer()
+            for _ in range(iterations):
+                parse(tool, log, reader)
+            times.append(default_timer() - begin)
+        if min(times) >= MINIMUM_TIME or iterations >= 10000:
+            return min(times) / iterations
+        iterations *= 10
+
+
+def measure_memory(tool, log, reader):
+    """Return the peak memory in bytes allocated while parsing ``log``.
+
+    On Python 2 this function returns ``None``.
+
+    Returns: ``int``
+
+    """
+    if start is None:
+        return None
+    start()
+    try:
+        parse(tool, log, reader)
+        return get_traced_memory()[1]
+    finally:
+        stop()
+
+
+def logs_to_parse(number_lines):
+    """Return the names, parsers and content of all logs we measure.
+
+    Returns: ``generator``
+
+    """
+    for filepath in sorted(glob(path.join(TESTS, 'Log', '*.log'))):
+        name = path.basename(filepath)
+        with open(filepath, 'rb') as log:
+            yield name, FIXTURES[name], log.read()
+    for name, create_log, tool in LOGS:
+        yield name, tool, create_log(number_lines)
+
+
+def run(number_lines, repeat):
+    """Measure all logs and return the results.
+
+    Returns: ``{str: {str: object}}``
+
+    """
+    results = {}
+    for name, tool, log in logs_to_parse(number_lines):
+        lines = log.count(b'\n')
+        events = parse(tool, log, 'mapped')
+        for reader in READERS:
+            seconds = measure_time(tool, log, reader, repeat)
+            result = {'log': name, 'parser': PARSERS[tool].__name__,
+                      'reader': reader, 'lines': lines, 'events': events,
+                      'seconds': seconds, 'lines_per_second': lines / seconds,
+                      'peak_memory': measure_memory(tool, log, reader)}
+            results['{} [{}]'.format(name, reader)] = result
+            print_result(result)
+    return results
+
+
+def summarize(results):
+    """Return the time each parser needed for all of its logs.
+
+    Returns: ``{str: float}``
+
+    """
+    times = {}
+    for result in results.values():
+        times[result['parser']] = (times.get(result['parser'], 0) +
+                                   result['seconds'])
+    return times
+
+
+def compare(results, baseline, threshold):
+    """Print the change in throughput compared to ``baseline``.
+
+    Returns the names of the measurements, which got slower by more than
+    ``threshold`` (a fraction of the old throughput).
+
+    Returns: ``[str]``
+
+    """
+    regressions = []
+    print('\n{:<50} {:>12} {:>12} {:>8}'.format('Log', 'Before', 'After',
+                                                'Change'))
+    for key in sorted(set(results) & set(baseline)):
+        before = baseline[key]['lines_per_second']
+        after = results[key]['lines_per_second']
+        change = after / before - 1
+        print('{:<50} {:>12,.0f} {:>12,.0f} {:>8.1%}{}'.format(
+            key, before, after, change,
+            ' !' if change < -threshold else ''))
+        if change < -threshold:
+            regressions.append(key)
+    return regressions
+
+
+def print_result(result):
+    """Print a single measurement."""
+    memory = result['peak_memory']
+    print('{:<50} {:<22} {:>12,.0f} lines/s {:>10} KiB'.format(
+          '{} [{}]'.format(result['log'], result['reader']),
+          result['parser'], result['lines_per_second'],
+          '-' if memory is None else '{:,.0f}'.format(memory / 1024)))
+
+
+# -- Main ---------------------------------------------------------------------
+
+if __name__ == '__main__':
+    arguments = ArgumentParser(description=__doc__.splitlines()[0])
+    arguments.add_argument(
+        '-lines', type=int, default=1000000,
+        help='number of lines in each synthetic log')
+    arguments.add_argument(
+        '-repeat', type=int, default=3,
+        help='number of measurements for each log (we use the fastest)')
+    arguments.add_argument(
+        '-save', metavar='FILE',
+        help='store the results as JSON in FILE')
+    arguments.add_argument(
+        '-compare', metavar='FILE',
+        help='compare the results with the results stored in FILE')
+    arguments.add_argument(
+        '-threshold', type=float, default=0.1,
+        help='''maximum allowed loss of throughput compared to the results
+                in the file specified via `-compare`''')
+    options = arguments.parse_args()
+
+    results = run(options.lines, options.repeat)
+    print()
+    for parser, seconds in sorted(summarize(results).items()):
+        print('{:<22} {:8.3f} s'.format(parser, seconds))
+
+    if options.save:
+        data = {'date': datetime.now().isoformat(),
+                'python': python_version(), 'platform': platform(),
+                'lines': options.lines, 'results': results}
+        with open(options.save, 'w', encoding='utf-8') as output:
+            output.write('{}\n'.format(
+                dumps(data, indent=2, sort_keys=True)))
+
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as baseline:
+            baseline = load(baseline)['results']
+        if compare(results, baseline, options.threshold):
+            sys.exit(1)
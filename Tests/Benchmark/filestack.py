@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the cost of tracking the files TeX reads while parsing a log.
+
+This script creates a synthetic latex log containing deeply nested input
+files (see ``logs.nested_inputs``). It then parses the log with
+``LaTexParser`` twice: once with the usual file tracking (see
+``parsing.FileStack``) and once with a file stack that ignores all
+parentheses. Both runs read the log through a memory map, like
+``texparser.py`` does.
+
+Usage:
+
+    python Tests/Benchmark/filestack.py [-lines LINES] [-repeat REPEAT]
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from os import sys, path
+sys.path.insert(1, path.join(path.dirname(path.dirname(path.dirname(
+    path.abspath(__file__)))), 'Support', 'lib', 'Python'))
+
+from argparse import ArgumentParser
+from timeit import default_timer
+
+from logreader import MappedLog
+from logs import nested_inputs
+from parsing import FileStack, LaTexParser
+
+
+# -- Classes ------------------------------------------------------------------
+
+class StaticStack(FileStack):
+    """A file stack that never changes."""
+
+    def scan(self, line):
+        pass
+
+
+class UntrackedParser(LaTexParser):
+    """A latex parser that does not track the files TeX reads."""
+
+    def __init__(self, input_stream, verbose, filename):
+        super(UntrackedParser, self).__init__(input_stream, verbose, filename)
+        self.files = StaticStack(filename)
+
+    def get_prefilter(self):
+        return super(LaTexParser, self).get_prefilter()
+
+
+# -- Functions ----------------------------------------------------------------
+
+def measure(parser_class, log, repeat):
+    """Return the shortest time ``parser_class`` needs to parse ``log``.
+
+    Returns: ``float``
+
+    """
+    times = []
+    for _ in range(repeat):
+        parser = parser_class(MappedLog(log), False, 'main.tex')
+        start = default_timer()
+        for _ in parser.events():
+            pass
+        times.append(default_timer() - start)
+    return min(times)
+
+
+# -- Main ---------------------------------------------------------------------
+
+if __name__ == '__main__':
+    arguments = ArgumentParser(description=__doc__.splitlines()[0])
+    arguments.add_argument('-lines', type=int, default=200000,
+                           help='number of lines in the synthetic log')
+    arguments.add_argument('-repeat', type=int, default=3,
+                           help='number of runs for each parser')
+    options = arguments.parse_args()
+
+    log = nested_inputs(options.lines)
+    number_lines = log.count(b'\n') + 1
+    untracked = measure(UntrackedParser, log, options.repeat)
+    tracked = measure(LaTexParser, log, options.repeat)
+
+    for name, duration in (('Untracked', untracked), ('Tracked', tracked)):
+        print('{:<10} {:8.3f} s {:12,.0f} lines/s'.format(
+            name, duration, number_lines / duration))
+    print('Overhead   {:8.1%}'.format(tracked / untracked - 1))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""Create large synthetic output of tex programs for the benchmarks.
+
+Every function in this module returns the content of a log as ``bytes``
+containing about ``number_lines`` lines. The logs imitate the output that
+dominates the parse time of real documents:
+
+    ``box_warnings``
+
+        A pdfTeX run full of overfull and underfull box warnings.
+
+    ``nested_inputs``
+
+        A latex run reading deeply nested input files.
+
+    ``latexmk_transcript``
+
+        A latexmk transcript containing many runs of pdfTeX and bibtex.
+
+    ``chktex_flood``
+
+        The output of chktex for a document with lots of problems.
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+# -- Constants ----------------------------------------------------------------
+
+PDFTEX_BANNER = ('This is pdfTeX, Version 3.14159265-2.6-1.40.17 '
+                 '(TeX Live 2016) (preloaded format=pdflatex)')
+TEXMF = '/usr/local/texlive/2016/texmf-dist/tex/latex'
+# TeX wraps this line after 79 characters
+WRAPPED_URL = ('[]\\T1/lmr/m/n/10 See \\T1/lmtt/m/n/10 ' +
+               'http://www.example.com/' + 'a/very/long/url/' * 4 +
+               'index.html')
+
+
+# -- Functions ----------------------------------------------------------------
+
+def join(lines):
+    """Return ``lines`` as the bytes of a log file."""
+    return '\n'.join(lines + ['']).encode('utf-8')
+
+
+def latex_preamble():
+    """Return the first lines of a pdfTeX run for the file ``main.tex``."""
+    return [PDFTEX_BANNER,
+            ' restricted \\write18 enabled.',
+            'entering extended mode',
+            '(./main.tex',
+            'LaTeX2e <2016/03/31>',
+            '({}/base/book.cls'.format(TEXMF),
+            'Document Class: book 2014/09/29 v1.4h Standard LaTeX document '
+            'class',
+            '({}/base/bk10.clo)) ({}/hyperref/hyperref.sty'.format(
+                TEXMF, TEXMF),
+            '({}/oberdiek/hobsub-hyperref.sty))'.format(TEXMF)]
+
+
+def latex_postamble(pages):
+    """Return the last lines of a pdfTeX run producing ``pages`` pages."""
+    return [') ',
+            'Output written on main.pdf ({} pages, 1048576 bytes).'.format(
+                pages),
+            'Transcript written on main.log.']
+
+
+def box_paragraph(paragraph, page):
+    """Return the warnings TeX reports for a badly set paragraph."""
+    return [
+        'Overfull \\hbox (12.34pt too wide) in paragraph at lines '
+        '{}--{}'.format(paragraph, paragraph + 3),
+        WRAPPED_URL[:79],
+        WRAPPED_URL[79:],
+        '',
+        'Underfull \\hbox (badness 10000) in paragraph at lines '
+        '{}--{}'.format(paragraph + 4, paragraph + 5),
+        '[]\\T1/lmr/m/n/10 (see Table 3)',
+        '',
+        'Underfull \\vbox (badness 1789) has occurred while \\output is '
+        'active [{}]'.format(page),
+        'LaTeX Font Warning: Font shape `T1/lmr/bx/sc\' undefined',
+        '(Font)              using `T1/lmr/bx/n\' instead on input line '
+        '{}.'.format(paragraph + 6),
+        '']
+
+
+def box_warnings(number_lines):
+    """Create a pdfTeX run dominated by box warnings."""
+    lines = latex_preamble()
+    page = 0
+    while len(lines) < number_lines:
+        page += 1
+        paragraph = page * 20
+        lines.extend(box_paragraph(paragraph, page))
+        lines.append('LaTeX Warning: Reference `tab:{}\' on page {} '
+                     'undefined on input line {}.'.format(
+                         page, page, paragraph + 9))
+    return join(lines + latex_postamble(page))
+
+
+def nested_inputs(number_lines, depth=8):
+    """Create a latex run reading input files nested ``depth`` levels deep.
+
+    Every file contains warnings, box warnings (whose content contains
+    unbalanced parentheses) and files opened by packages.
+
+    """
+    lines = latex_preamble()
+    chapter = 0
+    while len(lines) < number_lines:
+        chapter += 1
+        lines.append('(./chapters/chapter{}.tex [{}]'.format(chapter,
+                                                             chapter))
+        for level in range(1, depth + 1):
+            lines.extend([
+                '("./chapters/part {}/section {}.tex"'.format(chapter, level),
+                '({}/graphics/graphicx.sty)'.format(TEXMF),
+                'Underfull \\hbox (badness 10000) in paragraph at lines '
+                '{}--{}'.format(level, level + 1),
+                '[]\\OT1/cmr/m/n/10 (unbalanced text',
+                '',
+                'Package hyperref Warning: Token not allowed (hyperref) '
+                'removing `math shift\' on input line {}.'.format(level),
+                '',
+                'LaTeX Warning: Reference `sec:{}\' on page {} undefined '
+                'on input line {}.'.format(level, chapter, level),
+                ''])
+        lines.append(')' * depth)
+        lines.append(') [{}]'.format(chapter + 1))
+    return join(lines + latex_postamble(chapter + 1))
+
+
+def latexmk_transcript(number_lines, runs=20):
+    """Create a latexmk transcript containing ``runs`` runs of pdfTeX.
+
+    Every fourth run is a run of bibtex.
+
+    """
+    lines = ['Latexmk: This is Latexmk, John Collins, 1 January 2015, '
+             'version: 4.41.',
+             'Rule \'pdflatex\': Rules & subrules not known to be '
+             'previously run:',
+             '   pdflatex']
+    run_lines = max(number_lines // runs, 100)
+    for run in range(1, runs + 1):
+        if run % 4 == 0:
+            lines.extend([
+                'Latexmk: applying rule \'bibtex main\'...',
+                'Run number {} of rule \'bibtex main\''.format(run),
+                'This is BibTeX, Version 0.99d (TeX Live 2016)',
+                'The top-level auxiliary file: main.aux',
+                'The style file: plain.bst',
+                'Database file #1: references.bib'])
+            lines.extend('Warning--I didn\'t find a database entry for '
+                         '"key{}"'.format(entry)
+                         for entry in range(run_lines // 10))
+            lines.append('(There were {} warnings)'.format(run_lines // 10))
+            continue
+        lines.extend(['Latexmk: applying rule \'pdflatex\'...',
+                      'Rule \'pdflatex\': File changes, etc:',
+                      '------------',
+                      'Run number {} of rule \'pdflatex\''.format(run),
+                      '------------',
+                      '------------',
+                      'Running \'pdflatex  -recorder  "main.tex"\'',
+                      '------------'])
+        lines.extend(latex_preamble())
+        start = len(lines)
+        page = 0
+        while len(lines) - start < run_lines:
+            page += 1
+            lines.extend(box_paragraph(page * 20, page))
+        lines.extend(latex_postamble(page))
+        lines.extend(['Latexmk: Log file says output to \'main.pdf\'',
+                      'Latexmk: Found bibliography file(s) [references.bib]'])
+    lines.append('Latexmk: All targets (main.pdf) are up-to-date')
+    return join(lines)
+
+
+def chktex_flood(number_lines):
+    """Create the output of chktex containing thousands of warnings."""
+    lines = ['ChkTeX v1.7.6 - Copyright 1995-96 Jens T. Berger Thielemann.',
+             'Compiled with POSIX extended regex support.']
+    warnings = 0
+    while len(lines) < number_lines:
+        warnings += 1
+        lines.extend([
+            'Warning 1 in chapter{}.tex line {}: Command terminated with '
+            'space.'.format(warnings % 20, warnings),
+            '        \\makeglossaries ',
+            '                       ^',
+            'Warning 24 in chapter{}.tex line {}: Delete this space to '
+            'maintain correct pagereferences.'.format(warnings % 20, warnings),
+            '\\label{sec:intro} ',
+            '                ^'])
+    lines.extend(['', '0 errors printed; {} warnings printed; '.format(
+                  2 * warnings) + 'No user suppressed warnings; No line '
+                  'suppressed warnings.'])
+    return join(lines)
+
+
+# Synthetic logs together with the parser (see ``benchmark.PARSERS``) used to
+# parse them
+LOGS = [('box_warnings', box_warnings, 'latex'),
+        ('nested_inputs', nested_inputs, 'latex'),
+        ('latexmk_transcript', latexmk_transcript, 'latexmk'),
+        ('chktex_flood', chktex_flood, 'chktex')]
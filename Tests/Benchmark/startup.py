@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the time the commands of the bundle spend importing modules.
+
+This script runs commands of the bundle with ``python -X importtime`` and
+sums up the time spent for every imported module. It reports the total
+import time of every command and exits with status 1, if a command exceeds
+its budget or imports a module it should not need.
+
+Without a command the script checks the commands in ``COMMANDS``. Commands
+run with ``TEXMATE_SERVER`` set, so they never forward their work to a
+running server (see ``texmated.py``). The measurement needs Python 3.7 or
+later.
+
+Usage:
+
+    python Tests/Benchmark/startup.py [-budget MILLISECONDS] [-top TOP]
+                                      [-exclude MODULE ...]
+                                      [script argument ...]
+
+"""
+
+# -- Imports ------------------------------------------------------------------
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from os import path
+TESTS = path.dirname(path.dirname(path.abspath(__file__)))
+BIN = path.join(path.dirname(TESTS), 'Support', 'bin')
+
+from argparse import ArgumentParser, REMAINDER
+from os import devnull, environ
+from subprocess import PIPE, Popen
+from sys import executable, exit, version_info
+
+
+# -- Constants ----------------------------------------------------------------
+
+# The commands checked by default: ``(arguments, budget in milliseconds,
+# modules the command must not import)``
+COMMANDS = [
+    (['texmate.py', 'version'], 150,
+     ['build', 'multiprocessing', 'parsing']),
+    (['texmate.py', 'sync'], 150,
+     ['build', 'multiprocessing', 'parsing']),
+    (['texparser.py', '-h'], 150,
+     ['multiprocessing']),
+]
+
+
+# -- Functions ----------------------------------------------------------------
+
+def parse_importtime(output):
+    """Return the import time of every module listed in ``output``.
+
+    Arguments:
+
+        output
+
+            The standard error output of ``python -X importtime``.
+
+    Returns: ``{str: int}``
+
+    Examples:
+
+        >>> output = '\\n'.join([
+        ...     'import time: self [us] | cumulative | imported package',
+        ...     'import time:       120 |        120 |     _codecs',
+        ...     'import time:       300 |        420 |   codecs',
+        ...     'Some error message'])
+        >>> sorted(parse_importtime(output).items())
+        [('_codecs', 120), ('codecs', 300)]
+
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        columns = line[len('import time:'):].split('|')
+        if len(columns) != 3 or not columns[0].strip().isdigit():
+            continue
+        module = columns[2].strip()
+        times[module] = times.get(module, 0) + int(columns[0])
+    return times
+
+
+def measure(arguments):
+    """Run a command of the bundle and return the import time per module.
+
+    Arguments:
+
+        arguments
+
+            The name of a script in ``Support/bin`` followed by its
+            arguments.
+
+    Returns: ``{str: int}``
+
+    """
+    environment = dict(environ, TEXMATE_SERVER='1')
+    environment.pop('PYTHONPROFILEIMPORTTIME', None)
+    script = path.join(BIN, arguments[0])
+    with open(devnull, 'w') as output:
+        process = Popen([executable, '-X', 'importtime', script] +
+                        list(arguments[1:]), stdin=PIPE, stdout=output,
+                        stderr=PIPE, env=environment,
+                        universal_newlines=True)
+        _, errors = process.communicate()
+    return parse_importtime(errors)
+
+
+def check(arguments, budget, excluded=(), top=0):
+    """Measure a command and report if it stays inside its budget.
+
+    Returns: ``bool``
+
+    """
+    times = measure(arguments)
+    total = sum(times.values()) / 1000
+    within_budget = total <= budget
+    print('{}: {:.1f} ms (budget {} ms)'.format(' '.join(arguments), total,
+                                                budget))
+    for module in sorted(times, key=times.get, reverse=True)[:top]:
+        print('  {:>8.1f} ms  {}'.format(times[module] / 1000, module))
+    for module in excluded:
+        imported = sorted(name for name in times if name == module or
+                          name.startswith('{}.'.format(module)))
+        if imported:
+            print('  imports {}'.format(', '.join(imported)))
+            within_budget = False
+    return within_budget
+
+
+# -- Main ---------------------------------------------------------------------
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-budget', type=float, default=150,
+        help='the maximum import time of the command in milliseconds')
+    parser.add_argument(
+        '-exclude', action='append', default=[],
+        help='a module (or package) the command must not import')
+    parser.add_argument(
+        '-top', type=int, default=0,
+        help='list the given number of modules with the highest import time')
+    parser.add_argument(
+        'command', nargs=REMAINDER,
+        help='a script in Support/bin followed by its arguments')
+    options = parser.parse_args()
+
+    if version_info < (3, 7):
+        exit('Measuring the import time requires Python 3.7 or later')
+
+    commands = ([(options.command, options.budget, options.exclude)]
+                if options.command else COMMANDS)
+    results = [check(arguments, budget, excluded, options.top)
+               for arguments, budget, excluded in commands]
+    exit(0 if all(results) else 1)
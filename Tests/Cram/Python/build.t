@@ -0,0 +1,44 @@
+-- Setup ----------------------------------------------------------------------
+
+  $ cd "$TESTDIR"
+  $ source ../../lib/setup_cram.sh
+  $ cd ../../TeX/
+
+-- Tests ----------------------------------------------------------------------
+
+  $ export TM_FILEPATH="external_bibliography.tex"
+
+Typeset the file, create the bibliography and typeset the file again
+
+  $ texmate.py -suppressview build -engine pdflatex \
+  > | grep 'Output written' | countlines
+  2
+
+Passes that only resolve references run in draft mode. A document with
+stable references still needs only a single latex run.
+
+  $ export TM_LATEX_PREFERENCES="$CRAMTMP/latex.json"
+  $ echo '{"latexDebug": true}' > "$TM_LATEX_PREFERENCES"
+  $ texmate.py -suppressview build -draftpasses -engine pdflatex > /dev/null
+  $ texmate.py -suppressview build -draftpasses -engine pdflatex \
+  > | grep 'pdflatex .* status' | countlines
+  1
+
+A document that needs a single additional run to resolve its references never
+uses draft mode, since draft mode would require another run for the PDF.
+
+  $ restore_aux_files_git
+  $ rm -f *.bbl
+  $ texmate.py -suppressview build -draftpasses -engine pdflatex \
+  > | grep 'pdflatex .* status' | countlines
+  2
+
+-- Cleanup --------------------------------------------------------------------
+
+Restore the file changes made by previous commands.
+
+  $ restore_aux_files_git
+
+Remove the generated files
+
+  $ rm -f *.bbl *.blg *.log *.pdf
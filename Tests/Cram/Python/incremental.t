@@ -0,0 +1,41 @@
+-- Setup ----------------------------------------------------------------------
+
+  $ cd "$TESTDIR"
+  $ source ../../lib/setup_cram.sh
+  $ cd ../../TeX/
+
+-- Tests ----------------------------------------------------------------------
+
+  $ export TM_FILEPATH="external_bibliography.tex"
+
+Typeset the file and create the bibliography
+
+  $ texmate.py -suppressview latex -incremental -engine pdflatex \
+  > | grep 'Processing' | countlines
+  1
+
+Nothing changed, so we do not need to typeset the file again
+
+  $ texmate.py -suppressview latex -incremental -engine pdflatex \
+  > | grep 'up to date' | countlines
+  1
+
+Latex never reads the bibliography database. A change to it still has to
+create the bibliography again.
+
+  $ echo '% Changed' >> references.bib
+  $ texmate.py -suppressview latex -incremental -engine pdflatex \
+  > | grep 'Processing' | countlines
+  1
+
+-- Cleanup --------------------------------------------------------------------
+
+Restore the file changes made by previous commands.
+
+  $ git checkout references.bib
+  $ restore_aux_files_git
+
+Remove the generated files
+
+  $ rm -f *.bbl *.blg *.fls *.log *.pdf *.synctex.gz \
+  > .external_bibliography.lb
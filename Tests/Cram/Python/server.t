@@ -0,0 +1,29 @@
+-- Setup ----------------------------------------------------------------------
+
+  $ cd "$TESTDIR"
+  $ source ../../lib/setup_cram.sh
+  $ cd ../../TeX/
+
+  $ export TM_FILEPATH="external_bibliography.tex"
+  $ SOCKET="$CRAMTMP/texmate.socket"
+
+-- Tests ----------------------------------------------------------------------
+
+Start the server and wait until it listens on its socket
+
+  $ texmated.py -socket "$SOCKET" -timeout 30 &
+  $ while [ ! -S "$SOCKET" ]; do sleep 0.1; done
+
+Commands forwarded to the server produce the same output
+
+  $ python -c "
+  > import sys
+  > sys.path.insert(1, '$TM_BUNDLE_SUPPORT/lib/Python')
+  > from commandserver import forward
+  > sys.exit(forward(['texmate.py', 'version', '-engine', 'latex'],
+  >                  '$SOCKET'))"
+  pdfTeX .* (re)
+
+-- Cleanup --------------------------------------------------------------------
+
+  $ kill %1
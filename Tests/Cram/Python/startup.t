@@ -0,0 +1,17 @@
+-- Setup ----------------------------------------------------------------------
+
+  $ cd "$TESTDIR"
+  $ source ../../lib/setup_cram.sh
+  $ cd ../../TeX/
+
+-- Tests ----------------------------------------------------------------------
+
+  $ export TM_FILEPATH="external_bibliography.tex"
+
+Commands only import the modules they need and stay inside their budget
+
+  $ python "$TESTDIR/../../Benchmark/startup.py"
+  texmate.py version: .* ms \(budget 150 ms\) (re)
+  texmate.py sync: .* ms \(budget 150 ms\) (re)
+  texparser.py -h: .* ms \(budget 150 ms\) (re)
+
@@ -8,3 +8,17 @@
 
   $ texparser.py ../Log/ünicöde.log ünicöde.tex | \
   >  grep '15.*Undefined control sequence.' > /dev/null
+
+Write the messages as plain text followed by a summary
+
+  $ texparser.py -format text ../Log/ünicöde.log ünicöde.tex | \
+  >  grep '^error:'
+  error: */ünicöde.tex:15: Undefined control sequence. (glob)
+  $ texparser.py -format text ../Log/ünicöde.log ünicöde.tex | tail -n 1
+  info: 1 error, 0 warnings
+
+-- Cleanup --------------------------------------------------------------------
+
+Remove the cache file
+
+  $ rm -f .ünicöde.tex.lb